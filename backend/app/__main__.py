@@ -0,0 +1,125 @@
+"""Production entry point, `python -m app`.
+
+The application is imported once in this process, then WEB_CONCURRENCY workers
+are forked and all serve the same listening socket. Before forking, everything
+created while importing is moved out of the garbage collector's reach with
+`gc.freeze()`, otherwise the first collection in every worker touches those
+objects and turns the pages shared copy-on-write into private copies.
+
+With DB_CONNECTION_BUDGET the connections are split between the workers and
+startup fails when the budget can't give every worker one. Without it every
+worker gets a pool of the fixed size, and the workers log a warning when all of
+those pools could open more connections than the database accepts.
+
+uvloop and httptools are used when they are installed.
+"""
+
+import gc
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import time
+from types import FrameType
+
+import uvicorn
+from app.core.config import HOST, PORT, WEB_CONCURRENCY
+from app.db.tasks import get_bulkhead_sizes, get_pool_size
+
+logger = logging.getLogger("uvicorn.error")
+
+# a worker crashing faster than this after being forked isn't restarted right away
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+class PreforkSupervisor:
+    def __init__(
+        self, *, config: uvicorn.Config, sock: socket.socket, workers: int
+    ) -> None:
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.children: dict[int, float] = {}
+        self.should_exit = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+
+        # in the worker, uvicorn installs its own handlers for a graceful shutdown
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker [%d] failed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        self.should_exit = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        for _ in range(self.workers):
+            self.spawn()
+
+        while self.children:
+            pid, status = os.wait()
+            started_at = self.children.pop(pid, None)
+            if started_at is None or self.should_exit:
+                continue
+
+            logger.warning(
+                "Worker [%d] exited with status %d, restarting it",
+                pid,
+                os.waitstatus_to_exitcode(status),
+            )
+            if time.monotonic() - started_at < RESTART_BACKOFF_SECONDS:
+                time.sleep(RESTART_BACKOFF_SECONDS)
+            self.spawn()
+
+
+def main() -> None:
+    config = uvicorn.Config(
+        "app.api.server:app",
+        host=HOST,
+        port=PORT,
+        loop="auto",
+        http="auto",
+        workers=WEB_CONCURRENCY,
+        proxy_headers=True,
+    )
+    # import the application before forking, the workers share it
+    config.load()
+    sock = config.bind_socket()
+    gc.collect()
+    gc.freeze()
+
+    min_size, max_size = get_pool_size()
+    logger.info(
+        "Starting %d workers (loop: %s, http: %s, database pool: %d-%d, bulkheads: %s)",
+        WEB_CONCURRENCY,
+        "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "httptools" if importlib.util.find_spec("httptools") else "h11",
+        min_size,
+        max_size,
+        get_bulkhead_sizes() or "none",
+    )
+    PreforkSupervisor(config=config, sock=sock, workers=WEB_CONCURRENCY).run()
+    logger.info("Stopped all workers")
+
+
+if __name__ == "__main__":
+    main()
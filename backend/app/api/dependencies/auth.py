@@ -1,5 +1,7 @@
 from app.api.dependencies.database import get_repository
 from app.core.config import API_PREFIX, SECRET_KEY
+from app.core.context import request_stats
+from app.core.tracing import traced
 from app.db.repositories.users import UsersRepository
 from app.models.user import UserInDB
 from app.services import auth_service
@@ -9,6 +11,7 @@ from fastapi.security import OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{API_PREFIX}/users/login/token/")
 
 
+@traced
 async def get_user_from_token(
     *,
     token: str = Depends(oauth2_scheme),
@@ -22,9 +25,14 @@ async def get_user_from_token(
     except Exception as e:
         raise e
 
+    stats = request_stats.get()
+    if stats and user:
+        stats.user_id = user.id
+
     return user
 
 
+@traced
 def get_current_active_user(
     current_user: UserInDB = Depends(get_user_from_token),
 ) -> UserInDB | None:
@@ -42,3 +50,16 @@ def get_current_active_user(
         )
 
     return current_user
+
+
+@traced
+def get_current_superuser(
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> UserInDB:
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only superusers are able to access this resource.",
+        )
+
+    return current_user
@@ -1,11 +1,13 @@
 from app.api.dependencies.auth import get_current_active_user
 from app.api.dependencies.database import get_repository
+from app.core.tracing import traced
 from app.db.repositories.cleanings import CleaningsRepository
 from app.models.cleaning import CleaningPublic
 from app.models.user import UserInDB
 from fastapi import Depends, HTTPException, Path, status
 
 
+@traced
 async def get_cleaning_by_id_from_path(
     cleaning_id: int = Path(..., ge=1),
     current_user: UserInDB = Depends(get_current_active_user),
@@ -24,6 +26,7 @@ async def get_cleaning_by_id_from_path(
     return cleaning
 
 
+@traced
 def check_cleaning_modification_permissions(
     current_user: UserInDB = Depends(get_current_active_user),
     cleaning: CleaningPublic = Depends(get_cleaning_by_id_from_path),
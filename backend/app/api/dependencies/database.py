@@ -1,6 +1,5 @@
 from typing import Callable, Type
 from databases import Database
-from fastapi import Depends
 from starlette.requests import Request
 from app.db.repositories.base import BaseRepository
 
@@ -9,8 +8,18 @@ def get_database(request: Request) -> Database:
     return request.app.state._db
 
 
-def get_repository(Repo_type: Type[BaseRepository]) -> Callable:
-    def get_repo(db: Database = Depends(get_database)) -> Type[BaseRepository]:
-        return Repo_type(db)
+def get_database_pool(request: Request, *, pool: str) -> Database:
+    # pools that aren't configured are served by the default one
+    return request.app.state._pools.get(pool, request.app.state._db)
+
+
+def get_repository(
+    Repo_type: Type[BaseRepository], *, pool: str | None = None
+) -> Callable:
+    """Repository on the pool it declares, or on `pool` if the route picks one."""
+    pool = pool or Repo_type.pool
+
+    def get_repo(request: Request) -> Type[BaseRepository]:
+        return Repo_type(get_database_pool(request, pool=pool))
 
     return get_repo
@@ -1,28 +1,31 @@
 from app.api.dependencies.auth import get_current_active_user
-from app.api.dependencies.cleanings import (
-    get_cleaning_by_id_from_path,
-    user_owns_cleaning,
-)
+from app.api.dependencies.cleanings import get_cleaning_by_id_from_path
 from app.api.dependencies.database import get_repository
-from app.api.dependencies.offers import get_offer_for_cleaning_from_user_by_path
+from app.api.dependencies.offers import (
+    get_offer_authorization_for_user_by_path,
+    get_offer_for_cleaning_from_user_by_path,
+)
 from app.api.dependencies.users import get_user_by_username_from_path
+from app.core.tracing import traced
+from app.db.pools import ANALYTICS_POOL
 from app.db.repositories.evaluations import EvaluationsRepository
 from app.models.cleaning import CleaningInDB
 from app.models.evaluation import EvaluationInDB
-from app.models.offer import OfferInDB
+from app.models.offer import OfferAuthorization, OfferInDB
 from app.models.user import UserInDB
 from fastapi import Depends, HTTPException, status
 
 
+@traced
 async def check_evaluation_create_permissions(
     current_user: UserInDB = Depends(get_current_active_user),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
-    cleaner: UserInDB = Depends(get_user_by_username_from_path),
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_user_by_path
+    ),
     offer: OfferInDB = Depends(get_offer_for_cleaning_from_user_by_path),
-    evals_repo: EvaluationsRepository = Depends(get_repository(EvaluationsRepository)),
 ) -> None:
     # Check that only owners of a cleaning can leave evaluations for that cleaning job
-    if not user_owns_cleaning(user=current_user, cleaning=cleaning):
+    if authorization.cleaning_owner != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Users are unable to leave evaluations for cleaning jobs they do not own.",
@@ -37,20 +40,24 @@ async def check_evaluation_create_permissions(
         )
 
     # Check that evaluations can only be made for users whose offer was accepted for that job
-    if offer.user_id != cleaner.id:
+    if offer.user_id != authorization.user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You are not authorized to leave an evaluation for this user.",
         )
 
 
+@traced
 async def list_evaluations_for_cleaner_from_path(
     cleaner: UserInDB = Depends(get_user_by_username_from_path),
-    evals_repo: EvaluationsRepository = Depends(get_repository(EvaluationsRepository)),
+    evals_repo: EvaluationsRepository = Depends(
+        get_repository(EvaluationsRepository, pool=ANALYTICS_POOL)
+    ),
 ) -> list[EvaluationInDB]:
     return await evals_repo.list_evaluations_for_cleaner(cleaner=cleaner)
 
 
+@traced
 async def get_cleaner_evaluation_for_cleaning_from_path(
     cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
     cleaner: UserInDB = Depends(get_user_by_username_from_path),
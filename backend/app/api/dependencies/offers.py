@@ -1,97 +1,142 @@
 from app.api.dependencies.auth import get_current_active_user
-from app.api.dependencies.cleanings import (
-    get_cleaning_by_id_from_path,
-    user_owns_cleaning,
-)
 from app.api.dependencies.database import get_repository
-from app.api.dependencies.users import get_user_by_username_from_path
+from app.core.tracing import traced
 from app.db.repositories.offers import OffersRepository
-from app.models.cleaning import CleaningInDB
-from app.models.offer import OfferInDB, OfferStatus
+from app.models.offer import OfferAuthorization, OfferInDB, OfferStatus
 from app.models.user import UserInDB
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Path, status
 
 
-async def get_offer_for_cleaning_from_user(
-    *, user: UserInDB, cleaning: CleaningInDB, offers_repo: OffersRepository
-) -> OfferInDB:
-    offer = await offers_repo.get_offer_for_cleaning_from_user(
-        cleaning=cleaning, user=user
+async def get_offer_authorization(
+    *, cleaning_id: int, username: str, offers_repo: OffersRepository
+) -> OfferAuthorization:
+    authorization = await offers_repo.get_offer_authorization(
+        cleaning_id=cleaning_id, username=username
     )
 
-    if not offer:
+    if not authorization:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Offer not found."
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No cleaning found with that id.",
         )
 
-    return offer
+    return authorization
 
 
-async def get_offer_for_cleaning_from_current_user(
+@traced
+async def get_offer_authorization_for_current_user(
+    cleaning_id: int = Path(..., ge=1),
     current_user: UserInDB = Depends(get_current_active_user),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
     offers_repo: OffersRepository = Depends(get_repository(OffersRepository)),
-) -> OfferInDB:
-    return await get_offer_for_cleaning_from_user(
-        user=current_user, cleaning=cleaning, offers_repo=offers_repo
+) -> OfferAuthorization:
+    return await get_offer_authorization(
+        cleaning_id=cleaning_id, username=current_user.username, offers_repo=offers_repo
     )
 
 
-async def get_offer_for_cleaning_from_user_by_path(
-    user: UserInDB = Depends(get_user_by_username_from_path),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
+@traced
+async def get_offer_authorization_for_user_by_path(
+    cleaning_id: int = Path(..., ge=1),
+    username: str = Path(..., min_length=3, regex="^[a-zA-Z0-9_-]+$"),
+    current_user: UserInDB = Depends(get_current_active_user),
     offers_repo: OffersRepository = Depends(get_repository(OffersRepository)),
-) -> OfferInDB:
-    return await get_offer_for_cleaning_from_user(
-        user=user, cleaning=cleaning, offers_repo=offers_repo
+) -> OfferAuthorization:
+    authorization = await get_offer_authorization(
+        cleaning_id=cleaning_id, username=username, offers_repo=offers_repo
     )
 
+    if authorization.user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No user found with that username.",
+        )
+
+    return authorization
+
+
+def get_offer_from_authorization(*, authorization: OfferAuthorization) -> OfferInDB:
+    if not authorization.offer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Offer not found."
+        )
+
+    return authorization.offer
+
+
+@traced
+def get_offer_for_cleaning_from_current_user(
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_current_user
+    ),
+) -> OfferInDB:
+    return get_offer_from_authorization(authorization=authorization)
+
+
+@traced
+def get_offer_for_cleaning_from_user_by_path(
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_user_by_path
+    ),
+) -> OfferInDB:
+    return get_offer_from_authorization(authorization=authorization)
 
+
+@traced
 async def list_offers_for_cleaning_by_id_from_path(
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_current_user
+    ),
     offers_repo: OffersRepository = Depends(get_repository(OffersRepository)),
 ) -> list[OfferInDB]:
-    return await offers_repo.list_offers_for_cleaning(cleaning=cleaning)
+    return await offers_repo.list_offers_for_cleaning_by_id(
+        cleaning_id=authorization.cleaning_id
+    )
 
 
-async def check_offer_create_permissions(
+@traced
+def check_offer_create_permissions(
     current_user: UserInDB = Depends(get_current_active_user),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
-    offers_repo: OffersRepository = Depends(get_repository(OffersRepository)),
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_current_user
+    ),
 ) -> None:
-    if user_owns_cleaning(user=current_user, cleaning=cleaning):
+    if authorization.cleaning_owner == current_user.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Users are unable to create offers for cleaning jobs they own.",
         )
 
-    if await offers_repo.get_offer_for_cleaning_from_user(
-        cleaning=cleaning, user=current_user
-    ):
+    if authorization.offer:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Users aren't allowed create more than one offer for a cleaning job.",
         )
 
 
+@traced
 def check_offer_list_permissions(
     current_user: UserInDB = Depends(get_current_active_user),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_current_user
+    ),
 ) -> None:
-    if not user_owns_cleaning(user=current_user, cleaning=cleaning):
+    if authorization.cleaning_owner != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Unable to access offers.",
         )
 
 
+@traced
 def check_offer_get_permissions(
     current_user: UserInDB = Depends(get_current_active_user),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_user_by_path
+    ),
     offer: OfferInDB = Depends(get_offer_for_cleaning_from_user_by_path),
 ) -> None:
     if (
-        not user_owns_cleaning(user=current_user, cleaning=cleaning)
+        authorization.cleaning_owner != current_user.id
         and offer.user_id != current_user.id
     ):
         raise HTTPException(
@@ -100,15 +145,15 @@ def check_offer_get_permissions(
         )
 
 
+@traced
 def check_offer_acceptance_permissions(
     current_user: UserInDB = Depends(get_current_active_user),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
-    offer: OfferInDB = Depends(get_offer_for_cleaning_from_user_by_path),
-    existing_offers: list[OfferInDB] = Depends(
-        list_offers_for_cleaning_by_id_from_path
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_user_by_path
     ),
+    offer: OfferInDB = Depends(get_offer_for_cleaning_from_user_by_path),
 ) -> None:
-    if not user_owns_cleaning(user=current_user, cleaning=cleaning):
+    if authorization.cleaning_owner != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only the owner of the cleaning may accept offers.",
@@ -120,13 +165,14 @@ def check_offer_acceptance_permissions(
             detail="Can only accept offers that are currently pending.",
         )
 
-    if any(OfferStatus.accepted == offer.status for offer in existing_offers):
+    if authorization.has_accepted_offer:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="That cleaning job already has an accepted offer.",
         )
 
 
+@traced
 def check_offer_cancel_permissions(
     offer: OfferInDB = Depends(get_offer_for_cleaning_from_current_user),
 ) -> None:
@@ -137,6 +183,7 @@ def check_offer_cancel_permissions(
         )
 
 
+@traced
 def check_offer_rescind_permissions(
     offer: OfferInDB = Depends(get_offer_for_cleaning_from_current_user),
 ) -> None:
@@ -1,10 +1,12 @@
 from app.api.dependencies.auth import get_current_active_user
 from app.api.dependencies.database import get_repository
+from app.core.tracing import traced
 from app.db.repositories.users import UsersRepository
 from app.models.user import UserInDB
 from fastapi import Depends, HTTPException, Path, status
 
 
+@traced
 async def get_user_by_username_from_path(
     username: str = Path(..., min_length=3, regex="^[a-zA-Z0-9_-]+$"),
     current_user: UserInDB = Depends(get_current_active_user),
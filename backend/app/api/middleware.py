@@ -0,0 +1,177 @@
+import time
+from datetime import datetime, timezone
+
+from app.core import config
+from app.core.access_log import access_log
+from app.core.context import RequestStats, request_stats
+from app.core.load_shedding import (
+    PRIORITY_FEED,
+    PRIORITY_READ,
+    PRIORITY_WRITE,
+    GradientLimiter,
+    load_shedder,
+)
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def format_server_timing(stats: RequestStats, *, total: float) -> str:
+    return ", ".join(
+        [
+            f"app;dur={total * 1000:.2f}",
+            f'db;dur={stats.query_time * 1000:.2f};desc="{stats.queries} queries"',
+            f"db-acquire;dur={stats.acquire_time * 1000:.2f}"
+            f';desc="{stats.connections} connections"',
+            f"serialize;dur={stats.serialization_time * 1000:.2f}",
+        ]
+    )
+
+
+class RequestStatsMiddleware:
+    """Collect the cost of every request in a `RequestStats` accumulator.
+
+    Repositories and routes feed it through the `request_stats` context variable,
+    with SERVER_TIMING_ENABLED it is reported back in a `Server-Timing` header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+
+        async def send_with_server_timing(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and config.SERVER_TIMING_ENABLED
+            ):
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    format_server_timing(
+                        stats, total=time.perf_counter() - stats.started_at
+                    ),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            request_stats.reset(token)
+
+
+class AccessLogMiddleware:
+    """Emit a structured access log entry with the cost of every request.
+
+    Has to run inside `RequestStatsMiddleware` to see the request accumulator.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not config.ACCESS_LOG_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        bytes_written = 0
+
+        async def send_and_count(message: Message) -> None:
+            nonlocal status_code, bytes_written
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_written += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_count)
+        finally:
+            stats = request_stats.get() or RequestStats()
+            latency = time.perf_counter() - stats.started_at
+            client = scope.get("client")
+            access_log.emit(
+                {
+                    "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": stats.route,
+                    "status": status_code,
+                    "user_id": stats.user_id,
+                    "client": client[0] if client else None,
+                    "latency_ms": round(latency * 1000, 3),
+                    "queries": stats.queries,
+                    "db_ms": round(stats.query_time * 1000, 3),
+                    "rows": stats.rows,
+                    "bytes_written": bytes_written,
+                    "cache_hits": stats.cache_hits,
+                }
+            )
+
+
+class LoadSheddingMiddleware:
+    """Reject requests over the worker's adaptive concurrency limit with a 503.
+
+    Probes and metrics scrapes are never shed, they have to see the worker
+    when it is overloaded the most.
+    """
+
+    exempt_paths = ("/health/", f"{config.API_PREFIX}/metrics/")
+
+    def __init__(
+        self, app: ASGIApp, *, limiter: GradientLimiter = load_shedder
+    ) -> None:
+        self.app = app
+        self.limiter = limiter
+
+    def get_priority(self, scope: Scope) -> str:
+        if scope["path"].startswith(f"{config.API_PREFIX}/feed/"):
+            return PRIORITY_FEED
+
+        authenticated = "authorization" in Headers(scope=scope)
+        if authenticated and scope["method"] not in ("GET", "HEAD", "OPTIONS"):
+            return PRIORITY_WRITE
+
+        return PRIORITY_READ
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not config.LOAD_SHEDDING_ENABLED
+            or scope["path"].startswith(self.exempt_paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limiter.try_acquire(priority=self.get_priority(scope)):
+            response = JSONResponse(
+                {"detail": "The server is overloaded, try again later."},
+                status_code=HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(config.LOAD_SHEDDING_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_and_record_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            self.limiter.release(
+                latency=time.perf_counter() - started_at, failed=status_code >= 500
+            )
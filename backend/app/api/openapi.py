@@ -0,0 +1,70 @@
+"""OpenAPI schema precomputed at build time.
+
+Generating the schema walks every route and every nested model, long enough to
+stall the first request to the docs on a fresh worker. `python -m app.api.openapi`
+writes it to a file while the image is built and workers serve that file,
+falling back to generating the schema when the file is missing or outdated.
+
+The file stores a fingerprint of the application's source next to the schema,
+any change to a route, parameter or model makes it outdated. Checking it only
+reads and hashes the source files, far cheaper than generating the schema.
+"""
+
+import hashlib
+import json
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from app.core.config import OPENAPI_SCHEMA_FILE
+from fastapi import FastAPI
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+def source_fingerprint(app: FastAPI) -> str:
+    """Hash of the application's title, version and source files."""
+    digest = hashlib.sha256(f"{app.title}\0{app.version}".encode())
+    for source in sorted(APP_DIR.rglob("*.py")):
+        digest.update(f"\0{source.relative_to(APP_DIR)}\0".encode())
+        digest.update(source.read_bytes())
+
+    return digest.hexdigest()
+
+
+def load_openapi_schema(app: FastAPI, *, path: str) -> dict[str, Any] | None:
+    try:
+        written = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return None
+
+    # written for another version of the application
+    if written.get("fingerprint") != source_fingerprint(app):
+        return None
+
+    return written.get("schema")
+
+
+def precomputed_openapi(
+    app: FastAPI, *, path: str = OPENAPI_SCHEMA_FILE
+) -> Callable[[], dict[str, Any]]:
+    def openapi() -> dict[str, Any]:
+        if app.openapi_schema is None:
+            app.openapi_schema = load_openapi_schema(app, path=path)
+        # generates the schema only if none was loaded
+        return FastAPI.openapi(app)
+
+    return openapi
+
+
+def write_openapi_schema(app: FastAPI, *, path: str = OPENAPI_SCHEMA_FILE) -> None:
+    written = {"fingerprint": source_fingerprint(app), "schema": FastAPI.openapi(app)}
+    Path(path).write_text(json.dumps(written))
+
+
+if __name__ == "__main__":
+    from app.api.server import app
+
+    path = sys.argv[1] if len(sys.argv) > 1 else OPENAPI_SCHEMA_FILE
+    write_openapi_schema(app, path=path)
@@ -1,19 +1,27 @@
+from app.api.routes.admin import router as admin_router
 from app.api.routes.cleanings import router as cleanings_router
 from app.api.routes.evaluations import router as evaluations_router
 from app.api.routes.feed import router as feed_router
+from app.api.routes.metrics import router as metrics_router
 from app.api.routes.offers import router as offers_router
 from app.api.routes.profiles import router as profiles_router
 from app.api.routes.users import router as users_router
-from fastapi import APIRouter
+from fastapi import FastAPI
 
-router = APIRouter()
-router.include_router(cleanings_router, prefix="/cleanings", tags=["cleanings"])
-router.include_router(users_router, prefix="/users", tags=["users"])
-router.include_router(profiles_router, prefix="/profiles", tags=["profiles"])
-router.include_router(
-    offers_router, prefix="/cleanings/{cleaning_id}/offers", tags=["offers"]
-)
-router.include_router(
-    evaluations_router, prefix="/users/{username}/evaluations", tags=["evaluations"]
-)
-router.include_router(feed_router, prefix="/feed", tags=["feed"])
+# included straight into the application, every level of router nesting
+# builds all routes again and clones their response models once more
+API_ROUTERS = [
+    (cleanings_router, "/cleanings", ["cleanings"]),
+    (users_router, "/users", ["users"]),
+    (profiles_router, "/profiles", ["profiles"]),
+    (offers_router, "/cleanings/{cleaning_id}/offers", ["offers"]),
+    (evaluations_router, "/users/{username}/evaluations", ["evaluations"]),
+    (feed_router, "/feed", ["feed"]),
+    (metrics_router, "/metrics", ["metrics"]),
+    (admin_router, "/admin", ["admin"]),
+]
+
+
+def include_api_routers(app: FastAPI, *, prefix: str) -> None:
+    for router, router_prefix, tags in API_ROUTERS:
+        app.include_router(router, prefix=f"{prefix}{router_prefix}", tags=tags)
@@ -0,0 +1,79 @@
+from typing import Any
+
+from app.api.dependencies.auth import get_current_superuser
+from app.api.routing import InstrumentedRoute
+from app.core.profiling import ProfilerBusyError, profiler
+from app.db.slow_queries import slow_query_log
+from app.models.profiler import ProfilerSessionCreate, ProfilerSessionPublic
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter(
+    route_class=InstrumentedRoute, dependencies=[Depends(get_current_superuser)]
+)
+
+
+@router.get("/slow-queries/", name="admin:list-slow-queries")
+async def list_slow_queries() -> list[dict[str, Any]]:
+    """Most recent slow statements with their parameters and EXPLAIN output."""
+    return list(reversed(slow_query_log.entries))
+
+
+@router.post(
+    "/profiler/",
+    response_model=ProfilerSessionPublic,
+    name="admin:start-profiler",
+    status_code=status.HTTP_201_CREATED,
+)
+async def start_profiler(
+    session_create: ProfilerSessionCreate = Body(..., embed=True),
+) -> ProfilerSessionPublic:
+    try:
+        session = profiler.start(options=session_create)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return session.public()
+
+
+@router.get(
+    "/profiler/", response_model=ProfilerSessionPublic, name="admin:get-profiler"
+)
+async def get_profiler() -> ProfilerSessionPublic:
+    if not profiler.session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profiling session has been started.",
+        )
+
+    return profiler.session.public()
+
+
+@router.delete(
+    "/profiler/", response_model=ProfilerSessionPublic, name="admin:stop-profiler"
+)
+async def stop_profiler() -> ProfilerSessionPublic:
+    session = await profiler.stop()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profiling session has been started.",
+        )
+
+    return session.public()
+
+
+@router.get(
+    "/profiler/collapsed/",
+    response_class=PlainTextResponse,
+    name="admin:get-profiler-collapsed-stacks",
+)
+async def get_profiler_collapsed_stacks() -> str:
+    """Collapsed stacks of the last session, ready for flamegraph.pl or speedscope."""
+    if not profiler.session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profiling session has been started.",
+        )
+
+    return profiler.session.collapsed()
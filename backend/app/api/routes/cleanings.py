@@ -4,6 +4,7 @@ from app.api.dependencies.cleanings import (
     get_cleaning_by_id_from_path,
 )
 from app.api.dependencies.database import get_repository
+from app.api.routing import InstrumentedRoute
 from app.db.repositories.cleanings import CleaningsRepository
 from app.models.cleaning import (
     CleaningCreate,
@@ -14,7 +15,7 @@ from app.models.cleaning import (
 from app.models.user import UserInDB
 from fastapi import APIRouter, Body, Depends, status
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.post(
@@ -1,24 +1,26 @@
 
-from app.api.dependencies.cleanings import get_cleaning_by_id_from_path
 from app.api.dependencies.database import get_repository
 from app.api.dependencies.evaluations import (
     check_evaluation_create_permissions,
     get_cleaner_evaluation_for_cleaning_from_path,
     list_evaluations_for_cleaner_from_path,
 )
+from app.api.dependencies.offers import get_offer_authorization_for_user_by_path
 from app.api.dependencies.users import get_user_by_username_from_path
+from app.api.routing import InstrumentedRoute, latency_budget
+from app.db.pools import ANALYTICS_POOL
 from app.db.repositories.evaluations import EvaluationsRepository
-from app.models.cleaning import CleaningInDB
 from app.models.evaluation import (
     EvaluationAggregate,
     EvaluationCreate,
     EvaluationInDB,
     EvaluationPublic,
 )
+from app.models.offer import OfferAuthorization
 from app.models.user import UserInDB
 from fastapi import APIRouter, Body, Depends, status
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.post(
@@ -30,12 +32,15 @@ router = APIRouter()
 )
 async def create_evaluation_for_cleaner(
     evaluation_create: EvaluationCreate = Body(..., embed=True),
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
-    cleaner: UserInDB = Depends(get_user_by_username_from_path),
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_user_by_path
+    ),
     evals_repo: EvaluationsRepository = Depends(get_repository(EvaluationsRepository)),
 ) -> EvaluationPublic:
     return await evals_repo.create_evaluation_for_cleaner(
-        evaluation_create=evaluation_create, cleaner=cleaner, cleaning=cleaning
+        evaluation_create=evaluation_create,
+        cleaning_id=authorization.cleaning_id,
+        cleaner_id=authorization.user_id,
     )
 
 
@@ -44,6 +49,7 @@ async def create_evaluation_for_cleaner(
     response_model=list[EvaluationPublic],
     name="evaluations:list-evaluations-for-cleaner",
 )
+@latency_budget(ms=1000)
 async def list_evaluations_for_cleaner(
     evaluations: list[EvaluationInDB] = Depends(list_evaluations_for_cleaner_from_path),
 ) -> list[EvaluationPublic]:
@@ -55,9 +61,12 @@ async def list_evaluations_for_cleaner(
     response_model=EvaluationAggregate,
     name="evaluations:get-stats-for-cleaner",
 )
+@latency_budget(ms=1000)
 async def get_stats_for_cleaner(
     cleaner: UserInDB = Depends(get_user_by_username_from_path),
-    evals_repo: EvaluationsRepository = Depends(get_repository(EvaluationsRepository)),
+    evals_repo: EvaluationsRepository = Depends(
+        get_repository(EvaluationsRepository, pool=ANALYTICS_POOL)
+    ),
 ) -> EvaluationAggregate:
     return await evals_repo.get_cleaner_aggregates(cleaner=cleaner)
 
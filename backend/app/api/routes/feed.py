@@ -2,11 +2,12 @@ from datetime import datetime, timedelta, timezone
 
 from app.api.dependencies.auth import get_current_active_user
 from app.api.dependencies.database import get_repository
+from app.api.routing import InstrumentedRoute, latency_budget
 from app.db.repositories.feed import FeedRepository
 from app.models.feed import CleaningFeedItem
 from fastapi import APIRouter, Depends, Query
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.get(
@@ -14,6 +15,7 @@ router = APIRouter()
     name="feed:get-cleaning-feed-for-user",
     dependencies=[Depends(get_current_active_user)],
 )
+@latency_budget(ms=1000)
 async def get_cleaning_feed_for_user(
     page_chunk_size: int = Query(
         20,
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+
+from app.api.dependencies.database import get_database
+from app.api.routing import InstrumentedRoute
+from app.core.config import READINESS_MAX_POOL_WAITERS, READINESS_TIMEOUT_SECONDS
+from app.db.instrumentation import InstrumentedDatabase, connection_pin
+from app.models.health import Readiness
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from starlette.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+async def ping_database(db: InstrumentedDatabase) -> None:
+    # the probe measures a fresh acquisition, it never pins one for the request
+    connection_pin.set(None)
+    # the pool is connected again in the background, the probe only reports
+    if not db.is_connected:
+        raise ConnectionError("The database pool isn't connected.")
+    async with db.connection() as connection:
+        await connection.fetch_val("SELECT 1")
+
+
+@router.get("/live", name="health:live", include_in_schema=False)
+async def live() -> dict:
+    return {"status": "ok"}
+
+
+@router.get(
+    "/ready",
+    response_model=Readiness,
+    name="health:ready",
+    include_in_schema=False,
+    responses={HTTP_503_SERVICE_UNAVAILABLE: {"model": Readiness}},
+)
+async def ready(db: InstrumentedDatabase = Depends(get_database)) -> JSONResponse:
+    detail = None
+    try:
+        await asyncio.wait_for(ping_database(db), timeout=READINESS_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        detail = "Timed out waiting for a database connection."
+    except Exception as e:
+        logger.warning("Readiness check failed: %s", e)
+        detail = "Database is unreachable."
+
+    pool = db.pool_stats()
+    if detail is None and pool.waiting > READINESS_MAX_POOL_WAITERS:
+        detail = f"{pool.waiting} requests are waiting for a database connection."
+
+    readiness = Readiness(ready=detail is None, detail=detail, pool=pool)
+    return JSONResponse(
+        readiness.dict(),
+        status_code=HTTP_200_OK if readiness.ready else HTTP_503_SERVICE_UNAVAILABLE,
+    )
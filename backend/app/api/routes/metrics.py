@@ -0,0 +1,21 @@
+from app.api.routing import InstrumentedRoute
+from app.core.metrics import registry
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.requests import Request
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get(
+    "/",
+    response_class=PlainTextResponse,
+    name="metrics:get-metrics",
+    include_in_schema=False,
+)
+async def get_metrics(request: Request) -> str:
+    for database in request.app.state._pools.values():
+        # refreshes the pool size gauges
+        database.pool_stats()
+
+    return registry.render()
@@ -1,5 +1,4 @@
 from app.api.dependencies.auth import get_current_active_user
-from app.api.dependencies.cleanings import get_cleaning_by_id_from_path
 from app.api.dependencies.database import get_repository
 from app.api.dependencies.offers import (
     check_offer_acceptance_permissions,
@@ -8,13 +7,15 @@ from app.api.dependencies.offers import (
     check_offer_get_permissions,
     check_offer_list_permissions,
     check_offer_rescind_permissions,
+    get_offer_authorization_for_current_user,
     get_offer_for_cleaning_from_current_user,
     get_offer_for_cleaning_from_user_by_path,
     list_offers_for_cleaning_by_id_from_path,
 )
+from app.api.routing import InstrumentedRoute
 from app.db.repositories.offers import OffersRepository
-from app.models.cleaning import CleaningInDB
 from app.models.offer import (
+    OfferAuthorization,
     OfferCreate,
     OfferInDB,
     OfferPublic,
@@ -24,7 +25,7 @@ from app.models.offer import (
 from app.models.user import UserInDB
 from fastapi import APIRouter, Depends, status
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.post(
@@ -35,12 +36,16 @@ router = APIRouter()
     dependencies=[Depends(check_offer_create_permissions)],
 )
 async def create_offer(
-    cleaning: CleaningInDB = Depends(get_cleaning_by_id_from_path),
+    authorization: OfferAuthorization = Depends(
+        get_offer_authorization_for_current_user
+    ),
     current_user: UserInDB = Depends(get_current_active_user),
     offers_repo: OffersRepository = Depends(get_repository(OffersRepository)),
 ) -> OfferPublic:
     return await offers_repo.create_offer_for_cleaning(
-        new_offer=OfferCreate(cleaning_id=cleaning.id, user_id=current_user.id),
+        new_offer=OfferCreate(
+            cleaning_id=authorization.cleaning_id, user_id=current_user.id
+        ),
         requesting_user=current_user,
     )
 
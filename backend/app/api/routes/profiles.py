@@ -1,11 +1,12 @@
 from app.api.dependencies.auth import get_current_active_user
 from app.api.dependencies.database import get_repository
+from app.api.routing import InstrumentedRoute
 from app.db.repositories.profiles import ProfilesRepository
 from app.models.profile import ProfilePublic, ProfileUpdate
 from app.models.user import UserInDB
 from fastapi import APIRouter, Body, Depends, HTTPException, Path, status
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.get(
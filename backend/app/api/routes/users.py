@@ -1,5 +1,6 @@
 from app.api.dependencies.auth import get_current_active_user
 from app.api.dependencies.database import get_repository
+from app.api.routing import InstrumentedRoute
 from app.db.repositories.users import UsersRepository
 from app.models.token import AccessToken
 from app.models.user import UserCreate, UserInDB, UserPublic
@@ -8,7 +9,7 @@ from fastapi import APIRouter, Body, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette import status
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.post(
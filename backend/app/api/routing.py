@@ -0,0 +1,178 @@
+import asyncio
+import contextlib
+import functools
+import inspect
+import time
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from app.core import config
+from app.core.context import current_route, request_deadline, request_stats
+from app.core.metrics import registry
+from app.core.profiling import profiler
+from app.core.tracing import tracer
+from app.db.instrumentation import pinned_connection
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+ROUTE_REQUESTS = registry.counter(
+    "phresh_route_requests_total",
+    "Number of requests handled, by route.",
+    ("route",),
+)
+ROUTE_DISCONNECTS = registry.counter(
+    "phresh_route_client_disconnects_total",
+    "Number of requests cancelled because the client went away, by route.",
+    ("route",),
+)
+
+# status logged for requests whose client disconnected before the response
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
+
+def latency_budget(*, ms: float) -> Callable[[Callable], Callable]:
+    """Declare how long a route may take, its queries get the remaining time."""
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.latency_budget_ms = ms
+        return endpoint
+
+    return decorator
+
+
+def mark_endpoint_finished(endpoint: Callable) -> Callable:
+    """Note when the endpoint returns, what follows is response serialization."""
+    if getattr(endpoint, "marks_endpoint_finished", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                stats = request_stats.get()
+                if stats:
+                    stats.endpoint_finished_at = time.perf_counter()
+
+        async_wrapper.marks_endpoint_finished = True
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            stats = request_stats.get()
+            if stats:
+                stats.endpoint_finished_at = time.perf_counter()
+
+    wrapper.marks_endpoint_finished = True
+    return wrapper
+
+
+def pin_request_connection(request: Request) -> contextlib.AbstractAsyncContextManager:
+    if not config.DB_PIN_CONNECTIONS:
+        return contextlib.nullcontext()
+
+    return pinned_connection(
+        read_only=config.DB_READ_ONLY_GET_TRANSACTIONS
+        and request.method in ("GET", "HEAD")
+    )
+
+
+async def cancel_on_disconnect(request: Request, task: asyncio.Task) -> bool:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return task.cancel()
+
+
+def client_disconnected(watcher: asyncio.Task | None) -> bool:
+    return bool(
+        watcher
+        and watcher.done()
+        and not watcher.cancelled()
+        and watcher.exception() is None
+        and watcher.result()
+    )
+
+
+class InstrumentedRoute(APIRoute):
+    """Route that exposes its name to everything running while it is served.
+
+    Dependencies, repositories and queries read it through `current_route`
+    and are traced as children of the span opened for the request.
+
+    Routes declaring a `latency_budget` (or getting DEFAULT_LATENCY_BUDGET_MS) also
+    publish their deadline through `request_deadline`. When they don't read a body,
+    they are cancelled together with their queries if the client disconnects.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        self.dependant.call = mark_endpoint_finished(self.dependant.call)
+        route_handler = super().get_route_handler()
+        route_name = self.name
+        budget_ms = getattr(
+            self.endpoint, "latency_budget_ms", config.DEFAULT_LATENCY_BUDGET_MS
+        )
+        # receiving from the client while the route reads the body would steal it
+        watch_disconnect = bool(budget_ms) and self.body_field is None
+
+        async def instrumented_route_handler(request: Request) -> Response:
+            ROUTE_REQUESTS.inc(route_name)
+            token = current_route.set(route_name)
+            stats = request_stats.get()
+            if stats:
+                stats.route = route_name
+            profiled_task = None
+            if profiler.should_profile(route_name):
+                profiled_task = asyncio.current_task()
+                profiler.add_task(profiled_task)
+            deadline_token = request_deadline.set(
+                (stats.started_at if stats else time.perf_counter()) + budget_ms / 1000
+                if budget_ms
+                else None
+            )
+            disconnect_watcher = None
+            if watch_disconnect:
+                disconnect_watcher = asyncio.create_task(
+                    cancel_on_disconnect(request, asyncio.current_task())
+                )
+            try:
+                with tracer.start_root_span(
+                    route_name,
+                    traceparent=request.headers.get("traceparent"),
+                    attributes={
+                        "http.method": request.method,
+                        "http.route": self.path_format,
+                        "http.target": request.url.path,
+                    },
+                ) as span:
+                    try:
+                        async with pin_request_connection(request):
+                            response = await route_handler(request)
+                    except asyncio.CancelledError:
+                        if not client_disconnected(disconnect_watcher):
+                            raise
+                        # nobody is left to answer, carry on as if nothing happened
+                        asyncio.current_task().uncancel()
+                        ROUTE_DISCONNECTS.inc(route_name)
+                        response = Response(status_code=HTTP_499_CLIENT_CLOSED_REQUEST)
+                    if stats:
+                        stats.handler_finished_at = time.perf_counter()
+                    if span:
+                        span.set_attribute("http.status_code", response.status_code)
+
+                    return response
+            finally:
+                if disconnect_watcher:
+                    disconnect_watcher.cancel()
+                request_deadline.reset(deadline_token)
+                current_route.reset(token)
+                if profiled_task:
+                    profiler.discard_task(profiled_task)
+
+        return instrumented_route_handler
@@ -2,11 +2,22 @@ from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from app.core import config, tasks
-from app.api.routes import router as api_router
+from app.api.middleware import (
+    AccessLogMiddleware,
+    LoadSheddingMiddleware,
+    RequestStatsMiddleware,
+)
+from app.api.openapi import precomputed_openapi
+from app.api.routes import include_api_routers
+from app.api.routes.health import router as health_router
 
 
 def get_application() -> FastAPI:
     app = FastAPI(title=config.PROJECT_NAME, version=config.VERSION)
+    # inside the access log, so shed requests are logged as well
+    app.add_middleware(LoadSheddingMiddleware)
+    # around the load shedding, so shed 503s carry CORS headers for the browser
+    # to read and preflight requests are answered without ever being shed
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -14,11 +25,18 @@ def get_application() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # added last, so it wraps the access log and can hand it the request stats
+    app.add_middleware(AccessLogMiddleware)
+    app.add_middleware(RequestStatsMiddleware)
 
     app.add_event_handler("startup", tasks.create_start_app_handler(app))
     app.add_event_handler("shutdown", tasks.create_stop_app_handler(app))
 
-    app.include_router(api_router, prefix="/api")
+    include_api_routers(app, prefix=config.API_PREFIX)
+    # outside of /api and without a trailing slash, probes don't follow redirects
+    app.include_router(health_router, prefix="/health", tags=["health"])
+
+    app.openapi = precomputed_openapi(app)
 
     return app
 
@@ -0,0 +1,84 @@
+import json
+import queue
+import sys
+import threading
+from typing import Any, TextIO
+
+from app.core.config import (
+    ACCESS_LOG_BUFFER_SIZE,
+    ACCESS_LOG_ENABLED,
+    ACCESS_LOG_FILE,
+)
+from app.core.metrics import registry
+
+ACCESS_LOG_DROPPED = registry.counter(
+    "phresh_access_log_dropped_total",
+    "Number of access log entries dropped because the buffer was full.",
+)
+
+_STOP = object()
+
+
+class AccessLog:
+    """Write access log entries as JSON lines from a background thread.
+
+    Entries are handed over through a bounded queue without ever waiting,
+    when the writer can't keep up they are dropped and counted instead of
+    blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str = ACCESS_LOG_FILE,
+        max_buffer_size: int = ACCESS_LOG_BUFFER_SIZE,
+    ) -> None:
+        self.path = path
+        self.stream: TextIO | None = None
+        self._queue: queue.Queue = queue.Queue(maxsize=max_buffer_size)
+        self._writer: threading.Thread | None = None
+
+    def emit(self, entry: dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            ACCESS_LOG_DROPPED.inc()
+
+    def start(self) -> None:
+        if self._writer and self._writer.is_alive():
+            return
+
+        if self.stream is None and self.path:
+            self.stream = open(self.path, "a")
+        self._writer = threading.Thread(
+            target=self._write, name="access-log-writer", daemon=True
+        )
+        self._writer.start()
+
+    def stop(self) -> None:
+        """Write out everything buffered so far and stop the writer."""
+        if not self._writer or not self._writer.is_alive():
+            return
+
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def _write(self) -> None:
+        while True:
+            entry = self._queue.get()
+            stream = self.stream or sys.stdout
+            if entry is _STOP:
+                stream.flush()
+                return
+
+            stream.write(json.dumps(entry, default=str) + "\n")
+            if self._queue.empty():
+                stream.flush()
+
+
+access_log = AccessLog()
+
+
+def start_access_log() -> None:
+    if ACCESS_LOG_ENABLED:
+        access_log.start()
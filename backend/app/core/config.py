@@ -1,6 +1,8 @@
+import os
+
 from databases import DatabaseURL
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
 
 config = Config(".env")
 
@@ -29,3 +31,114 @@ DATABASE_URL = config(
     cast=DatabaseURL,
     default=f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}",
 )
+
+# "databases" runs queries through the databases library, "asyncpg" sends the
+# repositories' SQL straight to the pooled asyncpg connections
+DB_ENGINE = config("DB_ENGINE", cast=str, default="databases")
+# decode numeric columns straight into floats on every pooled connection
+DB_TYPE_CODECS = config("DB_TYPE_CODECS", cast=bool, default=True)
+
+# `python -m app` forks this many workers, all sharing one listening socket
+HOST = config("HOST", cast=str, default="0.0.0.0")
+PORT = config("PORT", cast=int, default=8000)
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", cast=int, default=os.cpu_count() or 1)
+
+# connections all workers of a node may hold together, split evenly between them,
+# without a budget every worker gets a pool of the fixed min and max size
+DB_CONNECTION_BUDGET = config("DB_CONNECTION_BUDGET", cast=int, default=0)
+DB_POOL_MIN_SIZE = config("DB_POOL_MIN_SIZE", cast=int, default=2)
+DB_POOL_MAX_SIZE = config("DB_POOL_MAX_SIZE", cast=int, default=10)
+# pools the database couldn't be reached for at startup are connected again this often
+DB_RECONNECT_INTERVAL_SECONDS = config(
+    "DB_RECONNECT_INTERVAL_SECONDS", cast=float, default=1.0
+)
+
+# separate pools ("name:max_size,...", e.g. "feed:3,analytics:2"), so heavy reads
+# can't starve the default one, within a budget their connections are taken off the
+# default pool of every worker, none unless configured
+DB_BULKHEAD_POOLS = config("DB_BULKHEAD_POOLS", cast=CommaSeparatedStrings, default="")
+
+# independent lookups of one request may run on this many pooled connections at once
+DB_REQUEST_CONCURRENCY = config("DB_REQUEST_CONCURRENCY", cast=int, default=3)
+
+# keep the first connection a request acquires until it has been served,
+# GET requests can additionally run all their queries in a read-only transaction
+DB_PIN_CONNECTIONS = config("DB_PIN_CONNECTIONS", cast=bool, default=False)
+DB_READ_ONLY_GET_TRANSACTIONS = config(
+    "DB_READ_ONLY_GET_TRANSACTIONS", cast=bool, default=False
+)
+
+# routes without a latency budget of their own get this one, 0 leaves them unbounded,
+# queries of budgeted routes are cancelled on the server when the budget runs out
+DEFAULT_LATENCY_BUDGET_MS = config("DEFAULT_LATENCY_BUDGET_MS", cast=float, default=0)
+
+# requests over the adaptive concurrency limit of a worker are rejected right away
+# with a 503, the limit follows the latency observed while serving them (opt-in,
+# tune the limits to the deployment before enabling it)
+LOAD_SHEDDING_ENABLED = config("LOAD_SHEDDING_ENABLED", cast=bool, default=False)
+LOAD_SHEDDING_INITIAL_LIMIT = config(
+    "LOAD_SHEDDING_INITIAL_LIMIT", cast=int, default=20
+)
+LOAD_SHEDDING_MIN_LIMIT = config("LOAD_SHEDDING_MIN_LIMIT", cast=int, default=4)
+LOAD_SHEDDING_MAX_LIMIT = config("LOAD_SHEDDING_MAX_LIMIT", cast=int, default=200)
+LOAD_SHEDDING_RETRY_AFTER_SECONDS = config(
+    "LOAD_SHEDDING_RETRY_AFTER_SECONDS", cast=int, default=1
+)
+
+# statements slower than the threshold get their parameters and plan captured
+SLOW_QUERY_THRESHOLD_MS = config("SLOW_QUERY_THRESHOLD_MS", cast=float, default=250)
+SLOW_QUERY_SAMPLE_RATE = config("SLOW_QUERY_SAMPLE_RATE", cast=float, default=1.0)
+SLOW_QUERY_MAX_CAPTURES_PER_MINUTE = config(
+    "SLOW_QUERY_MAX_CAPTURES_PER_MINUTE", cast=int, default=10
+)
+SLOW_QUERY_EXPLAIN = config("SLOW_QUERY_EXPLAIN", cast=bool, default=True)
+SLOW_QUERY_LOG_FILE = config("SLOW_QUERY_LOG_FILE", cast=str, default="")
+SLOW_QUERY_LOG_MAX_BYTES = config(
+    "SLOW_QUERY_LOG_MAX_BYTES", cast=int, default=10 * 1024 * 1024
+)
+SLOW_QUERY_LOG_BACKUP_COUNT = config("SLOW_QUERY_LOG_BACKUP_COUNT", cast=int, default=5)
+
+# request tracing, spans are exported to a JSON lines file or an OTLP/HTTP collector
+TRACING_EXPORTER = config("TRACING_EXPORTER", cast=str, default="")  # "file" | "otlp"
+TRACING_SAMPLE_RATE = config("TRACING_SAMPLE_RATE", cast=float, default=1.0)
+TRACING_FILE = config("TRACING_FILE", cast=str, default="spans.jsonl")
+TRACING_OTLP_ENDPOINT = config(
+    "TRACING_OTLP_ENDPOINT", cast=str, default="http://localhost:4318/v1/traces"
+)
+
+# collapsed stacks of admin triggered profiling sessions are written here
+PROFILER_OUTPUT_DIR = config("PROFILER_OUTPUT_DIR", cast=str, default="profiles")
+
+# event loop lag is measured every interval, callbacks blocking the loop longer
+# than the threshold get the stack of the offending code logged (opt-in, it runs
+# a watchdog thread in every worker)
+LOOP_MONITOR_ENABLED = config("LOOP_MONITOR_ENABLED", cast=bool, default=False)
+LOOP_MONITOR_INTERVAL_MS = config("LOOP_MONITOR_INTERVAL_MS", cast=float, default=100)
+LOOP_BLOCKING_THRESHOLD_MS = config(
+    "LOOP_BLOCKING_THRESHOLD_MS", cast=float, default=200
+)
+
+# add Server-Timing headers with handler, SQL, connection acquire and serialization time
+SERVER_TIMING_ENABLED = config("SERVER_TIMING_ENABLED", cast=bool, default=False)
+
+# structured JSON access log, written from a background thread (stdout if no file),
+# opt-in like Server-Timing
+ACCESS_LOG_ENABLED = config("ACCESS_LOG_ENABLED", cast=bool, default=False)
+ACCESS_LOG_FILE = config("ACCESS_LOG_FILE", cast=str, default="")
+ACCESS_LOG_BUFFER_SIZE = config("ACCESS_LOG_BUFFER_SIZE", cast=int, default=10_000)
+
+# a worker is reported as not ready when the database doesn't answer in time
+# or too many requests are queueing for a pooled connection
+READINESS_TIMEOUT_SECONDS = config("READINESS_TIMEOUT_SECONDS", cast=float, default=1.0)
+READINESS_MAX_POOL_WAITERS = config("READINESS_MAX_POOL_WAITERS", cast=int, default=10)
+
+# before serving, every worker prepares the hot statements on its pooled connections
+# and reads the first feed page and the top cleaners' ratings into the database cache
+WARMUP_ENABLED = config("WARMUP_ENABLED", cast=bool, default=True)
+WARMUP_TIMEOUT_SECONDS = config("WARMUP_TIMEOUT_SECONDS", cast=float, default=10.0)
+WARMUP_FEED_PAGE_SIZE = config("WARMUP_FEED_PAGE_SIZE", cast=int, default=20)
+WARMUP_TOP_CLEANERS = config("WARMUP_TOP_CLEANERS", cast=int, default=20)
+
+# OpenAPI schema written while the image is built (`python -m app.api.openapi`),
+# served instead of generating it on the first request to the docs
+OPENAPI_SCHEMA_FILE = config("OPENAPI_SCHEMA_FILE", cast=str, default="openapi.json")
@@ -0,0 +1,45 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+UNKNOWN_ROUTE = "unknown"
+
+# name of the route currently being served, e.g. "offers:accept-offer-from-user"
+current_route: ContextVar[str] = ContextVar("current_route", default=UNKNOWN_ROUTE)
+
+
+@dataclass
+class RequestStats:
+    """Cost of a single request, fed by the route, the database and the middleware."""
+
+    started_at: float = field(default_factory=time.perf_counter)
+    route: str = UNKNOWN_ROUTE
+    user_id: int | None = None
+    queries: int = 0
+    query_time: float = 0.0
+    rows: int = 0
+    acquire_time: float = 0.0
+    # connections taken from the pool, a pinned request takes a single one
+    connections: int = 0
+    cache_hits: int = 0
+    # lookups currently running on connections borrowed from the pool
+    fan_out_tasks: int = 0
+    endpoint_finished_at: float | None = None
+    handler_finished_at: float | None = None
+
+    @property
+    def serialization_time(self) -> float:
+        if self.endpoint_finished_at is None or self.handler_finished_at is None:
+            return 0.0
+
+        return self.handler_finished_at - self.endpoint_finished_at
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+# `time.perf_counter()` by which the route being served has to answer, if budgeted
+request_deadline: ContextVar[float | None] = ContextVar(
+    "request_deadline", default=None
+)
@@ -0,0 +1,103 @@
+"""Adaptive concurrency limit of a worker, in the style of Netflix's gradient limiter.
+
+The limit follows the ratio between the baseline (the lowest latency seen
+recently) and the latency of every request served. While requests take less
+than `tolerance` times the baseline the limit keeps growing by a small queue
+allowance, once they take longer it shrinks in proportion, and failures (5xx)
+cut it multiplicatively. It settles where requests start queueing for the
+database, requests over it are rejected right away instead of joining the queue.
+
+Lower priority traffic is only admitted while the worker has headroom left:
+feed polling gets the first part of the limit, authenticated writes all of it.
+"""
+
+import math
+
+from app.core.config import (
+    LOAD_SHEDDING_INITIAL_LIMIT,
+    LOAD_SHEDDING_MAX_LIMIT,
+    LOAD_SHEDDING_MIN_LIMIT,
+)
+from app.core.metrics import registry
+
+PRIORITY_WRITE = "write"
+PRIORITY_READ = "read"
+PRIORITY_FEED = "feed"
+
+# share of the limit requests of each priority may fill
+PRIORITY_SHARES = {PRIORITY_WRITE: 1.0, PRIORITY_READ: 0.9, PRIORITY_FEED: 0.6}
+
+CONCURRENCY_LIMIT = registry.gauge(
+    "phresh_concurrency_limit", "Current adaptive concurrency limit of the worker."
+)
+CONCURRENCY_IN_FLIGHT = registry.gauge(
+    "phresh_concurrency_in_flight", "Requests currently admitted by the limiter."
+)
+LOAD_SHED = registry.counter(
+    "phresh_load_shed_total",
+    "Number of requests rejected over the concurrency limit, by priority.",
+    ("priority",),
+)
+
+
+class GradientLimiter:
+    def __init__(
+        self,
+        *,
+        initial_limit: int = LOAD_SHEDDING_INITIAL_LIMIT,
+        min_limit: int = LOAD_SHEDDING_MIN_LIMIT,
+        max_limit: int = LOAD_SHEDDING_MAX_LIMIT,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        baseline_drift: float = 1.0001,
+        backoff_ratio: float = 0.9,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.baseline_drift = baseline_drift
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self.baseline_latency: float | None = None
+        CONCURRENCY_LIMIT.set(value=self.limit)
+
+    def try_acquire(self, *, priority: str = PRIORITY_READ) -> bool:
+        if self.in_flight >= max(self.limit * PRIORITY_SHARES[priority], 1):
+            LOAD_SHED.inc(priority)
+            return False
+
+        self.in_flight += 1
+        CONCURRENCY_IN_FLIGHT.set(value=self.in_flight)
+        return True
+
+    def release(self, *, latency: float, failed: bool = False) -> None:
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        CONCURRENCY_IN_FLIGHT.set(value=self.in_flight)
+
+        if failed:
+            self._set_limit(self.limit * self.backoff_ratio)
+        else:
+            self._update_limit(latency=max(latency, 1e-6), in_flight=in_flight)
+
+    def _update_limit(self, *, latency: float, in_flight: int) -> None:
+        # the baseline creeps up, so it follows a database that got slower for good
+        baseline = self.baseline_latency or latency
+        self.baseline_latency = min(baseline * self.baseline_drift, latency)
+
+        # a worker that never gets close to its limit learns nothing about it
+        if in_flight < self.limit / 2:
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.baseline_latency / latency))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        self._set_limit(self.limit * (1 - self.smoothing) + new_limit * self.smoothing)
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        CONCURRENCY_LIMIT.set(value=self.limit)
+
+
+load_shedder = GradientLimiter()
@@ -0,0 +1,126 @@
+"""Event loop lag monitor and blocking call detector.
+
+A task on the loop sleeps for a fixed interval and records how late it wakes up,
+which is the time every other callback had to wait as well. A watchdog thread
+checks the heartbeat left by that task, when it stops for longer than the
+blocking threshold, the stack of the loop thread is logged while it is still
+stuck in the offending code.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app.core.config import (
+    LOOP_BLOCKING_THRESHOLD_MS,
+    LOOP_MONITOR_ENABLED,
+    LOOP_MONITOR_INTERVAL_MS,
+)
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = registry.histogram(
+    "phresh_event_loop_lag_seconds",
+    "Delay between the scheduled and the actual wake up of a loop callback.",
+)
+LOOP_LAG_LAST = registry.gauge(
+    "phresh_event_loop_lag_last_seconds",
+    "Most recently measured event loop lag.",
+)
+LOOP_BLOCKED = registry.counter(
+    "phresh_event_loop_blocked_total",
+    "Number of times a callback blocked the event loop above the threshold.",
+)
+
+
+class EventLoopMonitor:
+    def __init__(
+        self,
+        *,
+        interval_ms: float = LOOP_MONITOR_INTERVAL_MS,
+        blocking_threshold_ms: float = LOOP_BLOCKING_THRESHOLD_MS,
+    ) -> None:
+        self.interval = interval_ms / 1000
+        self.blocking_threshold = blocking_threshold_ms / 1000
+        self._heartbeat = time.monotonic()
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: int | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure_lag())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="event-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _measure_lag(self) -> None:
+        while True:
+            scheduled_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - scheduled_at - self.interval, 0)
+            LOOP_LAG.observe(value=lag)
+            LOOP_LAG_LAST.set(value=lag)
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        while not self._stopped.wait(self.blocking_threshold / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            if blocked_for < self.blocking_threshold or heartbeat == reported_heartbeat:
+                continue
+
+            # report every stall once, while the loop thread is still inside it
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            LOOP_BLOCKED.inc()
+            logger.warning(
+                "Event loop blocked for at least %.0f ms, loop thread stack:\n%s",
+                blocked_for * 1000,
+                "".join(traceback.format_stack(frame)),
+            )
+
+
+loop_monitor = EventLoopMonitor()
+
+
+def start_loop_monitor() -> None:
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+
+async def stop_loop_monitor() -> None:
+    await loop_monitor.stop()
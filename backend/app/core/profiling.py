@@ -0,0 +1,166 @@
+"""Statistical profiler that can be switched on in a running worker.
+
+A background thread periodically grabs the stack of the event loop thread and
+aggregates it into collapsed stacks (`frame;frame;frame count`), the input format
+of flamegraph.pl, speedscope and most other flamegraph renderers.
+"""
+
+import asyncio
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import FrameType
+
+from app.core.config import PROFILER_OUTPUT_DIR
+from app.models.profiler import ProfilerSessionCreate, ProfilerSessionPublic
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profiling session is started while another one runs."""
+
+
+def frame_name(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_qualname}".replace(";", ":")
+
+
+def collapse_stack(frame: FrameType) -> str:
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+
+    return ";".join(reversed(names))
+
+
+class ProfilingSession:
+    def __init__(
+        self,
+        *,
+        options: ProfilerSessionCreate,
+        loop: asyncio.AbstractEventLoop,
+        loop_thread_id: int,
+    ) -> None:
+        self.options = options
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.started_at = datetime.now(tz=timezone.utc)
+        self.deadline = time.monotonic() + options.duration
+        self.stacks: Counter[str] = Counter()
+        self.idle_samples = 0
+        self.profiled_tasks: set[asyncio.Task] = set()
+        self.output_file: Path | None = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        # the thread finishes its last sample and writes the file, off the loop
+        await asyncio.to_thread(self._thread.join)
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+
+        task = asyncio.current_task(self.loop)
+        if self.options.route is not None:
+            if task not in self.profiled_tasks:
+                return
+        elif task is None:
+            # the loop is waiting for I/O
+            self.idle_samples += 1
+            return
+
+        self.stacks[collapse_stack(frame)] += 1
+
+    def _run(self) -> None:
+        interval = self.options.interval_ms / 1000
+        while time.monotonic() < self.deadline and not self._stopped.wait(interval):
+            self._sample()
+
+        self.output_file = self._write()
+
+    def _write(self) -> Path:
+        output_dir = Path(PROFILER_OUTPUT_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        scope = (self.options.route or "all").replace(":", "-")
+        output_file = output_dir / f"{self.started_at:%Y%m%dT%H%M%S}-{scope}.collapsed"
+        output_file.write_text(self.collapsed())
+
+        return output_file
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def public(self) -> ProfilerSessionPublic:
+        return ProfilerSessionPublic(
+            **self.options.dict(),
+            started_at=self.started_at,
+            ends_at=self.started_at + timedelta(seconds=self.options.duration),
+            running=self.running,
+            samples=sum(self.stacks.values()),
+            idle_samples=self.idle_samples,
+            output_file=str(self.output_file) if self.output_file else None,
+        )
+
+
+class SamplingProfiler:
+    def __init__(self) -> None:
+        self.session: ProfilingSession | None = None
+
+    def start(self, *, options: ProfilerSessionCreate) -> ProfilingSession:
+        """Start sampling the event loop this coroutine is called from."""
+        if self.session and self.session.running:
+            raise ProfilerBusyError("A profiling session is already running.")
+
+        self.session = ProfilingSession(
+            options=options,
+            loop=asyncio.get_running_loop(),
+            loop_thread_id=threading.get_ident(),
+        )
+        self.session.start()
+
+        return self.session
+
+    async def stop(self) -> ProfilingSession | None:
+        if self.session and self.session.running:
+            await self.session.stop()
+
+        return self.session
+
+    def should_profile(self, route_name: str) -> bool:
+        """Whether the current request to `route_name` is part of the session."""
+        session = self.session
+        return (
+            session is not None
+            and session.options.route == route_name
+            and session.running
+            and random.random() < session.options.request_sample_rate
+        )
+
+    def add_task(self, task: asyncio.Task) -> None:
+        if self.session:
+            self.session.profiled_tasks.add(task)
+
+    def discard_task(self, task: asyncio.Task) -> None:
+        if self.session:
+            self.session.profiled_tasks.discard(task)
+
+
+profiler = SamplingProfiler()
@@ -1,17 +1,32 @@
+import asyncio
 from typing import Callable
 from fastapi import FastAPI
+from app.core.access_log import access_log, start_access_log
+from app.core.loop_monitor import start_loop_monitor, stop_loop_monitor
+from app.core.tracing import tracer
 from app.db.tasks import connect_to_db, close_db_connection
+from app.db.warmup import warm_up
 
 
 def create_start_app_handler(app: FastAPI) -> Callable:
     async def start_app() -> None:
         await connect_to_db(app)
+        # the worker only starts accepting requests once this returns
+        await asyncio.gather(
+            *(warm_up(database) for database in app.state._pools.values())
+        )
+        start_loop_monitor()
+        start_access_log()
 
     return start_app
 
 
 def create_stop_app_handler(app: FastAPI) -> Callable:
     async def stop_app() -> None:
+        await stop_loop_monitor()
         await close_db_connection(app)
+        # write out what the last requests left behind before the worker exits
+        await asyncio.to_thread(tracer.flush)
+        await asyncio.to_thread(access_log.stop)
 
     return stop_app
@@ -0,0 +1,396 @@
+"""Lightweight request tracing.
+
+The active span lives in a context variable, so dependencies, repository methods
+and SQL statements executed while a route is served become children of the route
+span. Finished spans are exported in batches from a background thread, either as
+JSON lines to a local file or as OTLP/HTTP JSON to a collector.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from app.core.config import (
+    PROJECT_NAME,
+    TRACING_EXPORTER,
+    TRACING_FILE,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SAMPLE_RATE,
+    VERSION,
+)
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_CODE_UNSET = 0
+STATUS_CODE_ERROR = 2
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None = None
+    kind: int = SPAN_KIND_INTERNAL
+    start_time_ns: int = field(default_factory=time.time_ns)
+    end_time_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": STATUS_CODE_UNSET},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.error:
+            span["status"] = {"code": STATUS_CODE_ERROR, "message": self.error}
+
+        return span
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def parse_traceparent(traceparent: str) -> tuple[str, str, bool] | None:
+    """Parse a W3C `traceparent` header into trace id, parent span id and sampled flag."""
+    parts = traceparent.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+
+    try:
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None:
+        ...
+
+
+class FileSpanExporter:
+    """Append spans to a local file, one OTLP JSON span per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        with open(self.path, "a") as spans_file:
+            for span in spans:
+                spans_file.write(json.dumps(span.to_otlp()) + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Send spans to an OTLP/HTTP collector using the JSON protobuf encoding."""
+
+    def __init__(
+        self, endpoint: str, *, service_name: str = PROJECT_NAME, timeout: float = 5
+    ) -> None:
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.resource = {
+            "attributes": _otlp_attributes(
+                {"service.name": service_name, "service.version": VERSION}
+            )
+        }
+
+    def export(self, spans: list[Span]) -> None:
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": self.resource,
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    def __init__(
+        self,
+        *,
+        exporter: SpanExporter | None = None,
+        sample_rate: float = 1.0,
+        max_batch_size: int = 512,
+        flush_interval: float = 2.0,
+        max_queue_size: int = 10_000,
+    ) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[Span | threading.Event] = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def start_root_span(
+        self,
+        name: str,
+        *,
+        traceparent: str | None = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> Iterator[Span | None]:
+        """Start the span of a request, continuing the caller's trace if given."""
+        if not self.enabled:
+            yield None
+            return
+
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent:
+            trace_id, parent_span_id, sampled = parent
+        else:
+            trace_id, parent_span_id = new_trace_id(), None
+            sampled = random.random() < self.sample_rate
+
+        if not sampled:
+            yield None
+            return
+
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=new_span_id(),
+            parent_span_id=parent_span_id,
+            kind=SPAN_KIND_SERVER,
+            attributes=attributes or {},
+        )
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        *,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: dict[str, Any] | None = None,
+    ) -> Iterator[Span | None]:
+        """Start a child of the current span, does nothing outside of a trace."""
+        parent = current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id,
+            span_id=new_span_id(),
+            parent_span_id=parent.span_id,
+            kind=kind,
+            attributes=attributes or {},
+        )
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[Span]:
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current_span.reset(token)
+            span.end_time_ns = time.time_ns()
+            self._enqueue(span)
+
+    def record_span(
+        self,
+        name: str,
+        *,
+        duration: float,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: dict[str, Any] | None = None,
+    ) -> None:
+        """Record an operation that just finished as a child of the current span."""
+        parent = current_span.get()
+        if parent is None:
+            return
+
+        end_time_ns = time.time_ns()
+        self._enqueue(
+            Span(
+                name=name,
+                trace_id=parent.trace_id,
+                span_id=new_span_id(),
+                parent_span_id=parent.span_id,
+                kind=kind,
+                start_time_ns=end_time_ns - int(duration * 1e9),
+                end_time_ns=end_time_ns,
+                attributes=attributes or {},
+            )
+        )
+
+    def _enqueue(self, item: Span | threading.Event) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning("Span queue is full, dropping %s", item)
+            return
+
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(
+                        target=self._run, name="span-exporter", daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self) -> None:
+        batch: list[Span] = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, Span):
+                batch.append(item)
+                if len(batch) < self.max_batch_size:
+                    continue
+
+            if batch:
+                self._export(batch)
+                batch = []
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _export(self, batch: list[Span]) -> None:
+        exporter = self.exporter
+        if exporter is None:
+            return
+
+        try:
+            exporter.export(batch)
+        except Exception as e:
+            logger.warning("Unable to export %d spans: %s", len(batch), e)
+
+    def flush(self, timeout: float = 5) -> bool:
+        """Block until every span finished so far has been exported."""
+        if self._worker is None or not self._worker.is_alive():
+            return True
+
+        flushed = threading.Event()
+        self._enqueue(flushed)
+        return flushed.wait(timeout)
+
+
+def build_exporter(name: str) -> SpanExporter | None:
+    if name == "file":
+        return FileSpanExporter(TRACING_FILE)
+    if name == "otlp":
+        return OTLPHttpSpanExporter(TRACING_OTLP_ENDPOINT)
+    return None
+
+
+tracer = Tracer(
+    exporter=build_exporter(TRACING_EXPORTER), sample_rate=TRACING_SAMPLE_RATE
+)
+
+
+def traced(func: Callable | None = None, *, name: str | None = None) -> Callable:
+    """Run the decorated function inside a span named after it.
+
+    Signature and coroutine-ness are preserved, so decorated functions can still
+    be used as FastAPI dependencies.
+    """
+    if func is None:
+        return functools.partial(traced, name=name)
+
+    span_name = name or func.__qualname__
+    attributes = {"code.function": func.__name__, "code.namespace": func.__module__}
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            if current_span.get() is None:
+                return await func(*args, **kwargs)
+
+            with tracer.start_span(span_name, attributes=attributes):
+                return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if current_span.get() is None:
+            return func(*args, **kwargs)
+
+        with tracer.start_span(span_name, attributes=attributes):
+            return func(*args, **kwargs)
+
+    return wrapper
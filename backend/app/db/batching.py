@@ -0,0 +1,133 @@
+"""Send several independent lookups to the database in a single round trip.
+
+asyncpg only pipelines the same statement over many sets of arguments, there is
+no way to queue different parameterized statements and read all their results.
+Read-only statements are combined into one SELECT instead, each of them a
+subquery whose columns come back aggregated into an array per column, so the
+network latency to the database is paid once for all of them.
+
+The arrays keep the column types, so the values are decoded by asyncpg and the
+pool's codecs exactly like the ones of a record. To know the columns, every
+statement is described by the database the first time it is batched. All the
+arrays of a statement are ordered by the same row number, which follows the
+statement's own trailing ORDER BY (its sort keys have to be output columns).
+"""
+
+import re
+from functools import lru_cache
+from typing import Any
+
+from app.db.instrumentation import get_query_name, register_query_name
+from app.db.native import PARAMETER, compile_query
+from databases import Database
+
+# a statement and the values of its `:name` parameters
+Statement = tuple[str, dict[str, Any]]
+
+ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+ROW_LIMIT = re.compile(r"\b(?:LIMIT|OFFSET|FETCH)\b", re.IGNORECASE)
+ROW_NUMBER = "batch_row_number"
+
+# names of the columns every statement batched so far returns
+statement_columns: dict[str, tuple[str, ...]] = {}
+
+
+def batch_parameter(index: int, name: str) -> str:
+    return f"q{index}_{name}"
+
+
+def batch_column(index: int, position: int) -> str:
+    return f"q{index}_{position}"
+
+
+def is_top_level(sql: str) -> bool:
+    depth = 0
+    for char in sql:
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if depth < 0:
+            return False
+
+    return depth == 0
+
+
+def get_sort_keys(query: str) -> str | None:
+    """Sort keys of the ORDER BY the statement ends with, if any."""
+    for match in reversed(list(ORDER_BY.finditer(query))):
+        rest = query[match.end() :]
+        if is_top_level(rest):
+            return ROW_LIMIT.split(rest, maxsplit=1)[0].strip()
+
+    return None
+
+
+async def describe_statement(database: Database, query: str) -> tuple[str, ...]:
+    """Names of the columns `query` returns, the database is only asked once."""
+    if query not in statement_columns:
+        sql, _ = compile_query(query)
+        async with database.connection() as connection:
+            async with connection._query_lock:
+                statement = await connection.raw_connection.prepare(sql)
+                statement_columns[query] = tuple(
+                    attribute.name for attribute in statement.get_attributes()
+                )
+
+    return statement_columns[query]
+
+
+@lru_cache(maxsize=256)
+def compile_batch(statements: tuple[tuple[str, tuple[str, ...]], ...]) -> str:
+    """Combine read-only statements and their columns into one.
+
+    Column `q<n>_<m>` holds the values of the mth column of the nth statement.
+    """
+    subqueries = []
+    for index, (query, columns) in enumerate(statements):
+        query = query.strip().rstrip(";")
+        subquery = PARAMETER.sub(
+            lambda match: f":{batch_parameter(index, match.group(1))}", query
+        )
+        sort_keys = get_sort_keys(query)
+        order = f"ORDER BY {sort_keys}" if sort_keys else ""
+        aggregates = ",\n           ".join(
+            f'array_agg(q{index}."{column}" ORDER BY q{index}.{ROW_NUMBER})'
+            f" AS {batch_column(index, position)}"
+            for position, column in enumerate(columns)
+        )
+        subqueries.append(
+            f"(SELECT {aggregates}\n"
+            f"    FROM (SELECT q{index}.*, row_number() OVER ({order}) AS {ROW_NUMBER}"
+            f" FROM ({subquery}) AS q{index}) AS q{index}) AS s{index}"
+        )
+    batch = "SELECT *\nFROM " + ",\n     ".join(subqueries) + ";"
+    register_query_name(
+        batch, "+".join(get_query_name(query) for query, _ in statements)
+    )
+
+    return batch
+
+
+async def fetch_batch(
+    database: Database, *statements: Statement
+) -> list[list[dict[str, Any]]]:
+    """Run read-only statements in one round trip, returns the rows of each in order."""
+    columns = [await describe_statement(database, query) for query, _ in statements]
+    query = compile_batch(
+        tuple(zip((query for query, _ in statements), columns, strict=True))
+    )
+    values = {
+        batch_parameter(index, name): value
+        for index, (_, statement_values) in enumerate(statements)
+        for name, value in statement_values.items()
+    }
+    record = await database.fetch_one(query, values)
+
+    results = []
+    for index, names in enumerate(columns):
+        # without rows every aggregate is NULL
+        arrays = [
+            record[batch_column(index, position)] or []
+            for position in range(len(names))
+        ]
+        results.append([dict(zip(names, row)) for row in zip(*arrays)])
+
+    return results
@@ -0,0 +1,171 @@
+"""Side-by-side per-query overhead of the two query engines.
+
+    python -m app.db.benchmark [iterations]
+
+Both engines run the same statements on a single pooled connection, one query
+at a time, so the difference is the time each spends outside of Postgres.
+
+Then 10k cleaning rows are fetched and turned into models with asyncpg's
+built-in codecs and with the ones of app.db.codecs, to show the decoding cost
+they save.
+"""
+
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+from collections.abc import Callable
+
+from app.core.config import DATABASE_URL
+from app.db.codecs import register_codecs
+from app.db.native import AsyncpgEngine
+from app.models.cleaning import CleaningInDB
+from databases import Database
+
+DEFAULT_ITERATIONS = 2000
+DECODE_ITERATIONS = 50
+
+BENCHMARK_QUERIES = {
+    "one row": (
+        "SELECT CAST(:id AS integer) AS id, 'username' AS username, now() AS created_at",
+        {"id": 1},
+    ),
+    "20 rows": (
+        "SELECT g AS id, 'username' || g AS username, now() AS created_at "
+        "FROM generate_series(1, :rows) AS g",
+        {"rows": 20},
+    ),
+}
+
+DECODE_QUERY = """
+    SELECT g AS id,
+           'cleaning ' || g AS name,
+           NULL AS description,
+           CAST(g % 1000 AS numeric(10, 2)) AS price,
+           'spot_clean' AS cleaning_type,
+           1 AS owner,
+           now() AS created_at,
+           now() AS updated_at
+    FROM generate_series(1, :rows) AS g
+"""
+DECODE_ROWS = 10_000
+
+
+async def time_queries(
+    fetch: Callable, query: str, values: dict, *, iterations: int
+) -> float:
+    """Mean seconds per query."""
+    for _ in range(iterations // 10):
+        await fetch(query, values)
+
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        await fetch(query, values)
+
+    return (time.perf_counter() - started_at) / iterations
+
+
+async def run_benchmark(
+    *, url: str, iterations: int = DEFAULT_ITERATIONS
+) -> dict[str, dict[str, float]]:
+    """Mean seconds per query of every benchmark query, by engine."""
+    engines = {
+        "databases": Database(url, min_size=1, max_size=1),
+        "asyncpg": AsyncpgEngine(url, min_size=1, max_size=1),
+    }
+    results: dict[str, dict[str, float]] = {}
+    for engine_name, database in engines.items():
+        await database.connect()
+        try:
+            # keep the connection checked out, only the query path is measured
+            async with database.connection():
+                results[engine_name] = {
+                    name: await time_queries(
+                        database.fetch_all, query, values, iterations=iterations
+                    )
+                    for name, (query, values) in BENCHMARK_QUERIES.items()
+                }
+        finally:
+            await database.disconnect()
+
+    return results
+
+
+async def time_decoding(
+    databases: dict[str, Database], *, rows: int, iterations: int
+) -> dict[str, dict[str, float]]:
+    """Median seconds to fetch the rows, and to fetch them and build the models.
+
+    The databases take turns, so noise on the machine hits all of them alike.
+    """
+    values = {"rows": rows}
+    timings: dict[str, dict[str, list[float]]] = {
+        name: {"fetch": [], "fetch + models": []} for name in databases
+    }
+    for _ in range(iterations):
+        for name, database in databases.items():
+            started_at = time.perf_counter()
+            records = await database.fetch_all(DECODE_QUERY, values)
+            fetched_at = time.perf_counter()
+            [CleaningInDB(**record) for record in records]
+            timings[name]["fetch"].append(fetched_at - started_at)
+            timings[name]["fetch + models"].append(time.perf_counter() - started_at)
+
+    return {
+        name: {step: statistics.median(times) for step, times in steps.items()}
+        for name, steps in timings.items()
+    }
+
+
+async def run_decode_benchmark(
+    *, url: str, rows: int = DECODE_ROWS, iterations: int = DECODE_ITERATIONS
+) -> dict[str, dict[str, float]]:
+    """Median seconds per fetch of `rows` cleanings, by codecs used."""
+    databases = {
+        "built-in": AsyncpgEngine(url, min_size=1, max_size=1),
+        "codecs": AsyncpgEngine(url, min_size=1, max_size=1, init=register_codecs),
+    }
+    async with contextlib.AsyncExitStack() as stack:
+        for database in databases.values():
+            await database.connect()
+            stack.push_async_callback(database.disconnect)
+            await stack.enter_async_context(database.connection())
+            # first fetch, the statement is prepared outside of the timings
+            await database.fetch_all(DECODE_QUERY, {"rows": 1})
+
+        return await time_decoding(databases, rows=rows, iterations=iterations)
+
+
+def format_results(results: dict[str, dict[str, float]]) -> str:
+    lines = [f"{'query':<10}{'databases':>14}{'asyncpg':>14}{'saved':>14}"]
+    for name in BENCHMARK_QUERIES:
+        legacy, native = results["databases"][name], results["asyncpg"][name]
+        lines.append(
+            f"{name:<10}{legacy * 1e6:>11.1f} us{native * 1e6:>11.1f} us"
+            f"{(legacy - native) * 1e6:>11.1f} us"
+        )
+
+    return "\n".join(lines)
+
+
+def format_decode_results(results: dict[str, dict[str, float]]) -> str:
+    lines = [f"{'10k rows':<16}{'built-in':>14}{'codecs':>14}{'saved':>14}"]
+    for name, builtin in results["built-in"].items():
+        codecs = results["codecs"][name]
+        lines.append(
+            f"{name:<16}{builtin * 1e3:>11.1f} ms{codecs * 1e3:>11.1f} ms"
+            f"{(builtin - codecs) * 1e3:>11.1f} ms"
+        )
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    url = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else str(DATABASE_URL)
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITERATIONS
+    results = asyncio.run(run_benchmark(url=url, iterations=iterations))
+    print(format_results(results))
+    print()
+    print(format_decode_results(asyncio.run(run_decode_benchmark(url=url))))
@@ -0,0 +1,52 @@
+"""Type codecs registered on every connection of the pools.
+
+asyncpg decodes `numeric` into `Decimal`, which the models convert to `float`
+again for every row (`cleanings.price`, the evaluation averages). Decoding the
+text representation with `float` right away skips the `Decimal` altogether.
+
+The enum types of offer status and cleaning type are decoded straight into the
+members of the model enums, which the models then take as they are.
+
+Timestamps keep asyncpg's built-in codec, it already returns the `datetime` the
+models use and is faster than any codec written in Python.
+"""
+
+from collections.abc import Callable
+from enum import Enum
+
+import asyncpg
+from app.models.cleaning import CleaningType
+from app.models.offer import OfferStatus
+
+# Postgres enum types and the model enums their values are decoded into
+ENUM_TYPES: dict[str, type[Enum]] = {
+    "offer_status": OfferStatus,
+    "cleaning_type": CleaningType,
+}
+
+
+def encode_enum(enum: type[Enum]) -> Callable[[str | Enum], str]:
+    # `str()` of a str enum member is its qualified name, not its value
+    return lambda value: enum(value).value
+
+
+async def register_codecs(connection: asyncpg.Connection) -> None:
+    await connection.set_type_codec(
+        "numeric",
+        schema="pg_catalog",
+        encoder=str,
+        decoder=float,
+        format="text",
+    )
+    for type_name, enum in ENUM_TYPES.items():
+        try:
+            await connection.set_type_codec(
+                type_name,
+                schema="public",
+                encoder=encode_enum(enum),
+                decoder=enum,
+                format="text",
+            )
+        except ValueError:
+            # not migrated yet, the values are still plain text
+            continue
@@ -0,0 +1,76 @@
+"""Run independent lookups of a request on separate pooled connections.
+
+`databases` binds a connection to the task using it, so queries awaited from one
+task never overlap. `gather` hands all but one of the lookups to tasks of their
+own, each starting with a fresh connection while keeping the request's context
+(stats, route and span). At most DB_REQUEST_CONCURRENCY lookups of a request run
+at once, the ones over the cap run on the request's own connection instead of
+waiting for more, so a single request can neither drain the pool nor deadlock
+on it.
+"""
+
+import asyncio
+import contextvars
+from collections.abc import Coroutine
+from typing import Any
+
+from app.core.config import DB_REQUEST_CONCURRENCY
+from app.core.context import request_stats
+from app.db.instrumentation import connection_pin
+from databases import Database
+
+
+def can_fan_out(database: Database) -> bool:
+    # other connections can't see the writes of an open transaction
+    if database._global_connection is not None:
+        return False
+
+    return not database.connection()._transaction_stack
+
+
+def create_task_on_own_connection(
+    database: Database, coro: Coroutine[Any, Any, Any]
+) -> asyncio.Task:
+    connection_class = type(database.connection())
+    context = contextvars.copy_context()
+    context.run(database._connection_context.set, connection_class(database._backend))
+    context.run(connection_pin.set, None)
+
+    return asyncio.get_running_loop().create_task(coro, context=context)
+
+
+async def gather(
+    database: Database,
+    *coros: Coroutine[Any, Any, Any],
+    limit: int = DB_REQUEST_CONCURRENCY,
+) -> list[Any]:
+    """Await independent lookups concurrently, results come back in order."""
+    if len(coros) < 2 or not can_fan_out(database):
+        return [await coro for coro in coros]
+
+    stats = request_stats.get()
+    running = stats.fan_out_tasks if stats else 0
+    # the request's own connection counts towards the limit
+    borrowed = max(min(len(coros) - 1, limit - 1 - running), 0)
+    if stats:
+        stats.fan_out_tasks += borrowed
+
+    inline, forked = [coros[0], *coros[borrowed + 1 :]], coros[1 : borrowed + 1]
+    tasks = [create_task_on_own_connection(database, coro) for coro in forked]
+    try:
+        inline_results = []
+        for coro in inline:
+            inline_results.append(await coro)
+        forked_results = await asyncio.gather(*tasks)
+    except BaseException:
+        for coro in inline:
+            coro.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        if stats:
+            stats.fan_out_tasks -= borrowed
+
+    return [inline_results[0], *forked_results, *inline_results[1:]]
@@ -0,0 +1,274 @@
+"""Timings of the repositories' queries before and after the index revision.
+
+    python -m app.db.index_benchmark [users]
+
+Seeds `users` users with their profiles, ten cleanings each, five offers on every
+cleaning (every fourth one with an accepted offer) and evaluations for half of
+the accepted offers. Then every `*_QUERY` constant of app/db/repositories whose
+parameters can be filled in from the seeded rows runs under EXPLAIN ANALYZE,
+first with the indexes of the first revision, then with the ones of the index
+revision. Statements changing rows run in a savepoint that is rolled back.
+
+Each phase seeds the same rows in a transaction of its own, so neither runs on
+the leftovers of the other, and rolls it back at the end. The tables stay
+locked while it runs though, so point it at a scratch database.
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import Any
+
+import asyncpg
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from app.core.config import DATABASE_URL
+from app.db.instrumentation import get_query_names
+from app.db.native import bind_query, compile_query
+
+INDEX_REVISION = "3f1c7a9d2b4e"
+DEFAULT_USERS = 2000
+REPEAT = 5
+
+TABLES = (
+    "users",
+    "profiles",
+    "cleanings",
+    "user_offers_for_cleanings",
+    "cleaning_to_cleaner_evaluations",
+)
+SEED_STATEMENTS = (
+    """
+    INSERT INTO users (username, email, password, salt)
+    SELECT 'seeded_' || g, 'seeded_' || g || '@example.com', 'password', 'salt'
+    FROM generate_series(1, $1) AS g
+    """,
+    """
+    INSERT INTO profiles (user_id)
+    SELECT id FROM users WHERE username LIKE 'seeded\\_%'
+    """,
+    """
+    INSERT INTO cleanings (name, price, cleaning_type, owner, created_at, updated_at)
+    SELECT 'cleaning ' || g,
+           g % 500 + 0.99,
+           'spot_clean',
+           owner,
+           created_at,
+           -- every fifth cleaning was updated after it was created
+           CASE WHEN g % 5 = 0 THEN created_at + interval '1 day' ELSE created_at END
+    FROM (
+        SELECT u.id AS owner, g, now() - random() * interval '365 days' AS created_at
+        FROM users u, generate_series(1, 10) AS g
+        WHERE u.username LIKE 'seeded\\_%'
+    ) AS seeded_cleanings
+    """,
+    """
+    WITH seeded_users AS (
+        SELECT id, row_number() OVER (ORDER BY id) - 1 AS n, count(*) OVER () AS total
+        FROM users
+        WHERE username LIKE 'seeded\\_%'
+    )
+    INSERT INTO user_offers_for_cleanings (cleaning_id, user_id, status)
+    SELECT c.id, bidder.id, 'pending'
+    FROM cleanings c
+        INNER JOIN seeded_users owner ON owner.id = c.owner
+        CROSS JOIN generate_series(1, 5) AS k
+        INNER JOIN seeded_users bidder ON bidder.n = (owner.n + k * 7) % owner.total
+    """,
+    # statuses are only set with literals, which fit either column type
+    """
+    UPDATE user_offers_for_cleanings
+    SET status = 'accepted'
+    WHERE (cleaning_id, user_id) IN (
+        SELECT DISTINCT ON (o.cleaning_id) o.cleaning_id, o.user_id
+        FROM user_offers_for_cleanings o
+            INNER JOIN cleanings c ON c.id = o.cleaning_id
+            INNER JOIN users u ON u.id = c.owner
+        WHERE o.cleaning_id % 4 = 0 AND u.username LIKE 'seeded\\_%'
+        ORDER BY o.cleaning_id, o.user_id
+    )
+    """,
+    """
+    UPDATE user_offers_for_cleanings o
+    SET status = 'rejected'
+    FROM cleanings c
+        INNER JOIN users u ON u.id = c.owner
+    WHERE c.id = o.cleaning_id
+        AND o.cleaning_id % 4 = 0
+        AND o.status = 'pending'
+        AND u.username LIKE 'seeded\\_%'
+    """,
+    """
+    INSERT INTO cleaning_to_cleaner_evaluations (
+        cleaning_id, cleaner_id, overall_rating, professionalism, created_at
+    )
+    SELECT o.cleaning_id, o.user_id, o.cleaning_id % 5 + 1, o.user_id % 5 + 1,
+           o.updated_at
+    FROM user_offers_for_cleanings o
+        INNER JOIN cleanings c ON c.id = o.cleaning_id
+        INNER JOIN users u ON u.id = c.owner
+    WHERE o.status = 'accepted'
+        AND o.cleaning_id % 8 = 0
+        AND u.username LIKE 'seeded\\_%'
+    """,
+)
+SAMPLE_VALUES_QUERY = """
+    SELECT o.cleaning_id,
+           o.user_id,
+           c.owner,
+           u.username,
+           u.email,
+           (
+               SELECT cleaner_id
+               FROM cleaning_to_cleaner_evaluations
+               GROUP BY cleaner_id
+               ORDER BY count(*) DESC
+               LIMIT 1
+           ) AS cleaner_id
+    FROM user_offers_for_cleanings o
+        INNER JOIN cleanings c ON c.id = o.cleaning_id
+        INNER JOIN users u ON u.id = o.user_id
+    WHERE o.status = 'pending' AND u.username LIKE 'seeded\\_%'
+    ORDER BY o.cleaning_id
+    LIMIT 1
+"""
+
+
+def get_revision(revision: str) -> ModuleType:
+    script = ScriptDirectory.from_config(Config("alembic.ini"))
+    return script.get_revision(revision).module
+
+
+async def seed(connection: asyncpg.Connection, *, users: int) -> dict[str, Any]:
+    """Seed the tables, returns values for the parameters of the queries."""
+    # the same rows every time, they are spread with `random()`
+    await connection.execute("SELECT setseed(0.5)")
+    # at least 36 users, the five bidders of a cleaning are 7 apart from its owner
+    await connection.execute(SEED_STATEMENTS[0], max(users, 36))
+    for statement in SEED_STATEMENTS[1:]:
+        await connection.execute(statement)
+
+    sample = await connection.fetchrow(SAMPLE_VALUES_QUERY)
+    return {
+        **sample,
+        "id": sample["cleaning_id"],
+        "starting_date": datetime.now(tz=timezone.utc),
+        "page_chunk_size": 20,
+        "limit": 10,
+    }
+
+
+@asynccontextmanager
+async def seeded_transaction(
+    url: str, *, users: int
+) -> AsyncIterator[tuple[asyncpg.Connection, dict[str, Any]]]:
+    """Connection to freshly seeded tables, everything is rolled back afterwards."""
+    connection = await asyncpg.connect(url)
+    transaction = connection.transaction()
+    await transaction.start()
+    try:
+        yield connection, await seed(connection, users=users)
+    finally:
+        await transaction.rollback()
+        await connection.close()
+
+
+async def use_indexes(
+    connection: asyncpg.Connection, *, create: dict[str, str], drop: dict[str, str]
+) -> int:
+    """Swap the indexes in the transaction, returns the size of all of them."""
+    for name in drop:
+        await connection.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, definition in create.items():
+        await connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    await connection.execute(f"ANALYZE {', '.join(TABLES)}")
+
+    return await connection.fetchval(
+        "SELECT sum(pg_relation_size(indexrelid))::bigint FROM pg_index "
+        "WHERE indrelid = ANY(SELECT to_regclass(name) FROM unnest($1::text[]) name)",
+        TABLES,
+    )
+
+
+async def explain_analyze(
+    connection: asyncpg.Connection, query: str, args: list[Any]
+) -> float:
+    """Seconds the statement takes in Postgres, changes are rolled back."""
+    savepoint = connection.transaction()
+    await savepoint.start()
+    try:
+        plan = await connection.fetchval(
+            f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", *args
+        )
+    finally:
+        await savepoint.rollback()
+
+    return json.loads(plan)[0]["Execution Time"] / 1000
+
+
+async def time_queries(
+    connection: asyncpg.Connection, values: dict[str, Any], *, repeat: int
+) -> dict[str, float]:
+    """Median seconds of every query that can be run with `values`."""
+    timings = {}
+    for sql, query_name in sorted(get_query_names().items(), key=lambda item: item[1]):
+        _, names = compile_query(sql)
+        if not set(names) <= set(values):
+            continue
+
+        query, args = bind_query(sql, {name: values[name] for name in names})
+        timings[query_name] = statistics.median(
+            [await explain_analyze(connection, query, args) for _ in range(repeat)]
+        )
+
+    return timings
+
+
+async def run_index_benchmark(
+    *, url: str, users: int = DEFAULT_USERS, repeat: int = REPEAT
+) -> dict[str, dict[str, Any]]:
+    """Query timings and total index size, before and after the index revision."""
+    revision = get_revision(INDEX_REVISION)
+    results = {}
+    for phase, create, drop in (
+        ("before", revision.REPLACED_INDEXES, revision.INDEXES),
+        ("after", revision.INDEXES, revision.REPLACED_INDEXES),
+    ):
+        async with seeded_transaction(url, users=users) as (connection, values):
+            index_bytes = await use_indexes(connection, create=create, drop=drop)
+            results[phase] = {
+                "timings": await time_queries(connection, values, repeat=repeat),
+                "index_bytes": index_bytes,
+            }
+
+    return results
+
+
+def format_results(results: dict[str, dict[str, Any]]) -> str:
+    before, after = results["before"], results["after"]
+    lines = [f"{'query':<48}{'before':>12}{'after':>12}{'saved':>12}"]
+    for query_name, timing in before["timings"].items():
+        indexed = after["timings"][query_name]
+        lines.append(
+            f"{query_name:<48}{timing * 1e3:>9.3f} ms{indexed * 1e3:>9.3f} ms"
+            f"{(timing - indexed) * 1e3:>9.3f} ms"
+        )
+    lines.append(
+        f"{'size of all indexes':<48}{before['index_bytes'] / 2**20:>9.2f} MB"
+        f"{after['index_bytes'] / 2**20:>9.2f} MB"
+        f"{(before['index_bytes'] - after['index_bytes']) / 2**20:>9.2f} MB"
+    )
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    url = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else str(DATABASE_URL)
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USERS
+    print(format_results(asyncio.run(run_index_benchmark(url=url, users=users))))
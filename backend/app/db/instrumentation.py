@@ -0,0 +1,377 @@
+import asyncio
+import importlib
+import pkgutil
+import time
+import typing
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cache
+
+import asyncpg
+from app.core.context import current_route, request_deadline, request_stats
+from app.core.metrics import DEFAULT_SIZE_BUCKETS, registry
+from app.core.tracing import SPAN_KIND_CLIENT, tracer
+from app.db.pools import DEFAULT_POOL
+from app.db.slow_queries import slow_query_log
+from app.models.health import PoolStats
+from databases import Database
+from databases.core import Connection, Transaction
+from databases.interfaces import Record
+from fastapi import HTTPException, status
+from sqlalchemy.sql import ClauseElement
+
+UNNAMED_QUERY = "unnamed"
+
+# SQL put together at runtime from the constants, e.g. batches, by name
+runtime_query_names: dict[str, str] = {}
+
+# seconds left for the statement running in this context, if its route is budgeted
+query_timeout: ContextVar[float | None] = ContextVar(
+    "query_timeout", default=None
+)
+
+QUERY_COUNT = registry.counter(
+    "phresh_db_queries_total",
+    "Number of SQL statements executed, by query constant and route.",
+    ("query", "route"),
+)
+QUERY_LATENCY = registry.histogram(
+    "phresh_db_query_duration_seconds",
+    "Wall-clock time of SQL statements including connection acquisition.",
+    ("query", "route"),
+)
+QUERY_ROWS = registry.histogram(
+    "phresh_db_query_rows",
+    "Number of rows returned by SQL statements.",
+    ("query", "route"),
+    buckets=DEFAULT_SIZE_BUCKETS,
+)
+CONNECTION_ACQUIRE_LATENCY = registry.histogram(
+    "phresh_db_connection_acquire_seconds",
+    "Time spent waiting for a connection from the pool.",
+)
+CONNECTION_ACQUIRE_WAITING = registry.gauge(
+    "phresh_db_connection_acquire_waiting",
+    "Number of tasks currently waiting for a connection from the pool.",
+)
+POOL_SIZE = registry.gauge(
+    "phresh_db_pool_size",
+    "Connections in the pool, by pool and state.",
+    ("pool", "state"),
+)
+LATENCY_BUDGET_EXCEEDED = registry.counter(
+    "phresh_latency_budget_exceeded_total",
+    "Number of queries not run or cancelled because the route ran out of budget.",
+    ("route",),
+)
+
+
+def latency_budget_exceeded() -> HTTPException:
+    LATENCY_BUDGET_EXCEEDED.inc(current_route.get())
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The request ran out of its latency budget.",
+    )
+
+
+@cache
+def get_query_names() -> dict[str, str]:
+    """Map SQL text of every `*_QUERY` constant in app.db.repositories to its name."""
+    import app.db.repositories as repositories
+
+    query_names = {}
+    for module_info in pkgutil.iter_modules(repositories.__path__):
+        module = importlib.import_module(f"{repositories.__name__}.{module_info.name}")
+        for attribute, value in vars(module).items():
+            if attribute.endswith("_QUERY") and isinstance(value, str):
+                query_names[value] = attribute
+
+    return query_names
+
+
+def get_query_name(query: ClauseElement | str) -> str:
+    if not isinstance(query, str):
+        return UNNAMED_QUERY
+
+    query_name = get_query_names().get(query)
+    if query_name is None:
+        return runtime_query_names.get(query, UNNAMED_QUERY)
+
+    return query_name
+
+
+def register_query_name(query: str, query_name: str) -> None:
+    runtime_query_names[query] = query_name
+
+
+@dataclass
+class ConnectionPin:
+    """Connection kept by a request from its first query until it has been served."""
+
+    read_only: bool = False
+    connection: Connection | None = None
+    transaction: Transaction | None = None
+
+    async def hold(self, connection: Connection) -> None:
+        self.connection = connection
+        # one more reference keeps the connection out of the pool until `release`
+        await Connection.__aenter__(connection)
+        if self.read_only:
+            self.transaction = Transaction(
+                lambda: connection, force_rollback=False, readonly=True
+            )
+            await self.transaction.start()
+
+    async def release(self, *, failed: bool = False) -> None:
+        if self.connection is None:
+            return
+
+        connection, transaction = self.connection, self.transaction
+        self.connection = self.transaction = None
+        try:
+            if transaction and failed:
+                await transaction.rollback()
+            elif transaction:
+                await transaction.commit()
+        finally:
+            await connection.__aexit__()
+
+
+connection_pin: ContextVar[ConnectionPin | None] = ContextVar(
+    "connection_pin", default=None
+)
+
+
+@asynccontextmanager
+async def pinned_connection(*, read_only: bool = False) -> AsyncIterator[ConnectionPin]:
+    """Let the first connection acquired inside the block serve everything after it."""
+    pin = ConnectionPin(read_only=read_only)
+    token = connection_pin.set(pin)
+    try:
+        yield pin
+    except BaseException:
+        await pin.release(failed=True)
+        raise
+    else:
+        await pin.release()
+    finally:
+        connection_pin.reset(token)
+
+
+class InstrumentedConnection(Connection):
+    async def __aenter__(self) -> Connection:
+        started_at = time.perf_counter()
+        CONNECTION_ACQUIRE_WAITING.inc()
+        try:
+            connection = await super().__aenter__()
+        finally:
+            CONNECTION_ACQUIRE_WAITING.dec()
+
+        acquire_time = time.perf_counter() - started_at
+        # nested uses of an already acquired connection don't touch the pool
+        stats = request_stats.get()
+        if stats:
+            stats.acquire_time += acquire_time
+        if self._connection_counter == 1:
+            CONNECTION_ACQUIRE_LATENCY.observe(value=acquire_time)
+            if stats:
+                stats.connections += 1
+            pin = connection_pin.get()
+            if pin and pin.connection is None:
+                await pin.hold(self)
+
+        return connection
+
+
+class InstrumentedDatabase(Database):
+    """`databases.Database` that records count, latency and rows for every query.
+
+    Queries are labelled with the name of the repository constant holding their SQL
+    (e.g. `LIST_OFFERS_FOR_CLEANING_QUERY`) and with the route being served.
+    """
+
+    def __init__(
+        self, url: str, *, pool_name: str = DEFAULT_POOL, **options: typing.Any
+    ) -> None:
+        super().__init__(url, **options)
+        self.pool_name = pool_name
+
+    def record_query(
+        self,
+        *,
+        query: ClauseElement | str,
+        values: dict | None,
+        started_at: float,
+        rows: int,
+    ) -> None:
+        duration = time.perf_counter() - started_at
+        query_name, route = get_query_name(query), current_route.get()
+        QUERY_COUNT.inc(query_name, route)
+        QUERY_LATENCY.observe(query_name, route, value=duration)
+        QUERY_ROWS.observe(query_name, route, value=rows)
+
+        stats = request_stats.get()
+        if stats:
+            stats.queries += 1
+            stats.query_time += duration
+            stats.rows += rows
+
+        tracer.record_span(
+            f"SQL {query_name}",
+            duration=duration,
+            kind=SPAN_KIND_CLIENT,
+            attributes={
+                "db.system": "postgresql",
+                "db.statement": query if isinstance(query, str) else str(query),
+                "db.rows": rows,
+            },
+        )
+        slow_query_log.observe(
+            database=self,
+            query=query,
+            values=values,
+            query_name=query_name,
+            route=route,
+            duration=duration,
+        )
+
+    def passes_query_timeout(self, query: ClauseElement | str) -> bool:
+        """Whether the engine hands `query_timeout` to asyncpg for `query`."""
+        return False
+
+    def pool_stats(self) -> PoolStats:
+        pool = getattr(self._backend, "_pool", None)
+        if not self.is_connected or pool is None:
+            return PoolStats()
+
+        size, idle, max_size = pool.get_size(), pool.get_idle_size(), pool.get_max_size()
+        pool_stats = PoolStats(
+            size=size,
+            idle=idle,
+            in_use=size - idle,
+            max_size=max_size,
+            waiting=CONNECTION_ACQUIRE_WAITING.get(),
+            saturation=(size - idle) / max_size,
+        )
+        POOL_SIZE.set(self.pool_name, "idle", value=idle)
+        POOL_SIZE.set(self.pool_name, "in_use", value=size - idle)
+        POOL_SIZE.set(self.pool_name, "max", value=max_size)
+
+        return pool_stats
+
+    @asynccontextmanager
+    async def within_budget(self, query: ClauseElement | str) -> AsyncIterator[None]:
+        """Bound the statement run inside the block by the route's remaining budget."""
+        deadline = request_deadline.get()
+        if deadline is None:
+            yield
+            return
+
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise latency_budget_exceeded()
+
+        # no statements of its own, `databases` doesn't pass a timeout to asyncpg,
+        # so there the call is cancelled instead, either way asyncpg cancels the
+        # statement on the server when the time is up
+        timeout = (
+            nullcontext()
+            if self.passes_query_timeout(query)
+            else asyncio.timeout(remaining)
+        )
+        token = query_timeout.set(remaining)
+        try:
+            async with timeout:
+                yield
+        except (TimeoutError, asyncpg.QueryCanceledError) as e:
+            raise latency_budget_exceeded() from e
+        finally:
+            query_timeout.reset(token)
+
+    def connection(self) -> Connection:
+        # same as `Database.connection` in databases 0.7, with a timed connection
+        if self._global_connection is not None:
+            return self._global_connection
+
+        try:
+            return self._connection_context.get()
+        except LookupError:
+            connection = InstrumentedConnection(self._backend)
+            self._connection_context.set(connection)
+            return connection
+
+    async def fetch_all(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> list[Record]:
+        started_at = time.perf_counter()
+        async with self.within_budget(query):
+            records = await super().fetch_all(query, values)
+        self.record_query(
+            query=query,
+            values=values,
+            started_at=started_at,
+            rows=len(records),
+        )
+
+        return records
+
+    async def fetch_one(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> Record | None:
+        started_at = time.perf_counter()
+        async with self.within_budget(query):
+            record = await super().fetch_one(query, values)
+        self.record_query(
+            query=query,
+            values=values,
+            started_at=started_at,
+            rows=int(bool(record)),
+        )
+
+        return record
+
+    async def fetch_val(
+        self,
+        query: ClauseElement | str,
+        values: dict | None = None,
+        column: typing.Any = 0,
+    ) -> typing.Any:
+        started_at = time.perf_counter()
+        async with self.within_budget(query):
+            value = await super().fetch_val(query, values, column=column)
+        self.record_query(
+            query=query,
+            values=values,
+            started_at=started_at,
+            rows=int(value is not None),
+        )
+
+        return value
+
+    async def execute(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> typing.Any:
+        started_at = time.perf_counter()
+        async with self.within_budget(query):
+            result = await super().execute(query, values)
+        self.record_query(query=query, values=values, started_at=started_at, rows=0)
+
+        return result
+
+    async def execute_many(self, query: ClauseElement | str, values: list) -> None:
+        started_at = time.perf_counter()
+        async with self.within_budget(query):
+            await super().execute_many(query, values)
+        self.record_query(query=query, values=None, started_at=started_at, rows=0)
+
+    async def iterate(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> typing.AsyncGenerator[typing.Mapping, None]:
+        started_at = time.perf_counter()
+        rows = 0
+        async for record in super().iterate(query, values):
+            rows += 1
+            yield record
+        self.record_query(query=query, values=values, started_at=started_at, rows=rows)
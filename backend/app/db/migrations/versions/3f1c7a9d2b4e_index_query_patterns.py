@@ -0,0 +1,98 @@
+"""index query patterns
+Revision ID: 3f1c7a9d2b4e
+Revises: be82cf8b0d6f
+Create Date: 2026-10-19 16:40:12.118204.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic
+revision = "3f1c7a9d2b4e"
+down_revision = "be82cf8b0d6f"
+branch_labels = None
+depends_on = None
+
+# the indexes the `*_QUERY` constants of app/db/repositories look rows up with,
+# primary keys already cover (user_id, cleaning_id) and (cleaning_id, cleaner_id)
+INDEXES = {
+    # GET_PROFILE_BY_USER_ID_QUERY, GET_PROFILE_BY_USERNAME_QUERY, the profile
+    # joined to offers, UPDATE_PROFILE_QUERY and the users foreign key
+    "ix_profiles_user_id": "profiles (user_id)",
+    # LIST_ALL_USER_CLEANINGS_QUERY and the users foreign key
+    "ix_cleanings_owner_created_at": "cleanings (owner, created_at)",
+    # updates of FETCH_CLEANING_JOBS_FOR_FEED_QUERY, the created ones are read
+    # from ix_cleanings_created_at
+    "ix_cleanings_updated_at_updated": (
+        "cleanings (updated_at) WHERE updated_at <> created_at"
+    ),
+    # LIST_OFFERS_FOR_CLEANING_QUERY, the accepted offer lookups of
+    # GET_OFFER_AUTHORIZATION_QUERY and the pending offers rejected or reopened by
+    # ACCEPT_OFFER_QUERY and CANCEL_OFFER_QUERY
+    "ix_user_offers_for_cleanings_cleaning_id_status": (
+        "user_offers_for_cleanings (cleaning_id, status)"
+    ),
+    # LIST_EVALUATIONS_FOR_CLEANER_QUERY, GET_CLEANER_AGGREGATE_RATINGS_QUERY and
+    # the grouping of LIST_TOP_CLEANERS_QUERY
+    "ix_cleaning_to_cleaner_evaluations_cleaner_id_created_at": (
+        "cleaning_to_cleaner_evaluations (cleaner_id, created_at)"
+    ),
+}
+# indexes of the first revision no query needs, either unused or a prefix of
+# one of the indexes above or of a primary key
+REPLACED_INDEXES = {
+    "ix_cleanings_name": "cleanings (name)",
+    "ix_cleanings_updated_at": "cleanings (updated_at)",
+    "ix_user_offers_for_cleanings_cleaning_id": (
+        "user_offers_for_cleanings (cleaning_id)"
+    ),
+    "ix_user_offers_for_cleanings_status": "user_offers_for_cleanings (status)",
+    "ix_user_offers_for_cleanings_user_id": "user_offers_for_cleanings (user_id)",
+    "ix_cleaning_to_cleaner_evaluations_cleaner_id": (
+        "cleaning_to_cleaner_evaluations (cleaner_id)"
+    ),
+    "ix_cleaning_to_cleaner_evaluations_cleaning_id": (
+        "cleaning_to_cleaner_evaluations (cleaning_id)"
+    ),
+}
+
+
+def index_is_invalid(name: str) -> bool:
+    return bool(
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT NOT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass(:name)"
+            ),
+            {"name": name},
+        )
+        .scalar()
+    )
+
+
+def create_indexes(indexes: dict[str, str]) -> None:
+    for name, definition in indexes.items():
+        # an interrupted concurrent build leaves an invalid index behind
+        if index_is_invalid(name):
+            op.execute(f"DROP INDEX CONCURRENTLY {name}")
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+
+def drop_indexes(indexes: dict[str, str]) -> None:
+    for name in indexes:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    # concurrent index builds don't block writes but can't run in a transaction,
+    # the replaced indexes are only dropped once the new ones are in place
+    with op.get_context().autocommit_block():
+        create_indexes(INDEXES)
+        drop_indexes(REPLACED_INDEXES)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        create_indexes(REPLACED_INDEXES)
+        drop_indexes(INDEXES)
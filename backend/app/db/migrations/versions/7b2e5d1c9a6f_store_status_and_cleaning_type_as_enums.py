@@ -0,0 +1,55 @@
+"""store status and cleaning type as enums
+Revision ID: 7b2e5d1c9a6f
+Revises: 3f1c7a9d2b4e
+Create Date: 2026-10-19 17:12:45.602917.
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic
+revision = "7b2e5d1c9a6f"
+down_revision = "3f1c7a9d2b4e"
+branch_labels = None
+depends_on = None
+
+# (table, column): (enum type, values, default), the values of
+# app.models.offer.OfferStatus and app.models.cleaning.CleaningType
+ENUM_COLUMNS = {
+    ("user_offers_for_cleanings", "status"): (
+        "offer_status",
+        ("pending", "accepted", "rejected", "cancelled", "completed"),
+        "pending",
+    ),
+    ("cleanings", "cleaning_type"): (
+        "cleaning_type",
+        ("dust_up", "spot_clean", "full_clean"),
+        "spot_clean",
+    ),
+}
+
+
+def alter_column_type(*, table: str, column: str, type_: str, default: str) -> None:
+    # the default can't be cast along with the column, the indexes are rebuilt
+    op.execute(
+        f"""
+        ALTER TABLE {table}
+            ALTER COLUMN {column} DROP DEFAULT,
+            ALTER COLUMN {column} TYPE {type_} USING {column}::{type_},
+            ALTER COLUMN {column} SET DEFAULT '{default}'
+        """
+    )
+
+
+def upgrade() -> None:
+    # 4 bytes per value instead of a text header and the characters, in the
+    # tables and in every index on the columns
+    for (table, column), (type_, values, default) in ENUM_COLUMNS.items():
+        labels = ", ".join(f"'{value}'" for value in values)
+        op.execute(f"CREATE TYPE {type_} AS ENUM ({labels})")
+        alter_column_type(table=table, column=column, type_=type_, default=default)
+
+
+def downgrade() -> None:
+    for (table, column), (type_, _, default) in ENUM_COLUMNS.items():
+        alter_column_type(table=table, column=column, type_="text", default=default)
+        op.execute(f"DROP TYPE {type_}")
@@ -0,0 +1,123 @@
+"""Query engine talking to the asyncpg connections of the pool directly.
+
+`databases` compiles every query through SQLAlchemy's `text()` to turn `:name`
+parameters into `$n` placeholders, and wraps every asyncpg record in a record of
+its own. The repositories only send fixed SQL strings, so here each one is
+compiled once with the same parameter rules and the records asyncpg returns are
+handed back as they are (they support the same `record["column"]` and `**record`
+access the repositories use).
+
+Connections are still checked out through `databases`, so pinning, transactions,
+latency budgets and the concurrent fan-out work the same with either engine.
+Queries built from SQLAlchemy constructs keep going through `databases`.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any
+
+from app.db.instrumentation import InstrumentedDatabase, query_timeout
+from databases import Database
+
+# same parameter syntax as `sqlalchemy.text()`, `::type` casts are left alone
+PARAMETER = re.compile(r"(?<![:\w\\]):(\w+)(?![:\w])")
+
+
+@lru_cache(maxsize=1024)
+def compile_query(query: str) -> tuple[str, tuple[str, ...]]:
+    """Rewrite `:name` parameters to `$n`, returns the SQL and the parameter names."""
+    names: list[str] = []
+
+    def placeholder(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return PARAMETER.sub(placeholder, query), tuple(names)
+
+
+def bind_query(query: str, values: dict | None) -> tuple[str, list[Any]]:
+    sql, names = compile_query(query)
+    values = values or {}
+    unknown = values.keys() - set(names)
+    if unknown:
+        raise ValueError(f"Query doesn't define the parameters {sorted(unknown)}")
+
+    # like `text()`, parameters without a value are sent as NULL
+    return sql, [values.get(name) for name in names]
+
+
+class AsyncpgEngine(Database):
+    """`databases.Database` running string queries on the raw asyncpg connection."""
+
+    async def fetch_all(self, query: Any, values: dict | None = None) -> list[Any]:
+        if not isinstance(query, str):
+            return await super().fetch_all(query, values)
+
+        sql, args = bind_query(query, values)
+        async with self.connection() as connection:
+            async with connection._query_lock:
+                return await connection.raw_connection.fetch(
+                    sql, *args, timeout=query_timeout.get()
+                )
+
+    async def fetch_one(self, query: Any, values: dict | None = None) -> Any:
+        if not isinstance(query, str):
+            return await super().fetch_one(query, values)
+
+        sql, args = bind_query(query, values)
+        async with self.connection() as connection:
+            async with connection._query_lock:
+                return await connection.raw_connection.fetchrow(
+                    sql, *args, timeout=query_timeout.get()
+                )
+
+    async def fetch_val(
+        self, query: Any, values: dict | None = None, column: Any = 0
+    ) -> Any:
+        if not isinstance(query, str):
+            return await super().fetch_val(query, values, column=column)
+
+        record = await AsyncpgEngine.fetch_one(self, query, values)
+        return None if record is None else record[column]
+
+    async def execute(self, query: Any, values: dict | None = None) -> Any:
+        if not isinstance(query, str):
+            return await super().execute(query, values)
+
+        # like `databases`, the first column of the first row (e.g. RETURNING id)
+        sql, args = bind_query(query, values)
+        async with self.connection() as connection:
+            async with connection._query_lock:
+                return await connection.raw_connection.fetchval(
+                    sql, *args, timeout=query_timeout.get()
+                )
+
+    async def execute_many(self, query: Any, values: list) -> None:
+        if not isinstance(query, str):
+            return await super().execute_many(query, values)
+
+        sql, _ = compile_query(query)
+        args = [bind_query(query, values_set)[1] for values_set in values]
+        async with self.connection() as connection:
+            async with connection._query_lock:
+                await connection.raw_connection.executemany(
+                    sql, args, timeout=query_timeout.get()
+                )
+
+
+class InstrumentedAsyncpgDatabase(InstrumentedDatabase, AsyncpgEngine):
+    """Instrumented database whose queries run on the native engine."""
+
+    def passes_query_timeout(self, query: Any) -> bool:
+        return isinstance(query, str)
+
+
+def get_database_class(engine: str) -> type[InstrumentedDatabase]:
+    if engine == "asyncpg":
+        return InstrumentedAsyncpgDatabase
+    if engine == "databases":
+        return InstrumentedDatabase
+
+    raise ValueError(f"Unknown database engine {engine!r}")
@@ -0,0 +1,13 @@
+"""Names of the connection pools (bulkheads) a worker keeps.
+
+Repositories declare the pool they use with their `pool` attribute, routes can
+override it with `get_repository(Repository, pool=...)`. Pools that aren't
+configured in DB_BULKHEAD_POOLS fall back to the default one.
+"""
+
+# writes, authentication and everything not declaring a pool of its own
+DEFAULT_POOL = "default"
+# feed polling
+FEED_POOL = "feed"
+# aggregates and listings behind the stats pages
+ANALYTICS_POOL = "analytics"
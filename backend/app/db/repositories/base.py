@@ -1,6 +1,33 @@
+import inspect
+from collections.abc import Coroutine
+from typing import Any
+
+from app.core.tracing import traced
+from app.db import batching, concurrency
+from app.db.pools import DEFAULT_POOL
 from databases import Database
 
 
 class BaseRepository:
+    # connection pool the repository is served from, see app.db.pools
+    pool: str = DEFAULT_POOL
+
     def __init__(self, db: Database) -> None:
         self.db = db
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        """Trace every public coroutine method of concrete repositories."""
+        super().__init_subclass__(**kwargs)
+        for name, attribute in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(attribute):
+                setattr(cls, name, traced(attribute))
+
+    async def _gather(self, *coros: Coroutine[Any, Any, Any]) -> list[Any]:
+        """Run independent lookups concurrently on separate pooled connections."""
+        return await concurrency.gather(self.db, *coros)
+
+    async def _fetch_batch(
+        self, *statements: batching.Statement
+    ) -> list[list[dict[str, Any]]]:
+        """Run independent read-only statements in a single round trip."""
+        return await batching.fetch_batch(self.db, *statements)
@@ -1,5 +1,9 @@
 from app.db.repositories.base import BaseRepository
-from app.db.repositories.offers import OffersRepository
+from app.db.repositories.offers import (
+    GET_OFFER_FOR_CLEANING_FROM_USER_QUERY,
+    LIST_OFFERS_FOR_CLEANING_QUERY,
+    OffersRepository,
+)
 from app.db.repositories.users import UsersRepository
 from app.models.cleaning import (
     CleaningCreate,
@@ -7,6 +11,7 @@ from app.models.cleaning import (
     CleaningPublic,
     CleaningUpdate,
 )
+from app.models.offer import OfferPublic
 from app.models.user import UserInDB
 from databases import Database
 from fastapi import HTTPException, status
@@ -63,19 +68,33 @@ class CleaningsRepository(BaseRepository):
     async def get_cleaning_by_id(
         self, *, id: int, requesting_user: UserInDB, populate: bool = True
     ) -> CleaningInDB | CleaningPublic | None:
-        cleaning_record = await self.db.fetch_one(
-            query=GET_CLEANING_BY_ID_QUERY, values={"id": id}
+        if not populate:
+            cleaning_record = await self.db.fetch_one(
+                query=GET_CLEANING_BY_ID_QUERY, values={"id": id}
+            )
+
+            return CleaningInDB(**cleaning_record) if cleaning_record else None
+
+        # everything keyed by the id goes in one round trip, only the owner waits
+        cleaning_records, offers, requesting_user_offer = await self._fetch_batch(
+            (GET_CLEANING_BY_ID_QUERY, {"id": id}),
+            (LIST_OFFERS_FOR_CLEANING_QUERY, {"cleaning_id": id}),
+            (
+                GET_OFFER_FOR_CLEANING_FROM_USER_QUERY,
+                {"cleaning_id": id, "user_id": requesting_user.id},
+            ),
         )
+        if not cleaning_records:
+            return None
 
-        if cleaning_record:
-            cleaning = CleaningInDB(**cleaning_record)
-            if populate:
-                return await self.populate_cleaning(
-                    cleaning=cleaning, requesting_user=requesting_user
-                )
-            return cleaning
+        cleaning = CleaningInDB(**cleaning_records[0])
 
-        return None
+        return CleaningPublic(
+            **cleaning.dict(exclude={"owner"}),
+            owner=await self.users_repo.get_user_by_id(user_id=cleaning.owner),
+            total_offers=len(offers),
+            offers=[OfferPublic(**offer) for offer in requesting_user_offer],
+        )
 
     async def list_all_user_cleanings(
         self, *, requesting_user: UserInDB, populate: bool = True
@@ -87,14 +106,16 @@ class CleaningsRepository(BaseRepository):
         cleanings = [CleaningInDB(**cleaning) for cleaning in cleaning_records]
 
         if populate:
-            return [
-                await self.populate_cleaning(
-                    cleaning=cleaning,
-                    requesting_user=requesting_user,
-                    populate_offers=True,
+            return await self._gather(
+                *(
+                    self.populate_cleaning(
+                        cleaning=cleaning,
+                        requesting_user=requesting_user,
+                        populate_offers=True,
+                    )
+                    for cleaning in cleanings
                 )
-                for cleaning in cleanings
-            ]
+            )
 
         return cleanings
 
@@ -146,29 +167,31 @@ class CleaningsRepository(BaseRepository):
         If the user is the owner of the cleaning, offers are included by default.
         Otherwise, only include an offer made by the requesting user - if it exists.
         """
-        offers = await self.offers_repo.list_offers_for_cleaning(
-            cleaning=cleaning,
-            populate=populate_offers,
-            requesting_user=requesting_user,
-        )
+        lookups = [
+            self.users_repo.get_user_by_id(user_id=cleaning.owner),
+            self.offers_repo.list_offers_for_cleaning(
+                cleaning=cleaning,
+                populate=populate_offers,
+                requesting_user=requesting_user,
+            ),
+        ]
+        if not populate_offers:
+            lookups.append(
+                self.offers_repo.get_offer_for_cleaning_from_user(
+                    cleaning=cleaning,
+                    user=requesting_user,
+                )
+            )
+        owner, offers, *requesting_user_offer = await self._gather(*lookups)
 
         return CleaningPublic(
             **cleaning.dict(exclude={"owner"}),
-            owner=await self.users_repo.get_user_by_id(user_id=cleaning.owner),
+            owner=owner,
             total_offers=len(offers),
             # full offers if `populate_offers` is specified,
             # otherwise only the offer from the authed user
             offers=offers
             if populate_offers
-            else [
-                offer
-                for offer in [
-                    await self.offers_repo.get_offer_for_cleaning_from_user(
-                        cleaning=cleaning,
-                        user=requesting_user,
-                    )
-                ]
-                if offer
-            ],
+            else [offer for offer in requesting_user_offer if offer],
             # any other populated fields for cleaning public would be tacked on here
         )
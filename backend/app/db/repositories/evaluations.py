@@ -1,6 +1,5 @@
 
 from app.db.repositories.base import BaseRepository
-from app.db.repositories.offers import OffersRepository
 from app.models.cleaning import CleaningInDB
 from app.models.evaluation import (
     EvaluationAggregate,
@@ -8,9 +7,17 @@ from app.models.evaluation import (
     EvaluationInDB,
 )
 from app.models.user import UserInDB
-from databases import Database
+from fastapi import HTTPException, status
 
 CREATE_OWNER_EVALUATION_FOR_CLEANER_QUERY = """
+    WITH completed_offer AS (
+        UPDATE user_offers_for_cleanings
+        SET status = 'completed'
+        WHERE cleaning_id = :cleaning_id
+          AND user_id = :cleaner_id
+          AND status = 'accepted'
+        RETURNING cleaning_id, user_id
+    )
     INSERT INTO cleaning_to_cleaner_evaluations (
         cleaning_id,
         cleaner_id,
@@ -22,17 +29,16 @@ CREATE_OWNER_EVALUATION_FOR_CLEANER_QUERY = """
         efficiency,
         overall_rating
     )
-    VALUES (
-        :cleaning_id,
-        :cleaner_id,
-        :no_show,
-        :headline,
-        :comment,
-        :professionalism,
-        :completeness,
-        :efficiency,
-        :overall_rating
-    )
+    SELECT cleaning_id,
+           user_id,
+           :no_show,
+           :headline,
+           :comment,
+           :professionalism,
+           :completeness,
+           :efficiency,
+           :overall_rating
+    FROM completed_offer
     RETURNING no_show,
               cleaning_id,
               cleaner_id,
@@ -93,36 +99,40 @@ GET_CLEANER_AGGREGATE_RATINGS_QUERY = """
     FROM cleaning_to_cleaner_evaluations
     WHERE cleaner_id = :cleaner_id;
 """
+LIST_TOP_CLEANERS_QUERY = """
+    SELECT cleaner_id
+    FROM cleaning_to_cleaner_evaluations
+    GROUP BY cleaner_id
+    ORDER BY COUNT(*) DESC
+    LIMIT :limit;
+"""
 
 
 class EvaluationsRepository(BaseRepository):
-    def __init__(self, db: Database) -> None:
-        super().__init__(db)
-        self.offers_repo = OffersRepository(db)
-
     async def create_evaluation_for_cleaner(
         self,
         *,
         evaluation_create: EvaluationCreate,
-        cleaning: CleaningInDB,
-        cleaner: UserInDB
+        cleaning_id: int,
+        cleaner_id: int
     ) -> EvaluationInDB:
-        async with self.db.transaction():
-            created_evaluation = await self.db.fetch_one(
-                query=CREATE_OWNER_EVALUATION_FOR_CLEANER_QUERY,
-                values={
-                    **evaluation_create.dict(),
-                    "cleaning_id": cleaning.id,
-                    "cleaner_id": cleaner.id,
-                },
-            )
+        # marks the accepted offer as completed and evaluates it in one statement
+        created_evaluation = await self.db.fetch_one(
+            query=CREATE_OWNER_EVALUATION_FOR_CLEANER_QUERY,
+            values={
+                **evaluation_create.dict(),
+                "cleaning_id": cleaning_id,
+                "cleaner_id": cleaner_id,
+            },
+        )
 
-            # also mark offer as completed
-            await self.offers_repo.mark_offer_completed(
-                cleaning=cleaning, cleaner=cleaner
+        if not created_evaluation:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Only users with accepted offers can be evaluated.",
             )
 
-            return EvaluationInDB(**created_evaluation)
+        return EvaluationInDB(**created_evaluation)
 
     async def get_cleaner_evaluation_for_cleaning(
         self, *, cleaning: CleaningInDB, cleaner: UserInDB
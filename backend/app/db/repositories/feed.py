@@ -1,5 +1,6 @@
 import datetime
 
+from app.db.pools import FEED_POOL
 from app.db.repositories.base import BaseRepository
 from app.db.repositories.users import UsersRepository
 from app.models.feed import CleaningFeedItem
@@ -57,6 +58,8 @@ FETCH_CLEANING_JOBS_FOR_FEED_QUERY = """
 
 
 class FeedRepository(BaseRepository):
+    pool = FEED_POOL
+
     def __init__(self, db: Database) -> None:
         super().__init__(db)
         self.users_repo = UsersRepository(db)
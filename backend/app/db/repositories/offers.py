@@ -1,9 +1,18 @@
 from app.db.repositories.base import BaseRepository
 from app.db.repositories.users import UsersRepository
 from app.models.cleaning import CleaningInDB
-from app.models.offer import OfferCreate, OfferInDB, OfferPublic, OfferUpdate
-from app.models.user import UserInDB
+from app.models.offer import (
+    OfferAuthorization,
+    OfferCreate,
+    OfferInDB,
+    OfferPublic,
+    OfferUpdate,
+)
+from app.models.profile import ProfilePublic
+from app.models.user import UserInDB, UserPublic
 from databases import Database
+from databases.interfaces import Record
+from fastapi import HTTPException, status
 
 CREATE_OFFER_FOR_CLEANING_QUERY = """
     INSERT INTO user_offers_for_cleanings (cleaning_id, user_id, status)
@@ -20,43 +29,104 @@ GET_OFFER_FOR_CLEANING_FROM_USER_QUERY = """
     FROM user_offers_for_cleanings
     WHERE cleaning_id = :cleaning_id AND user_id = :user_id;
 """
-ACCEPT_OFFER_QUERY = """
-    UPDATE user_offers_for_cleanings
-    SET status = 'accepted'
-    WHERE cleaning_id = :cleaning_id AND user_id = :user_id
-    RETURNING cleaning_id, user_id, status, created_at, updated_at;
+GET_OFFER_AUTHORIZATION_QUERY = """
+    SELECT c.id         AS cleaning_id,
+           c.owner      AS cleaning_owner,
+           u.id         AS user_id,
+           o.status     AS offer_status,
+           o.created_at AS offer_created_at,
+           o.updated_at AS offer_updated_at,
+           EXISTS (
+               SELECT 1
+               FROM user_offers_for_cleanings
+               WHERE cleaning_id = c.id AND status = 'accepted'
+           ) AS has_accepted_offer
+    FROM cleanings c
+        LEFT JOIN users u ON u.username = :username
+        LEFT JOIN user_offers_for_cleanings o
+        ON o.cleaning_id = c.id AND o.user_id = u.id
+    WHERE c.id = :cleaning_id;
 """
-REJECT_ALL_OTHER_OFFERS_QUERY = """
-    UPDATE user_offers_for_cleanings
-    SET status = 'rejected'
-    WHERE cleaning_id = :cleaning_id
-    AND user_id != :user_id
-    AND status = 'pending';
+# an offer joined with the user who made it and their profile,
+# selected by the transitions below and read by `populate_offer_record`
+POPULATED_OFFER_COLUMNS = """
+    o.cleaning_id,
+    o.user_id,
+    o.status,
+    o.created_at,
+    o.updated_at,
+    u.username       AS user_username,
+    u.email          AS user_email,
+    u.email_verified AS user_email_verified,
+    u.is_active      AS user_is_active,
+    u.is_superuser   AS user_is_superuser,
+    u.created_at     AS user_created_at,
+    u.updated_at     AS user_updated_at,
+    p.id             AS profile_id,
+    p.full_name      AS profile_full_name,
+    p.phone_number   AS profile_phone_number,
+    p.bio            AS profile_bio,
+    p.image          AS profile_image,
+    p.created_at     AS profile_created_at,
+    p.updated_at     AS profile_updated_at
 """
-CANCEL_OFFER_QUERY = """
-    UPDATE user_offers_for_cleanings
-    SET status = 'cancelled'
-    WHERE cleaning_id = :cleaning_id AND user_id = :user_id
-    RETURNING cleaning_id, user_id, status, created_at, updated_at;
+ACCEPT_OFFER_QUERY = f"""
+    WITH cleaning AS (
+        -- one transition at a time for the offers of a cleaning job
+        SELECT id FROM cleanings WHERE id = :cleaning_id FOR NO KEY UPDATE
+    ), accepted_offer AS (
+        UPDATE user_offers_for_cleanings
+        SET status = 'accepted'
+        WHERE cleaning_id = (SELECT id FROM cleaning)
+          AND user_id = :user_id
+          AND status = 'pending'
+          AND NOT EXISTS (
+              SELECT 1
+              FROM user_offers_for_cleanings
+              WHERE cleaning_id = :cleaning_id AND status = 'accepted'
+          )
+        RETURNING cleaning_id, user_id, status, created_at, updated_at
+    ), rejected_offers AS (
+        UPDATE user_offers_for_cleanings
+        SET status = 'rejected'
+        WHERE cleaning_id = (SELECT cleaning_id FROM accepted_offer)
+          AND user_id != :user_id
+          AND status = 'pending'
+    )
+    SELECT {POPULATED_OFFER_COLUMNS}
+    FROM accepted_offer o
+        INNER JOIN users u ON u.id = o.user_id
+        LEFT JOIN profiles p ON p.user_id = o.user_id;
 """
-SET_ALL_OTHER_OFFERS_AS_PENDING_QUERY = """
-    UPDATE user_offers_for_cleanings
-    SET status = 'pending'
-    WHERE cleaning_id = :cleaning_id
-    AND user_id != :user_id
-    AND status = 'rejected';
+CANCEL_OFFER_QUERY = f"""
+    WITH cleaning AS (
+        -- one transition at a time for the offers of a cleaning job
+        SELECT id FROM cleanings WHERE id = :cleaning_id FOR NO KEY UPDATE
+    ), cancelled_offer AS (
+        UPDATE user_offers_for_cleanings
+        SET status = 'cancelled'
+        WHERE cleaning_id = (SELECT id FROM cleaning)
+          AND user_id = :user_id
+          AND status = 'accepted'
+        RETURNING cleaning_id, user_id, status, created_at, updated_at
+    ), reopened_offers AS (
+        UPDATE user_offers_for_cleanings
+        SET status = 'pending'
+        WHERE cleaning_id = (SELECT cleaning_id FROM cancelled_offer)
+          AND user_id != :user_id
+          AND status = 'rejected'
+    )
+    SELECT {POPULATED_OFFER_COLUMNS}
+    FROM cancelled_offer o
+        INNER JOIN users u ON u.id = o.user_id
+        LEFT JOIN profiles p ON p.user_id = o.user_id;
 """
 RESCIND_OFFER_QUERY = """
     DELETE FROM user_offers_for_cleanings
     WHERE cleaning_id = :cleaning_id
-    AND user_id = :user_id;
-"""
-MARK_OFFER_COMPLETED_QUERY = """
-    UPDATE user_offers_for_cleanings
-    SET status = 'completed'
-    WHERE cleaning_id = :cleaning_id
-      AND user_id     = :user_id
-    RETURNING *;
+      AND user_id = :user_id
+      AND status = 'pending'
+    RETURNING user_id;
 """
 
 
@@ -83,14 +153,23 @@ class OffersRepository(BaseRepository):
         requesting_user = None,
     ) -> list[OfferInDB | OfferPublic]:
         # ? use requesting_user as user.id
+        return await self.list_offers_for_cleaning_by_id(
+            cleaning_id=cleaning.id, populate=populate
+        )
+
+    async def list_offers_for_cleaning_by_id(
+        self, *, cleaning_id: int, populate: bool = True
+    ) -> list[OfferInDB | OfferPublic]:
         offer_records = await self.db.fetch_all(
             query=LIST_OFFERS_FOR_CLEANING_QUERY,
-            values={"cleaning_id": cleaning.id},
+            values={"cleaning_id": cleaning_id},
         )
         offers = [OfferInDB(**o) for o in offer_records]
 
         if populate:
-            return [await self.populate_offer(offer=offer) for offer in offers]
+            return await self._gather(
+                *(self.populate_offer(offer=offer) for offer in offers)
+            )
 
         return offers
 
@@ -111,48 +190,109 @@ class OffersRepository(BaseRepository):
 
         return OfferPublic(**offer_record) if offer_record else None
 
+    async def get_offer_authorization(
+        self, *, cleaning_id: int, username: str
+    ) -> OfferAuthorization | None:
+        """The cleaning, the offer `username` made for it and whether one was accepted."""
+        record = await self.db.fetch_one(
+            query=GET_OFFER_AUTHORIZATION_QUERY,
+            values={"cleaning_id": cleaning_id, "username": username},
+        )
+
+        if not record:
+            return None
+
+        offer = None
+        if record["offer_status"] is not None:
+            offer = OfferInDB(
+                cleaning_id=record["cleaning_id"],
+                user_id=record["user_id"],
+                status=record["offer_status"],
+                created_at=record["offer_created_at"],
+                updated_at=record["offer_updated_at"],
+            )
+
+        return OfferAuthorization(
+            cleaning_id=record["cleaning_id"],
+            cleaning_owner=record["cleaning_owner"],
+            user_id=record["user_id"],
+            offer=offer,
+            has_accepted_offer=record["has_accepted_offer"],
+        )
+
+    def populate_offer_record(self, *, offer_record: Record) -> OfferPublic:
+        """Build an offer selected with `POPULATED_OFFER_COLUMNS`."""
+        profile = None
+        if offer_record["profile_id"] is not None:
+            profile = ProfilePublic(
+                id=offer_record["profile_id"],
+                full_name=offer_record["profile_full_name"],
+                phone_number=offer_record["profile_phone_number"],
+                bio=offer_record["profile_bio"],
+                image=offer_record["profile_image"],
+                user_id=offer_record["user_id"],
+                created_at=offer_record["profile_created_at"],
+                updated_at=offer_record["profile_updated_at"],
+            )
+
+        return OfferPublic(
+            **OfferInDB(**offer_record).dict(),
+            user=UserPublic(
+                id=offer_record["user_id"],
+                username=offer_record["user_username"],
+                email=offer_record["user_email"],
+                email_verified=offer_record["user_email_verified"],
+                is_active=offer_record["user_is_active"],
+                is_superuser=offer_record["user_is_superuser"],
+                created_at=offer_record["user_created_at"],
+                updated_at=offer_record["user_updated_at"],
+                profile=profile,
+            ),
+        )
+
     async def accept_offer(
         self, *, offer: OfferInDB, offer_update: OfferUpdate
     ) -> OfferPublic:
-        async with self.db.transaction():
-            accepted_offer = await self.db.fetch_one(
-                query=ACCEPT_OFFER_QUERY,  # accept current offer
-                values={"cleaning_id": offer.cleaning_id, "user_id": offer.user_id},
-            )
-            await self.db.execute(
-                query=REJECT_ALL_OTHER_OFFERS_QUERY,  # reject all other offers
-                values={"cleaning_id": offer.cleaning_id, "user_id": offer.user_id},
+        # accepts the offer and rejects all other pending ones in one statement
+        accepted_offer = await self.db.fetch_one(
+            query=ACCEPT_OFFER_QUERY,
+            values={"cleaning_id": offer.cleaning_id, "user_id": offer.user_id},
+        )
+
+        if not accepted_offer:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Can only accept pending offers for cleaning jobs without an accepted offer.",
             )
 
-            return await self.populate_offer(offer=OfferInDB(**accepted_offer))
+        return self.populate_offer_record(offer_record=accepted_offer)
 
     async def cancel_offer(
         self, *, offer: OfferInDB, offer_update: OfferUpdate
     ) -> OfferPublic:
-        async with self.db.transaction():
-            cancelled_offer = await self.db.fetch_one(
-                query=CANCEL_OFFER_QUERY,  # cancel current offer
-                values={"cleaning_id": offer.cleaning_id, "user_id": offer.user_id},
-            )
-            await self.db.execute(
-                query=SET_ALL_OTHER_OFFERS_AS_PENDING_QUERY,  # set all other offers to pending again
-                values={"cleaning_id": offer.cleaning_id, "user_id": offer.user_id},
+        # cancels the offer and sets all rejected ones to pending again
+        cancelled_offer = await self.db.fetch_one(
+            query=CANCEL_OFFER_QUERY,
+            values={"cleaning_id": offer.cleaning_id, "user_id": offer.user_id},
+        )
+
+        if not cancelled_offer:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Can only cancel offers that have been accepted.",
             )
 
-            return await self.populate_offer(offer=OfferInDB(**cancelled_offer))
+        return self.populate_offer_record(offer_record=cancelled_offer)
 
-    async def rescind_offer(self, *, offer: OfferInDB) -> int:
-        return await self.db.execute(
-            query=RESCIND_OFFER_QUERY,  # rescinding an offer deletes it as long as it's pending
+    async def rescind_offer(self, *, offer: OfferInDB) -> None:
+        # rescinding an offer deletes it as long as it's pending
+        rescinded_offer = await self.db.fetch_val(
+            query=RESCIND_OFFER_QUERY,
             values={"cleaning_id": offer.cleaning_id, "user_id": offer.user_id},
         )
 
-    async def mark_offer_completed(
-        self, *, cleaning: CleaningInDB, cleaner: UserInDB
-    ) -> OfferPublic:
-        offer_record = await self.db.fetch_one(
-            query=MARK_OFFER_COMPLETED_QUERY,  # owner of cleaning marks job status as completed
-            values={"cleaning_id": cleaning.id, "user_id": cleaner.id},
-        )
-
-        return OfferPublic(**offer_record, user=cleaner)
+        if rescinded_offer is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Can only rescind currently pending offers.",
+            )
@@ -12,6 +12,11 @@ GET_PROFILE_BY_USER_ID_QUERY = """
     FROM profiles
     WHERE user_id = :user_id;
 """
+GET_PROFILE_BY_OWNER_USERNAME_QUERY = """
+    SELECT id, full_name, phone_number, bio, image, user_id, created_at, updated_at
+    FROM profiles
+    WHERE user_id = (SELECT id FROM users WHERE username = :username);
+"""
 GET_PROFILE_BY_USERNAME_QUERY = """
     SELECT p.id,
            u.email AS email,
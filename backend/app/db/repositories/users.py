@@ -1,6 +1,11 @@
+from app.db.batching import Statement
 from app.db.repositories.base import BaseRepository
-from app.db.repositories.profiles import ProfilesRepository
-from app.models.profile import ProfileCreate
+from app.db.repositories.profiles import (
+    GET_PROFILE_BY_OWNER_USERNAME_QUERY,
+    GET_PROFILE_BY_USER_ID_QUERY,
+    ProfilesRepository,
+)
+from app.models.profile import ProfileInDB, ProfilePublic
 from app.models.user import UserCreate, UserInDB, UserPublic
 from app.services import auth_service
 from databases import Database
@@ -18,9 +23,31 @@ GET_USER_BY_USERNAME_QUERY = """
     WHERE username = :username;
 """
 REGISTER_NEW_USER_QUERY = """
-    INSERT INTO users (username, email, password, salt)
-    VALUES (:username, :email, :password, :salt)
-    RETURNING id, username, email, email_verified, password, salt, is_active, is_superuser, created_at, updated_at;
+    WITH new_user AS (
+        INSERT INTO users (username, email, password, salt)
+        VALUES (:username, :email, :password, :salt)
+        ON CONFLICT DO NOTHING
+        RETURNING id, username, email, email_verified, password, salt, is_active, is_superuser, created_at, updated_at
+    ), new_profile AS (
+        INSERT INTO profiles (user_id)
+        SELECT id FROM new_user
+        RETURNING id, full_name, phone_number, bio, image, user_id, created_at, updated_at
+    )
+    SELECT u.id, u.username, u.email, u.email_verified, u.password, u.salt,
+           u.is_active, u.is_superuser, u.created_at, u.updated_at,
+           p.id AS profile_id,
+           p.full_name,
+           p.phone_number,
+           p.bio,
+           p.image,
+           p.created_at AS profile_created_at,
+           p.updated_at AS profile_updated_at,
+           -- rows inserted above aren't visible yet, so these only see earlier users
+           EXISTS (SELECT 1 FROM users WHERE email = :email) AS email_taken,
+           EXISTS (SELECT 1 FROM users WHERE username = :username) AS username_taken
+    FROM (VALUES (1)) AS registration
+        LEFT JOIN new_user u ON TRUE
+        LEFT JOIN new_profile p ON p.user_id = u.id;
 """
 GET_USER_BY_ID_QUERY = """
     SELECT id, username, email, email_verified, password, salt, is_active, is_superuser, created_at, updated_at
@@ -38,17 +65,17 @@ class UsersRepository(BaseRepository):
     async def get_user_by_id(
         self, *, user_id: int, populate: bool = True
     ) -> UserPublic | None:
+        if populate:
+            return await self.get_populated_user(
+                (GET_USER_BY_ID_QUERY, {"id": user_id}),
+                (GET_PROFILE_BY_USER_ID_QUERY, {"user_id": user_id}),
+            )
+
         user_record = await self.db.fetch_one(
             query=GET_USER_BY_ID_QUERY, values={"id": user_id}
         )
 
-        if user_record:
-            user = UserInDB(**user_record)
-            if populate:
-                return await self.populate_user(user=user)
-            return user
-
-        return None
+        return UserInDB(**user_record) if user_record else None
 
     async def get_user_by_email(
         self, *, email: EmailStr, populate: bool = True
@@ -69,48 +96,59 @@ class UsersRepository(BaseRepository):
     async def get_user_by_username(
         self, *, username: str, populate: bool = True
     ) -> UserInDB | None:
+        if populate:
+            return await self.get_populated_user(
+                (GET_USER_BY_USERNAME_QUERY, {"username": username}),
+                (GET_PROFILE_BY_OWNER_USERNAME_QUERY, {"username": username}),
+            )
+
         user_record = await self.db.fetch_one(
             query=GET_USER_BY_USERNAME_QUERY, values={"username": username}
         )
 
-        if user_record:
-            user = UserInDB(**user_record)
-            if populate:
-                return await self.populate_user(user=user)
-
-            return user
-
-        return None
-
-    async def register_new_user(self, *, new_user: UserCreate) -> UserInDB:
-        # make sure email isn't already taken
-        if await self.get_user_by_email(email=new_user.email):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="That email is already taken. Login with that email or register with another one.",
-            )
-
-        # make sure username isn't already taken
-        if await self.get_user_by_username(username=new_user.username):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="That username is already taken. Please try another one.",
-            )
+        return UserInDB(**user_record) if user_record else None
 
+    async def register_new_user(self, *, new_user: UserCreate) -> UserPublic:
         user_password_update = self.auth_service.create_salt_and_hashed_password(
             plaintext_password=new_user.password
         )
         new_user_params = new_user.copy(update=user_password_update.dict())
-        created_user = await self.db.fetch_one(
+        # the user and their profile are inserted in one statement, the unique
+        # constraints decide between concurrent registrations
+        registration = await self.db.fetch_one(
             query=REGISTER_NEW_USER_QUERY, values=new_user_params.dict()
         )
 
-        # create profile for new user
-        await self.profiles_repo.create_profile_for_user(
-            profile_create=ProfileCreate(user_id=created_user["id"])
-        )
+        if registration["id"] is None:
+            if registration["email_taken"]:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="That email is already taken. Login with that email or register with another one.",
+                )
+            if registration["username_taken"]:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="That username is already taken. Please try another one.",
+                )
+            # taken by a registration that committed while this one was running
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="That email or username is already taken. Please try another one.",
+            )
 
-        return await self.populate_user(user=UserInDB(**created_user))
+        return UserPublic(
+            **UserInDB(**registration).dict(),
+            profile=ProfilePublic(
+                id=registration["profile_id"],
+                full_name=registration["full_name"],
+                phone_number=registration["phone_number"],
+                bio=registration["bio"],
+                image=registration["image"],
+                user_id=registration["id"],
+                created_at=registration["profile_created_at"],
+                updated_at=registration["profile_updated_at"],
+            ),
+        )
 
     async def authenticate_user(
         self, *, email: EmailStr, password: str
@@ -128,6 +166,21 @@ class UsersRepository(BaseRepository):
 
         return user
 
+    async def get_populated_user(
+        self, user_lookup: Statement, profile_lookup: Statement
+    ) -> UserPublic | None:
+        """Look up a user and their profile by the same key, in one round trip."""
+        user_records, profile_records = await self._fetch_batch(
+            user_lookup, profile_lookup
+        )
+        if not user_records:
+            return None
+
+        return UserPublic(
+            **UserInDB(**user_records[0]).dict(),
+            profile=ProfileInDB(**profile_records[0]) if profile_records else None,
+        )
+
     async def populate_user(self, *, user: UserInDB) -> UserInDB:
         return UserPublic(
             # unpack the user in db dict into the UserPublic model
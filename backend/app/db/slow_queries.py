@@ -0,0 +1,176 @@
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any
+
+from app.core.config import (
+    SLOW_QUERY_EXPLAIN,
+    SLOW_QUERY_LOG_BACKUP_COUNT,
+    SLOW_QUERY_LOG_FILE,
+    SLOW_QUERY_LOG_MAX_BYTES,
+    SLOW_QUERY_MAX_CAPTURES_PER_MINUTE,
+    SLOW_QUERY_SAMPLE_RATE,
+    SLOW_QUERY_THRESHOLD_MS,
+)
+from app.core.metrics import registry
+from databases import Database
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = registry.counter(
+    "phresh_db_slow_queries_total",
+    "Number of SQL statements slower than the slow query threshold.",
+    ("query", "route"),
+)
+SLOW_QUERY_CAPTURES = registry.counter(
+    "phresh_db_slow_query_captures_total",
+    "Number of slow SQL statements whose plan was captured.",
+    ("query", "route"),
+)
+
+REDACTED_PARAMETERS = {"password", "salt"}
+
+
+def is_read_only(sql: str) -> bool:
+    """EXPLAIN ANALYZE executes the statement, so only do it for plain SELECTs."""
+    return sql.lstrip().upper().startswith("SELECT")
+
+
+def redact(values: dict | None) -> dict:
+    return {
+        key: "***" if key in REDACTED_PARAMETERS else value
+        for key, value in (values or {}).items()
+    }
+
+
+class SlowQueryLog:
+    """Capture parameters and plan of statements slower than a threshold.
+
+    Plans are taken in a background task on a separate pooled connection so the
+    request that ran the slow statement is not delayed any further.
+    Captures are sampled and rate limited, recent ones are kept in memory for the
+    admin endpoint and optionally appended to a rotating JSON lines file.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+        sample_rate: float = SLOW_QUERY_SAMPLE_RATE,
+        max_captures_per_minute: int = SLOW_QUERY_MAX_CAPTURES_PER_MINUTE,
+        explain: bool = SLOW_QUERY_EXPLAIN,
+        log_file: str = SLOW_QUERY_LOG_FILE,
+        max_entries: int = 100,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.max_captures_per_minute = max_captures_per_minute
+        self.explain = explain
+        self.entries: deque[dict[str, Any]] = deque(maxlen=max_entries)
+        self._captured_at: deque[float] = deque()
+        self._pending: set[asyncio.Task] = set()
+        self._file_logger = None
+
+        if log_file:
+            self._file_logger = logging.getLogger(f"{__name__}.file")
+            self._file_logger.propagate = False
+            handler = RotatingFileHandler(
+                log_file,
+                maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUP_COUNT,
+            )
+            self._file_logger.addHandler(handler)
+            self._file_logger.setLevel(logging.INFO)
+
+    def _acquire_capture_slot(self) -> bool:
+        now = time.monotonic()
+        while self._captured_at and now - self._captured_at[0] > 60:
+            self._captured_at.popleft()
+
+        if len(self._captured_at) >= self.max_captures_per_minute:
+            return False
+
+        self._captured_at.append(now)
+        return True
+
+    def observe(
+        self,
+        *,
+        database: Database,
+        query: Any,
+        values: dict | None,
+        query_name: str,
+        route: str,
+        duration: float,
+    ) -> None:
+        duration_ms = duration * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        SLOW_QUERIES.inc(query_name, route)
+        if not isinstance(query, str) or random.random() >= self.sample_rate:
+            return
+        if not self._acquire_capture_slot():
+            return
+
+        SLOW_QUERY_CAPTURES.inc(query_name, route)
+        entry = {
+            "captured_at": datetime.now(tz=timezone.utc).isoformat(),
+            "query": query_name,
+            "route": route,
+            "duration_ms": round(duration_ms, 3),
+            "values": redact(values),
+            "sql": query.strip(),
+            "plan": None,
+        }
+
+        if not self.explain:
+            self._record(entry)
+            return
+
+        # run in an empty context so `databases` hands the task its own connection
+        # instead of sharing the one bound to the request
+        task = asyncio.get_running_loop().create_task(
+            self._capture_plan(database=database, entry=entry, values=values),
+            context=contextvars.Context(),
+        )
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _capture_plan(
+        self, *, database: Database, entry: dict[str, Any], values: dict | None
+    ) -> None:
+        options = (
+            "ANALYZE, BUFFERS, FORMAT JSON"
+            if is_read_only(entry["sql"])
+            else "FORMAT JSON"
+        )
+        try:
+            async with database.connection() as connection:
+                plan = await connection.fetch_val(
+                    query=f"EXPLAIN ({options}) {entry['sql']}", values=values
+                )
+            entry["plan"] = json.loads(plan) if isinstance(plan, str) else plan
+        except Exception as e:
+            logger.warning("Unable to capture plan for %s: %s", entry["query"], e)
+            entry["plan_error"] = str(e)
+
+        self._record(entry)
+
+    def _record(self, entry: dict[str, Any]) -> None:
+        self.entries.append(entry)
+        if self._file_logger:
+            self._file_logger.info(json.dumps(entry, default=str))
+
+    async def wait_for_pending(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+
+slow_query_log = SlowQueryLog()
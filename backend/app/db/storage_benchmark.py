@@ -0,0 +1,143 @@
+"""Sizes and timings with offer status and cleaning type stored as text and as enums.
+
+    python -m app.db.storage_benchmark [users]
+
+Seeds the same rows as app.db.index_benchmark, then stores the columns of the
+enum revision as text and measures the tables, their indexes, the repositories'
+queries and a bulk rejection of the pending offers of a thousand cleanings (what
+ACCEPT_OFFER_QUERY does for a single one), then does the same with the enum
+types. Changing the type of a column rewrites its table and indexes, so both
+are measured freshly packed.
+
+Like there, each phase seeds the same rows in a transaction of its own that is
+rolled back at the end, the tables stay locked while it runs though, so point
+it at a scratch database.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+
+import asyncpg
+from app.core.config import DATABASE_URL
+from app.db.index_benchmark import (
+    DEFAULT_USERS,
+    REPEAT,
+    explain_analyze,
+    get_revision,
+    seeded_transaction,
+    time_queries,
+)
+
+ENUM_REVISION = "7b2e5d1c9a6f"
+REJECTED_CLEANINGS = 1000
+
+BULK_REJECT_QUERY = """
+    UPDATE user_offers_for_cleanings
+    SET status = 'rejected'
+    WHERE cleaning_id = ANY($1::integer[]) AND status = 'pending'
+"""
+CLEANINGS_WITH_PENDING_OFFERS_QUERY = """
+    SELECT array_agg(cleaning_id)
+    FROM (
+        SELECT DISTINCT cleaning_id
+        FROM user_offers_for_cleanings
+        WHERE status = 'pending'
+        ORDER BY cleaning_id
+        LIMIT $1
+    ) AS cleanings_with_pending_offers
+"""
+SIZES_QUERY = """
+    SELECT pg_table_size(to_regclass($1)) AS table_bytes,
+           pg_indexes_size(to_regclass($1)) AS index_bytes
+"""
+
+
+async def store_columns(
+    connection: asyncpg.Connection, *, enum_columns: dict, as_enums: bool
+) -> None:
+    for (table, column), (type_, _, default) in enum_columns.items():
+        type_ = type_ if as_enums else "text"
+        await connection.execute(
+            f"""
+            ALTER TABLE {table}
+                ALTER COLUMN {column} DROP DEFAULT,
+                ALTER COLUMN {column} TYPE {type_} USING {column}::text::{type_},
+                ALTER COLUMN {column} SET DEFAULT '{default}'
+            """
+        )
+    await connection.execute("ANALYZE")
+
+
+async def measure_sizes(
+    connection: asyncpg.Connection, *, tables: list[str]
+) -> dict[str, int]:
+    sizes = {}
+    for table in tables:
+        record = await connection.fetchrow(SIZES_QUERY, table)
+        sizes[f"{table} table"] = record["table_bytes"]
+        sizes[f"{table} indexes"] = record["index_bytes"]
+
+    return sizes
+
+
+async def run_storage_benchmark(
+    *,
+    url: str,
+    users: int = DEFAULT_USERS,
+    repeat: int = REPEAT,
+    rejected_cleanings: int = REJECTED_CLEANINGS,
+) -> dict[str, dict[str, dict[str, float]]]:
+    """Sizes in bytes and timings in seconds, with the columns as text and as enums."""
+    enum_columns = get_revision(ENUM_REVISION).ENUM_COLUMNS
+    tables = list(dict.fromkeys(table for table, _ in enum_columns))
+    results = {}
+    for storage, as_enums in (("text", False), ("enum", True)):
+        async with seeded_transaction(url, users=users) as (connection, values):
+            await store_columns(
+                connection, enum_columns=enum_columns, as_enums=as_enums
+            )
+            cleaning_ids = await connection.fetchval(
+                CLEANINGS_WITH_PENDING_OFFERS_QUERY, rejected_cleanings
+            )
+            bulk_reject = statistics.median(
+                [
+                    await explain_analyze(connection, BULK_REJECT_QUERY, [cleaning_ids])
+                    for _ in range(repeat)
+                ]
+            )
+            results[storage] = {
+                "sizes": await measure_sizes(connection, tables=tables),
+                "timings": {
+                    f"bulk reject, {len(cleaning_ids)} cleanings": bulk_reject,
+                    **await time_queries(connection, values, repeat=repeat),
+                },
+            }
+
+    return results
+
+
+def format_results(results: dict[str, dict[str, dict[str, float]]]) -> str:
+    text, enum = results["text"], results["enum"]
+    lines = [f"{'':<48}{'text':>12}{'enum':>12}{'saved':>12}"]
+    for name, size in text["sizes"].items():
+        packed = enum["sizes"][name]
+        lines.append(
+            f"{name:<48}{size / 2**20:>9.2f} MB{packed / 2**20:>9.2f} MB"
+            f"{(size - packed) / 2**20:>9.2f} MB"
+        )
+    for name, timing in text["timings"].items():
+        compared = enum["timings"][name]
+        lines.append(
+            f"{name:<48}{timing * 1e3:>9.3f} ms{compared * 1e3:>9.3f} ms"
+            f"{(timing - compared) * 1e3:>9.3f} ms"
+        )
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    url = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else str(DATABASE_URL)
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USERS
+    print(format_results(asyncio.run(run_storage_benchmark(url=url, users=users))))
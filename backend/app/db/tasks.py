@@ -1,30 +1,148 @@
+import asyncio
 import logging
 import os
 
-from app.core.config import DATABASE_URL
+from app.core.config import (
+    DATABASE_URL,
+    DB_BULKHEAD_POOLS,
+    DB_CONNECTION_BUDGET,
+    DB_ENGINE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_RECONNECT_INTERVAL_SECONDS,
+    DB_TYPE_CODECS,
+    WEB_CONCURRENCY,
+)
+from app.db.codecs import register_codecs
+from app.db.native import get_database_class
+from app.db.pools import DEFAULT_POOL
 from databases import Database
 from fastapi import FastAPI
 
 logger = logging.getLogger(__name__)
 
+# connections the server accepts from clients without superuser rights
+SERVER_CONNECTION_LIMIT_QUERY = """
+    SELECT current_setting('max_connections')::int
+           - current_setting('superuser_reserved_connections')::int
+"""
+
+
+def get_db_url() -> str:
+    return f"{DATABASE_URL}_test" if os.environ.get("TESTING") else str(DATABASE_URL)
+
+
+def get_bulkhead_sizes() -> dict[str, int]:
+    """Max size of every bulkhead pool, from "name:max_size,..."."""
+    sizes = {}
+    for bulkhead in DB_BULKHEAD_POOLS:
+        name, _, max_size = bulkhead.partition(":")
+        sizes[name.strip()] = int(max_size)
+
+    return sizes
+
+
+def get_pool_size(*, workers: int = WEB_CONCURRENCY) -> tuple[int, int]:
+    """Min and max size of the default pool of each worker."""
+    if not DB_CONNECTION_BUDGET:
+        return DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+
+    bulkheads = sum(get_bulkhead_sizes().values())
+    if workers * (1 + bulkheads) > DB_CONNECTION_BUDGET:
+        raise ValueError(
+            f"A connection budget of {DB_CONNECTION_BUDGET} can't fit {workers} "
+            f"workers with at least one pooled connection and {bulkheads} bulkhead "
+            "ones each"
+        )
+
+    max_size = DB_CONNECTION_BUDGET // workers - bulkheads
+    return min(DB_POOL_MIN_SIZE, max_size), max_size
+
+
+def get_max_connections(*, workers: int = WEB_CONCURRENCY) -> int:
+    """Connections the pools of all workers hold at most."""
+    _, max_size = get_pool_size(workers=workers)
+    return workers * (max_size + sum(get_bulkhead_sizes().values()))
 
-async def connect_to_db(app: FastAPI) -> None:
-    DB_URL = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else DATABASE_URL
-    database = Database(DB_URL, min_size=2, max_size=10)
 
+async def check_server_connection_limit(database: Database) -> None:
+    """Warn when the pools of all workers may open more than the server accepts."""
     try:
-        await database.connect()
-        app.state._db = database
+        server_limit = await database.fetch_val(SERVER_CONNECTION_LIMIT_QUERY)
     except Exception as e:
-        logger.warning("--- DB CONNECTION ERROR ---")
-        logger.warning(e)
-        logger.warning("--- DB CONNECTION ERROR ---")
+        logger.warning("Couldn't read the database's connection limit: %s", e)
+        return
+
+    max_connections = get_max_connections(workers=WEB_CONCURRENCY)
+    if max_connections > server_limit:
+        logger.warning(
+            "The pools of %d workers may open %d connections, the database only "
+            "accepts %d, set DB_CONNECTION_BUDGET or lower the pool sizes",
+            WEB_CONCURRENCY,
+            max_connections,
+            server_limit,
+        )
+
+
+async def keep_connecting(database: Database) -> None:
+    """Connect a pool the database couldn't be reached for, until it can be."""
+    while not database.is_connected:
+        await asyncio.sleep(DB_RECONNECT_INTERVAL_SECONDS)
+        try:
+            await database.connect()
+        except Exception as e:
+            logger.warning("Couldn't connect the %s pool: %s", database.pool_name, e)
+
+
+async def connect_to_db(app: FastAPI) -> None:
+    DB_URL = get_db_url()
+    min_size, max_size = get_pool_size()
+    database_class = get_database_class(DB_ENGINE)
+    options = {"init": register_codecs} if DB_TYPE_CODECS else {}
+    pools = {
+        DEFAULT_POOL: database_class(
+            DB_URL,
+            pool_name=DEFAULT_POOL,
+            min_size=min_size,
+            max_size=max_size,
+            **options,
+        ),
+        **{
+            name: database_class(
+                DB_URL, pool_name=name, min_size=min(1, size), max_size=size, **options
+            )
+            for name, size in get_bulkhead_sizes().items()
+        },
+    }
+
+    # keep the databases around even when they can't be reached yet, they are
+    # connected in the background and the readiness probe reports the worker as
+    # not ready until then
+    app.state._db = pools[DEFAULT_POOL]
+    app.state._pools = pools
+    app.state._reconnects = []
+    for database in pools.values():
+        try:
+            await database.connect()
+        except Exception as e:
+            logger.warning("--- DB CONNECTION ERROR ---")
+            logger.warning(e)
+            logger.warning("--- DB CONNECTION ERROR ---")
+            app.state._reconnects.append(asyncio.create_task(keep_connecting(database)))
+
+    if pools[DEFAULT_POOL].is_connected:
+        await check_server_connection_limit(pools[DEFAULT_POOL])
 
 
 async def close_db_connection(app: FastAPI) -> None:
-    try:
-        await app.state._db.disconnect()
-    except Exception as e:
-        logger.warning("--- DB DISCONNECT ERROR ---")
-        logger.warning(e)
-        logger.warning("--- DB DISCONNECT ERROR ---")
+    for reconnect in app.state._reconnects:
+        reconnect.cancel()
+    await asyncio.gather(*app.state._reconnects, return_exceptions=True)
+
+    for database in app.state._pools.values():
+        try:
+            await database.disconnect()
+        except Exception as e:
+            logger.warning("--- DB DISCONNECT ERROR ---")
+            logger.warning(e)
+            logger.warning("--- DB DISCONNECT ERROR ---")
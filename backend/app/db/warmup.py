@@ -0,0 +1,135 @@
+"""Warm up a worker before it starts serving requests.
+
+Right after a deploy every pooled connection still has to prepare its statements
+and introspect the custom column types, and the rows the busiest pages read are
+not in the database cache yet. Doing this during startup keeps that cost away
+from the first requests the worker serves.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from datetime import datetime, timezone
+
+from app.core.config import (
+    WARMUP_ENABLED,
+    WARMUP_FEED_PAGE_SIZE,
+    WARMUP_TIMEOUT_SECONDS,
+    WARMUP_TOP_CLEANERS,
+)
+from app.core.context import current_route
+from app.db.repositories.cleanings import GET_CLEANING_BY_ID_QUERY
+from app.db.repositories.evaluations import (
+    GET_CLEANER_AGGREGATE_RATINGS_QUERY,
+    LIST_EVALUATIONS_FOR_CLEANER_QUERY,
+    LIST_TOP_CLEANERS_QUERY,
+)
+from app.db.repositories.feed import FETCH_CLEANING_JOBS_FOR_FEED_QUERY, FeedRepository
+from app.db.repositories.offers import (
+    GET_OFFER_FOR_CLEANING_FROM_USER_QUERY,
+    LIST_OFFERS_FOR_CLEANING_QUERY,
+)
+from app.db.repositories.profiles import (
+    GET_PROFILE_BY_USER_ID_QUERY,
+    GET_PROFILE_BY_USERNAME_QUERY,
+)
+from app.db.repositories.users import (
+    GET_USER_BY_EMAIL_QUERY,
+    GET_USER_BY_ID_QUERY,
+    GET_USER_BY_USERNAME_QUERY,
+)
+from databases import Database
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# route the warm-up statements are recorded under in the metrics and slow query log
+WARMUP_ROUTE = "warmup"
+
+# read only statements behind the most requested routes
+HOT_QUERIES = (
+    GET_USER_BY_ID_QUERY,
+    GET_USER_BY_EMAIL_QUERY,
+    GET_USER_BY_USERNAME_QUERY,
+    GET_PROFILE_BY_USER_ID_QUERY,
+    GET_PROFILE_BY_USERNAME_QUERY,
+    GET_CLEANING_BY_ID_QUERY,
+    LIST_OFFERS_FOR_CLEANING_QUERY,
+    GET_OFFER_FOR_CLEANING_FROM_USER_QUERY,
+    LIST_EVALUATIONS_FOR_CLEANER_QUERY,
+    GET_CLEANER_AGGREGATE_RATINGS_QUERY,
+    FETCH_CLEANING_JOBS_FOR_FEED_QUERY,
+)
+
+
+async def prepare_statements(database: Database) -> None:
+    """Prepare the hot statements on the connection bound to the current context."""
+    for query in HOT_QUERIES:
+        # with every parameter NULL nothing matches, the statement is only prepared,
+        # through the database's own engine it is cached under the text it sends
+        values = dict.fromkeys(text(query).compile().params)
+        await database.fetch_all(query=query, values=values)
+
+
+async def warm_up_connections(database: Database) -> None:
+    """Check out `min_size` connections at once and prepare statements on each."""
+    size = database.options.get("min_size", 1)
+    barrier = asyncio.Barrier(size)
+
+    async def warm_up_connection() -> None:
+        current_route.set(WARMUP_ROUTE)
+        async with database.connection():
+            # hold on until every task has its own connection
+            await barrier.wait()
+            await prepare_statements(database)
+
+    # fresh contexts, so the tasks don't share the connection bound to this one
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(
+            loop.create_task(warm_up_connection(), context=contextvars.Context())
+            for _ in range(size)
+        )
+    )
+
+
+async def prime_hot_data(database: Database) -> None:
+    await FeedRepository(database).fetch_cleaning_jobs_feed(
+        starting_date=datetime.now(tz=timezone.utc),
+        page_chunk_size=WARMUP_FEED_PAGE_SIZE,
+    )
+    top_cleaners = await database.fetch_all(
+        query=LIST_TOP_CLEANERS_QUERY, values={"limit": WARMUP_TOP_CLEANERS}
+    )
+    for cleaner in top_cleaners:
+        await database.fetch_one(
+            query=GET_CLEANER_AGGREGATE_RATINGS_QUERY,
+            values={"cleaner_id": cleaner["cleaner_id"]},
+        )
+
+
+async def _warm_up(database: Database) -> None:
+    await warm_up_connections(database)
+    # afterwards, so the pool doesn't open an extra cold connection for it
+    await prime_hot_data(database)
+
+
+async def warm_up(database: Database) -> None:
+    if not WARMUP_ENABLED or not database.is_connected:
+        return
+
+    token = current_route.set(WARMUP_ROUTE)
+    started_at = time.perf_counter()
+    try:
+        await asyncio.wait_for(_warm_up(database), timeout=WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        # a cold worker is slower, not broken, so serve requests anyway
+        logger.warning("--- DB WARM-UP ERROR ---")
+        logger.warning(e)
+        logger.warning("--- DB WARM-UP ERROR ---")
+        return
+    finally:
+        current_route.reset(token)
+
+    logger.info("Warmed up in %.0f ms", (time.perf_counter() - started_at) * 1000)
@@ -0,0 +1,16 @@
+from app.models.core import CoreModel
+
+
+class PoolStats(CoreModel):
+    size: int = 0
+    idle: int = 0
+    in_use: int = 0
+    max_size: int = 0
+    waiting: int = 0
+    saturation: float = 0.0
+
+
+class Readiness(CoreModel):
+    ready: bool
+    detail: str | None
+    pool: PoolStats
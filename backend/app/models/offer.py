@@ -36,3 +36,13 @@ class OfferInDB(DateTimeModelMixin, OfferBase):
 class OfferPublic(OfferInDB):
     user: UserPublic | None
     cleaning: CleaningPublic | None
+
+
+class OfferAuthorization(CoreModel):
+    """Everything the offer routes check permissions against, loaded at once."""
+
+    cleaning_id: int
+    cleaning_owner: int
+    user_id: int | None
+    offer: OfferInDB | None
+    has_accepted_offer: bool
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from app.models.core import CoreModel
+from pydantic import confloat, conint
+
+
+class ProfilerSessionCreate(CoreModel):
+    """Profile the whole worker for `duration` seconds, or only a sampled
+    fraction of the requests made to `route` during that time.
+    """
+
+    duration: conint(ge=1, le=600) = 30
+    route: str | None
+    request_sample_rate: confloat(gt=0, le=1) = 1.0
+    interval_ms: conint(ge=1, le=1000) = 5
+
+
+class ProfilerSessionPublic(ProfilerSessionCreate):
+    started_at: datetime
+    ends_at: datetime
+    running: bool
+    samples: int
+    idle_samples: int
+    output_file: str | None
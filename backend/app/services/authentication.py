@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta, timezone
+from functools import cache
+from typing import TYPE_CHECKING
 
-import bcrypt
 import jwt
 from app.core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
@@ -11,10 +12,19 @@ from app.core.config import (
 from app.models.token import JWTCreds, JWTMeta, JWTPayload
 from app.models.user import UserBase, UserPasswordUpdate
 from fastapi import HTTPException, status
-from passlib.context import CryptContext
 from pydantic import ValidationError
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+@cache
+def get_pwd_context() -> "CryptContext":
+    # passlib and bcrypt are only needed to register and log in,
+    # load them on first use instead of when a worker boots
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 class AuthException(BaseException):
@@ -31,13 +41,15 @@ class AuthService:
         return UserPasswordUpdate(salt=salt, password=hashed_password)
 
     def generate_salt(self) -> str:
+        import bcrypt
+
         return bcrypt.gensalt().decode()
 
     def hash_password(self, *, password: str, salt: str) -> str:
-        return pwd_context.hash(secret=f"{password}{salt}")
+        return get_pwd_context().hash(secret=f"{password}{salt}")
 
     def verify_password(self, *, password: str, salt: str, hashed_pw: str) -> bool:
-        return pwd_context.verify(password + salt, hashed_pw)
+        return get_pwd_context().verify(password + salt, hashed_pw)
 
     def create_access_token_for_user(
         self,
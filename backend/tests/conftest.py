@@ -165,6 +165,20 @@ async def test_user6(db: Database) -> UserInDB:
     return await user_fixture_helper(db=db, new_user=new_user)
 
 
+@pytest_asyncio.fixture
+async def test_superuser(db: Database) -> UserInDB:
+    new_user = UserCreate(
+        email="admin@phresh.io", username="phreshadmin", password="superuserpassword"
+    )
+    user = await user_fixture_helper(db=db, new_user=new_user)
+    await db.execute(
+        query="UPDATE users SET is_superuser = TRUE WHERE id = :id;",
+        values={"id": user.id},
+    )
+
+    return await UsersRepository(db).get_user_by_id(user_id=user.id)
+
+
 @pytest_asyncio.fixture
 async def test_user_list(
     test_user3: UserInDB,
@@ -261,8 +275,8 @@ async def create_cleaning_with_evaluated_offer_helper(
     )
     await evals_repo.create_evaluation_for_cleaner(
         evaluation_create=evaluation_create,
-        cleaning=created_cleaning,
-        cleaner=cleaner,
+        cleaning_id=created_cleaning.id,
+        cleaner_id=cleaner.id,
     )
 
     return created_cleaning
@@ -0,0 +1,230 @@
+import asyncio
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from app.core import profiling
+from app.core.profiling import profiler
+from app.db.slow_queries import slow_query_log
+from app.models.profiler import ProfilerSessionCreate
+from app.models.user import UserInDB
+from fastapi import FastAPI, status
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestAdminRoutes:
+    async def test_regular_users_cant_access_admin_routes(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        response = await authorized_client.get(
+            app.url_path_for("admin:list-slow-queries")
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    async def test_unauthenticated_users_cant_access_admin_routes(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        response = await client.get(app.url_path_for("admin:list-slow-queries"))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class TestSlowQueryLog:
+    async def test_slow_queries_are_captured_with_plan(
+        self,
+        app: FastAPI,
+        create_authorized_client: Callable,
+        test_superuser: UserInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+        monkeypatch.setattr(slow_query_log, "max_captures_per_minute", 1000)
+        authorized_client = create_authorized_client(user=test_superuser)
+
+        response = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_200_OK
+        await slow_query_log.wait_for_pending()
+
+        response = await authorized_client.get(
+            app.url_path_for("admin:list-slow-queries")
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        entry = next(
+            entry
+            for entry in response.json()
+            if entry["query"]
+            == "GET_USER_BY_USERNAME_QUERY+GET_PROFILE_BY_OWNER_USERNAME_QUERY"
+            and entry["route"] == "users:get-current-user"
+        )
+        assert entry["values"] == {
+            "q0_username": test_superuser.username,
+            "q1_username": test_superuser.username,
+        }
+        assert entry["plan"][0]["Plan"]["Actual Rows"] == 1
+        assert "Shared Hit Blocks" in entry["plan"][0]["Plan"]
+
+    async def test_write_statements_are_explained_without_being_executed(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+        monkeypatch.setattr(slow_query_log, "max_captures_per_minute", 1000)
+
+        response = await authorized_client.post(
+            app.url_path_for("cleanings:create-cleaning"),
+            json={"new_cleaning": {"name": "slow", "price": 10.0}},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        await slow_query_log.wait_for_pending()
+
+        entry = next(
+            entry
+            for entry in reversed(slow_query_log.entries)
+            if entry["query"] == "CREATE_CLEANING_QUERY"
+        )
+        assert "Actual Rows" not in entry["plan"][0]["Plan"]
+
+    async def test_slow_query_captures_are_rate_limited(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+        monkeypatch.setattr(slow_query_log, "max_captures_per_minute", 0)
+        captured = len(slow_query_log.entries)
+
+        response = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_200_OK
+        await slow_query_log.wait_for_pending()
+
+        assert len(slow_query_log.entries) == captured
+
+
+class TestProfiler:
+    async def test_profiling_session_produces_collapsed_stacks(
+        self,
+        app: FastAPI,
+        create_authorized_client: Callable,
+        test_superuser: UserInDB,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(profiling, "PROFILER_OUTPUT_DIR", str(tmp_path))
+        authorized_client = create_authorized_client(user=test_superuser)
+
+        response = await authorized_client.post(
+            app.url_path_for("admin:start-profiler"),
+            json={"session_create": {"duration": 5, "interval_ms": 1}},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["running"] is True
+
+        response = await authorized_client.post(
+            app.url_path_for("admin:start-profiler"),
+            json={"session_create": {"duration": 5}},
+        )
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        # hashing a password keeps the event loop busy long enough to be sampled
+        response = await authorized_client.post(
+            app.url_path_for("users:register-new-user"),
+            json={
+                "new_user": {
+                    "email": "profiled@phresh.io",
+                    "username": "profiled",
+                    "password": "profiledpassword",
+                }
+            },
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = await authorized_client.delete(app.url_path_for("admin:stop-profiler"))
+        assert response.status_code == status.HTTP_200_OK
+        session = response.json()
+        assert session["running"] is False
+        assert session["samples"] > 0
+
+        response = await authorized_client.get(
+            app.url_path_for("admin:get-profiler-collapsed-stacks")
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert "app.services.authentication:AuthService.hash_password" in response.text
+        assert Path(session["output_file"]).read_text() == response.text
+        for line in response.text.splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+
+    async def test_route_sessions_only_sample_requests_to_that_route(
+        self,
+        app: FastAPI,
+        create_authorized_client: Callable,
+        test_superuser: UserInDB,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(profiling, "PROFILER_OUTPUT_DIR", str(tmp_path))
+        authorized_client = create_authorized_client(user=test_superuser)
+
+        response = await authorized_client.post(
+            app.url_path_for("admin:start-profiler"),
+            json={
+                "session_create": {
+                    "duration": 5,
+                    "interval_ms": 1,
+                    "route": "users:get-current-user",
+                }
+            },
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = await authorized_client.post(
+            app.url_path_for("users:register-new-user"),
+            json={
+                "new_user": {
+                    "email": "unprofiled@phresh.io",
+                    "username": "unprofiled",
+                    "password": "unprofiledpassword",
+                }
+            },
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        await asyncio.sleep(0.01)
+
+        session = await profiler.stop()
+        assert "AuthService.hash_password" not in session.collapsed()
+
+    async def test_stopping_a_session_doesnt_block_the_event_loop(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(profiling, "PROFILER_OUTPUT_DIR", str(tmp_path))
+        write = profiling.ProfilingSession._write
+
+        def slow_write(session: profiling.ProfilingSession) -> Path:
+            time.sleep(0.2)
+            return write(session)
+
+        monkeypatch.setattr(profiling.ProfilingSession, "_write", slow_write)
+        profiler.start(options=ProfilerSessionCreate(duration=5, interval_ms=1))
+
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        session = await profiler.stop()
+        ticker.cancel()
+
+        assert not session.running
+        assert session.output_file is not None
+        # the loop kept running while the file was written
+        assert ticks > 5
@@ -1,7 +1,10 @@
+import time
 from collections.abc import Callable
 
 import pytest
 import pytest_asyncio
+from app.core.context import RequestStats, request_stats
+from app.db import concurrency
 from app.db.repositories.cleanings import CleaningsRepository
 from app.models.cleaning import CleaningCreate, CleaningInDB, CleaningPublic
 from app.models.user import UserInDB
@@ -425,3 +428,56 @@ class TestPopulatedCleanings:
         assert cleaning.total_offers == len(test_user_list)
         # but no actual offers are included
         assert cleaning.offers == []
+
+
+class TestConcurrentLookups:
+    async def backend_pid(self, db: Database, *, sleep: float = 0.2) -> int:
+        return await db.fetch_val(
+            "SELECT pg_backend_pid() FROM pg_sleep(:sleep)", {"sleep": sleep}
+        )
+
+    async def test_lookups_overlap_on_separate_connections(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        started_at = time.perf_counter()
+        pids = await concurrency.gather(
+            db, *(self.backend_pid(db) for _ in range(3)), limit=3
+        )
+
+        assert len(set(pids)) == 3
+        assert time.perf_counter() - started_at < 0.5
+
+    async def test_results_keep_the_order_of_the_lookups(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        async def lookup(value: int) -> int:
+            return await db.fetch_val("SELECT CAST(:value AS integer)", {"value": value})
+
+        assert await concurrency.gather(
+            db, *(lookup(value) for value in range(5)), limit=3
+        ) == list(range(5))
+
+    async def test_requests_cant_borrow_more_connections_than_the_limit(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        try:
+            pids = await concurrency.gather(
+                db, *(self.backend_pid(db, sleep=0) for _ in range(4)), limit=2
+            )
+        finally:
+            request_stats.reset(token)
+
+        assert len(set(pids)) == 2
+        assert stats.fan_out_tasks == 0
+
+    async def test_lookups_inside_a_transaction_stay_on_its_connection(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        async with db.transaction():
+            pids = await concurrency.gather(
+                db, *(self.backend_pid(db, sleep=0) for _ in range(3)), limit=3
+            )
+
+        assert len(set(pids)) == 1
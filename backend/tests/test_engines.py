@@ -0,0 +1,197 @@
+from datetime import datetime
+
+import pytest
+from app.core.context import RequestStats, request_stats
+from app.db.batching import compile_batch, fetch_batch
+from app.db.benchmark import (
+    BENCHMARK_QUERIES,
+    format_decode_results,
+    format_results,
+    run_benchmark,
+    run_decode_benchmark,
+)
+from app.db.instrumentation import get_query_name
+from app.db.native import AsyncpgEngine, bind_query, compile_query
+from app.db.repositories.cleanings import GET_CLEANING_BY_ID_QUERY
+from app.db.repositories.profiles import GET_PROFILE_BY_USER_ID_QUERY
+from app.db.repositories.users import (
+    GET_USER_BY_ID_QUERY,
+    GET_USER_BY_USERNAME_QUERY,
+    UsersRepository,
+)
+from app.models.cleaning import CleaningPublic, CleaningType
+from app.models.offer import OfferStatus
+from app.models.user import UserInDB
+from databases import Database
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestQueryCompilation:
+    async def test_named_parameters_become_positional(self) -> None:
+        sql, names = compile_query(
+            "SELECT * FROM users WHERE id = :id OR (owner = :owner AND id > :id)"
+        )
+
+        assert sql == "SELECT * FROM users WHERE id = $1 OR (owner = $2 AND id > $1)"
+        assert names == ("id", "owner")
+
+    async def test_casts_and_literals_are_left_alone(self) -> None:
+        sql, names = compile_query("SELECT CAST(:value AS int), '12:30', now()::date")
+
+        assert sql == "SELECT CAST($1 AS int), '12:30', now()::date"
+        assert names == ("value",)
+        # like with `text()`, a parameter can't be cast with `::`
+        assert compile_query("SELECT :value::int") == ("SELECT :value::int", ())
+
+    async def test_values_are_bound_in_placeholder_order(self) -> None:
+        sql, args = bind_query("SELECT :b, :a", {"a": 1, "b": 2})
+        assert args == [2, 1]
+
+        # like `text()`, missing values are NULL and unknown ones are rejected
+        assert bind_query("SELECT :a, :b", {"a": 1})[1] == [1, None]
+        with pytest.raises(ValueError):
+            bind_query("SELECT :a", {"a": 1, "b": 2})
+
+
+class TestBatches:
+    async def test_statements_are_combined_into_one(self) -> None:
+        batch = compile_batch(
+            (
+                (GET_USER_BY_ID_QUERY, ("id", "username")),
+                (GET_PROFILE_BY_USER_ID_QUERY, ("id", "user_id")),
+            )
+        )
+
+        assert ":q0_id" in batch and ":q1_user_id" in batch
+        assert "AS q0_1" in batch and "AS q1_1" in batch
+        assert ";" not in batch.rstrip(";")
+        assert (
+            get_query_name(batch) == "GET_USER_BY_ID_QUERY+GET_PROFILE_BY_USER_ID_QUERY"
+        )
+
+    async def test_rows_of_every_statement_come_back_in_one_round_trip(
+        self, client: AsyncClient, db: Database, test_user: UserInDB
+    ) -> None:
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        try:
+            users, profiles, missing = await fetch_batch(
+                db,
+                (GET_USER_BY_ID_QUERY, {"id": test_user.id}),
+                (GET_PROFILE_BY_USER_ID_QUERY, {"user_id": test_user.id}),
+                (GET_USER_BY_USERNAME_QUERY, {"username": "nobody-has-this-name"}),
+            )
+        finally:
+            request_stats.reset(token)
+
+        assert stats.queries == 1
+        assert missing == []
+        user = UserInDB(**users[0])
+        assert user == UserInDB(
+            **await db.fetch_one(GET_USER_BY_ID_QUERY, {"id": test_user.id})
+        )
+        assert profiles[0]["user_id"] == test_user.id
+
+    async def test_values_are_decoded_the_same_as_unbatched(
+        self, client: AsyncClient, db: Database, test_cleaning: CleaningPublic
+    ) -> None:
+        values = {"id": test_cleaning.id}
+        (cleanings,) = await fetch_batch(db, (GET_CLEANING_BY_ID_QUERY, values))
+        record = await db.fetch_one(GET_CLEANING_BY_ID_QUERY, values)
+
+        cleaning = cleanings[0]
+        assert cleaning == {key: record[key] for key in cleaning}
+        # timestamps, numerics and enums go through asyncpg and the pool's codecs
+        assert type(cleaning["created_at"]) is datetime
+        assert type(cleaning["price"]) is type(record["price"])
+        assert type(cleaning["cleaning_type"]) is type(record["cleaning_type"])
+
+    async def test_rows_keep_the_order_of_their_statement(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        descending, unordered = await fetch_batch(
+            db,
+            (
+                "SELECT g AS n, g * 1.5 AS half FROM generate_series(1, :count) AS g"
+                " ORDER BY n DESC LIMIT 100",
+                {"count": 200},
+            ),
+            ("SELECT g AS n FROM generate_series(1, :count) AS g", {"count": 3}),
+        )
+
+        assert [row["n"] for row in descending] == list(range(200, 100, -1))
+        assert all(row["half"] == row["n"] * 1.5 for row in descending)
+        assert sorted(row["n"] for row in unordered) == [1, 2, 3]
+
+
+class TestCodecs:
+    async def test_numeric_columns_are_decoded_into_floats(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        price = await db.fetch_val(
+            "SELECT CAST(:price AS numeric(10, 2))", {"price": 12.5}
+        )
+
+        assert type(price) is float
+        assert price == 12.5
+
+    async def test_enum_columns_are_decoded_into_model_enums(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        status = await db.fetch_val(
+            "SELECT CAST(:status AS offer_status)", {"status": OfferStatus.accepted}
+        )
+        cleaning_type = await db.fetch_val(
+            "SELECT CAST(:cleaning_type AS cleaning_type)",
+            {"cleaning_type": "full_clean"},
+        )
+
+        assert status is OfferStatus.accepted
+        assert cleaning_type is CleaningType.full_clean
+
+    async def test_benchmark_compares_decoding_with_and_without_codecs(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        results = await run_decode_benchmark(url=str(db.url), rows=100, iterations=2)
+
+        assert set(results) == {"built-in", "codecs"}
+        for timings in results.values():
+            assert set(timings) == {"fetch", "fetch + models"}
+            assert all(timing > 0 for timing in timings.values())
+        assert "saved" in format_decode_results(results)
+
+
+class TestAsyncpgEngine:
+    async def test_engines_return_the_same_records(
+        self, client: AsyncClient, db: Database, test_user: UserInDB
+    ) -> None:
+        native = AsyncpgEngine(str(db.url), min_size=1, max_size=1)
+        await native.connect()
+        try:
+            values = {"id": test_user.id}
+            expected = await db.fetch_one(query=GET_USER_BY_ID_QUERY, values=values)
+            record = await native.fetch_one(query=GET_USER_BY_ID_QUERY, values=values)
+            assert dict(record) == {key: expected[key] for key in record.keys()}
+            assert await native.fetch_val(
+                query=GET_USER_BY_ID_QUERY, values=values, column="username"
+            ) == test_user.username
+
+            # repositories work unchanged on top of it
+            user = await UsersRepository(native).get_user_by_id(user_id=test_user.id)
+            assert user.username == test_user.username
+            assert user.profile is not None
+        finally:
+            await native.disconnect()
+
+    async def test_benchmark_compares_both_engines(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        results = await run_benchmark(url=str(db.url), iterations=20)
+
+        assert set(results) == {"databases", "asyncpg"}
+        for timings in results.values():
+            assert set(timings) == set(BENCHMARK_QUERIES)
+            assert all(timing > 0 for timing in timings.values())
+        assert "saved" in format_results(results)
@@ -1,7 +1,11 @@
+import asyncio
+import contextvars
 from collections.abc import Callable
 from statistics import mean
 
 import pytest
+from app.core import config
+from app.db.repositories.evaluations import EvaluationsRepository
 from app.models.cleaning import CleaningInDB
 from app.models.evaluation import (
     EvaluationAggregate,
@@ -11,7 +15,8 @@ from app.models.evaluation import (
 )
 from app.models.offer import OfferStatus
 from app.models.user import UserInDB
-from fastapi import FastAPI, status
+from databases import Database
+from fastapi import FastAPI, HTTPException, status
 from httpx import AsyncClient
 
 pytestmark = pytest.mark.asyncio
@@ -172,6 +177,65 @@ class TestCreateEvaluations:
         )
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
+    async def test_evaluation_checks_permissions_in_one_query(
+        self,
+        app: FastAPI,
+        create_authorized_client: Callable,
+        test_user2: UserInDB,
+        test_user3: UserInDB,
+        test_cleaning_with_accepted_offer: CleaningInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+        authorized_client = create_authorized_client(user=test_user2)
+
+        response = await authorized_client.post(
+            app.url_path_for(
+                "evaluations:create-evaluation-for-cleaner",
+                cleaning_id=test_cleaning_with_accepted_offer.id,
+                username=test_user3.username,
+            ),
+            json={"evaluation_create": {"overall_rating": 4}},
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        # user and profile for the token in one batch, the authorization and the
+        # evaluation
+        assert 'desc="3 queries"' in response.headers["Server-Timing"]
+
+    async def test_concurrent_evaluations_complete_the_offer_once(
+        self,
+        client: AsyncClient,
+        db: Database,
+        test_user3: UserInDB,
+        test_cleaning_with_accepted_offer: CleaningInDB,
+    ) -> None:
+        evals_repo = EvaluationsRepository(db)
+
+        async def evaluate(overall_rating: int) -> EvaluationInDB:
+            return await evals_repo.create_evaluation_for_cleaner(
+                evaluation_create=EvaluationCreate(overall_rating=overall_rating),
+                cleaning_id=test_cleaning_with_accepted_offer.id,
+                cleaner_id=test_user3.id,
+            )
+
+        # fresh contexts, so every evaluation runs on its own connection
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.create_task(evaluate(rating), context=contextvars.Context())
+                for rating in range(1, 4)
+            ),
+            return_exceptions=True,
+        )
+
+        created = [result for result in results if isinstance(result, EvaluationInDB)]
+        assert len(created) == 1
+        for result in results:
+            if not isinstance(result, EvaluationInDB):
+                assert isinstance(result, HTTPException)
+                assert result.status_code == status.HTTP_400_BAD_REQUEST
+
 
 class TestGetEvaluations:
     """Test that authenticated user who is not owner or cleaner can fetch a single evaluation
@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+from types import SimpleNamespace
+
+import asyncpg
+import pytest
+from app.api.dependencies.database import get_repository
+from app.api.routes import health
+from app.core.context import current_route
+from app.db import tasks, warmup
+from app.db.instrumentation import QUERY_COUNT
+from app.db.pools import ANALYTICS_POOL, DEFAULT_POOL, FEED_POOL
+from app.db.repositories.evaluations import EvaluationsRepository
+from app.db.repositories.feed import FeedRepository
+from app.db.repositories.users import UsersRepository
+from asgi_lifespan import LifespanManager
+from databases import Database
+from fastapi import FastAPI, status
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestLiveness:
+    async def test_live_does_not_touch_the_database(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        res = await client.get(app.url_path_for("health:live"))
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == {"status": "ok"}
+
+
+class TestReadiness:
+    async def test_ready_reports_pool_stats(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        res = await client.get(app.url_path_for("health:ready"))
+        assert res.status_code == status.HTTP_200_OK
+        body = res.json()
+        assert body["ready"] is True
+        assert body["detail"] is None
+        assert body["pool"]["max_size"] == 10
+        assert body["pool"]["size"] >= 1
+        assert 0 <= body["pool"]["saturation"] <= 1
+
+    async def test_ready_fails_when_pool_is_exhausted(
+        self, app: FastAPI, client: AsyncClient, db: Database, monkeypatch
+    ) -> None:
+        monkeypatch.setattr(health, "READINESS_TIMEOUT_SECONDS", 0.2)
+        release = asyncio.Event()
+        acquired = asyncio.Semaphore(0)
+
+        async def hold_connection() -> None:
+            async with db.connection():
+                acquired.release()
+                await release.wait()
+
+        # fresh contexts, so every task checks out its own connection
+        holders = [
+            asyncio.get_running_loop().create_task(
+                hold_connection(), context=contextvars.Context()
+            )
+            for _ in range(10)
+        ]
+        for _ in holders:
+            await acquired.acquire()
+
+        try:
+            res = await client.get(app.url_path_for("health:ready"))
+            assert res.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            body = res.json()
+            assert body["ready"] is False
+            assert body["pool"]["in_use"] == body["pool"]["max_size"] == 10
+            assert body["pool"]["saturation"] == 1
+        finally:
+            release.set()
+            await asyncio.gather(*holders)
+
+        res = await client.get(app.url_path_for("health:ready"))
+        assert res.status_code == status.HTTP_200_OK
+
+    async def test_unreachable_pools_are_connected_in_the_background(
+        self, app: FastAPI, monkeypatch
+    ) -> None:
+        create_pool = asyncpg.create_pool
+        reachable = False
+        attempts = 0
+
+        async def flaky_create_pool(*args, **kwargs):
+            nonlocal attempts
+            attempts += 1
+            if not reachable:
+                raise ConnectionRefusedError("database is down")
+            return await create_pool(*args, **kwargs)
+
+        monkeypatch.setattr(asyncpg, "create_pool", flaky_create_pool)
+        monkeypatch.setattr(tasks, "DB_RECONNECT_INTERVAL_SECONDS", 0.2)
+        async with LifespanManager(app):
+            async with AsyncClient(app=app, base_url="http://testserver") as client:
+                # concurrent probes only report, none of them connects a pool
+                started_attempts = attempts
+                responses = await asyncio.gather(
+                    *(client.get(app.url_path_for("health:ready")) for _ in range(5))
+                )
+                assert all(
+                    res.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+                    for res in responses
+                )
+                assert attempts - started_attempts <= 1
+
+                reachable = True
+                while not app.state._db.is_connected:
+                    await asyncio.sleep(0.01)
+                res = await client.get(app.url_path_for("health:ready"))
+                assert res.status_code == status.HTTP_200_OK
+
+    async def test_acquire_latency_is_exported(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        await client.get(app.url_path_for("health:ready"))
+        res = await client.get(app.url_path_for("metrics:get-metrics"))
+        assert "phresh_db_connection_acquire_seconds_count" in res.text
+        assert 'phresh_db_pool_size{pool="default",state="in_use"}' in res.text
+
+
+class TestWarmUp:
+    async def test_statements_are_prepared_on_every_pooled_connection(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        release = asyncio.Event()
+        cached_statements = []
+
+        async def check_out_connection() -> None:
+            async with db.connection() as connection:
+                cached_statements.append(len(connection.raw_connection._stmt_cache))
+                await release.wait()
+
+        loop = asyncio.get_running_loop()
+        holders = [
+            loop.create_task(check_out_connection(), context=contextvars.Context())
+            for _ in range(2)
+        ]
+        while len(cached_statements) < 2:
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*holders)
+
+        assert all(count >= len(warmup.HOT_QUERIES) for count in cached_statements)
+
+    async def test_warm_up_queries_are_recorded_under_their_own_route(
+        self, app: FastAPI
+    ) -> None:
+        before = QUERY_COUNT.get("LIST_TOP_CLEANERS_QUERY", warmup.WARMUP_ROUTE)
+
+        async with LifespanManager(app):
+            assert (
+                QUERY_COUNT.get("LIST_TOP_CLEANERS_QUERY", warmup.WARMUP_ROUTE)
+                > before
+            )
+
+    async def test_warm_up_route_is_reset_afterwards(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        token = current_route.set("startup")
+        try:
+            await warmup.warm_up(db)
+            assert current_route.get() == "startup"
+        finally:
+            current_route.reset(token)
+
+    async def test_warm_up_failures_do_not_prevent_startup(
+        self, app: FastAPI, monkeypatch
+    ) -> None:
+        async def fail(database: Database) -> None:
+            raise ConnectionError("database went away")
+
+        monkeypatch.setattr(warmup, "prime_hot_data", fail)
+        async with LifespanManager(app):
+            assert app.state._db.is_connected
+
+
+class TestBulkheads:
+    @pytest.fixture(autouse=True)
+    def bulkheads(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # none by default, configured before the app connects its pools
+        monkeypatch.setattr(tasks, "DB_BULKHEAD_POOLS", ["feed:3", "analytics:2"])
+
+    async def test_repositories_are_served_by_the_pool_they_declare(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        request = SimpleNamespace(app=app)
+        pools = app.state._pools
+
+        assert get_repository(UsersRepository)(request).db is pools[DEFAULT_POOL]
+        assert get_repository(FeedRepository)(request).db is pools[FEED_POOL]
+        evals_repo = get_repository(EvaluationsRepository, pool=ANALYTICS_POOL)(request)
+        assert evals_repo.db is pools[ANALYTICS_POOL]
+        # unknown pools fall back to the default one
+        users_repo = get_repository(UsersRepository, pool="reports")(request)
+        assert users_repo.db is app.state._db
+
+    async def test_exhausted_bulkhead_does_not_block_the_default_pool(
+        self, app: FastAPI, client: AsyncClient, db: Database
+    ) -> None:
+        feed_db = app.state._pools[FEED_POOL]
+        release = asyncio.Event()
+        acquired = asyncio.Semaphore(0)
+
+        async def hold_connection() -> None:
+            async with feed_db.connection():
+                acquired.release()
+                await release.wait()
+
+        max_size = feed_db.pool_stats().max_size
+        holders = [
+            asyncio.get_running_loop().create_task(
+                hold_connection(), context=contextvars.Context()
+            )
+            for _ in range(max_size)
+        ]
+        for _ in holders:
+            await acquired.acquire()
+
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(feed_db.fetch_val("SELECT 1"), timeout=0.2)
+            assert await asyncio.wait_for(db.fetch_val("SELECT 1"), timeout=1) == 1
+            res = await client.get(app.url_path_for("health:ready"))
+            assert res.status_code == status.HTTP_200_OK
+        finally:
+            release.set()
+            await asyncio.gather(*holders)
+
+        res = await client.get(app.url_path_for("metrics:get-metrics"))
+        assert f'phresh_db_pool_size{{pool="{FEED_POOL}",state="max"}}' in res.text
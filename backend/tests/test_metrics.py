@@ -0,0 +1,546 @@
+import asyncio
+import io
+import json
+import logging
+import time
+
+import asyncpg
+import pytest
+from app.core import config
+from app.api.routing import InstrumentedRoute, latency_budget
+from app.core.access_log import ACCESS_LOG_DROPPED, AccessLog, access_log
+from app.core.context import request_deadline
+from app.core.load_shedding import (
+    LOAD_SHED,
+    PRIORITY_FEED,
+    PRIORITY_READ,
+    PRIORITY_WRITE,
+    GradientLimiter,
+    load_shedder,
+)
+from app.core.loop_monitor import LOOP_BLOCKED, EventLoopMonitor, loop_monitor
+from app.core.metrics import Metric, MetricsRegistry
+from app.db.instrumentation import (
+    QUERY_COUNT,
+    UNNAMED_QUERY,
+    InstrumentedDatabase,
+    get_query_name,
+    pinned_connection,
+)
+from app.db.repositories.feed import FeedRepository
+from app.db.repositories.offers import LIST_OFFERS_FOR_CLEANING_QUERY
+from app.models.cleaning import CleaningInDB
+from app.models.user import UserInDB
+from fastapi import APIRouter, FastAPI, HTTPException, status
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestMetricsRegistry:
+    async def test_counter_and_histogram_are_rendered(self) -> None:
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "Test counter.", ("query",))
+        histogram = registry.histogram(
+            "test_seconds", "Test histogram.", ("query",), buckets=(0.1, 1.0)
+        )
+
+        counter.inc("FOO_QUERY")
+        counter.inc("FOO_QUERY")
+        histogram.observe("FOO_QUERY", value=0.5)
+
+        rendered = registry.render()
+        assert 'test_total{query="FOO_QUERY"} 2' in rendered
+        assert 'test_seconds_bucket{query="FOO_QUERY",le="0.1"} 0' in rendered
+        assert 'test_seconds_bucket{query="FOO_QUERY",le="1.0"} 1' in rendered
+        assert 'test_seconds_count{query="FOO_QUERY"} 1' in rendered
+
+    async def test_metrics_without_samples_cant_be_created(self) -> None:
+        class Summary(Metric):
+            type_name = "summary"
+
+        with pytest.raises(TypeError):
+            Summary("test_summary", "Test summary.")
+
+
+class TestQueryNames:
+    async def test_repository_queries_are_named_after_their_constant(self) -> None:
+        assert (
+            get_query_name(LIST_OFFERS_FOR_CLEANING_QUERY)
+            == "LIST_OFFERS_FOR_CLEANING_QUERY"
+        )
+        assert get_query_name("SELECT 1;") == UNNAMED_QUERY
+
+
+def block_event_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+class TestEventLoopMonitor:
+    async def test_blocking_callbacks_are_reported_with_their_stack(
+        self, caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # alembic's fileConfig disables loggers created before migrations ran
+        monkeypatch.setattr(logging.getLogger("app.core.loop_monitor"), "disabled", False)
+        monitor = EventLoopMonitor(interval_ms=10, blocking_threshold_ms=50)
+        blocked_before = LOOP_BLOCKED.get()
+        monitor.start()
+        await asyncio.sleep(0.05)
+
+        with caplog.at_level(logging.WARNING, logger="app.core.loop_monitor"):
+            block_event_loop(0.3)
+            await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert LOOP_BLOCKED.get() == blocked_before + 1
+        assert "Event loop blocked" in caplog.text
+        assert "in block_event_loop" in caplog.text
+
+    async def test_short_callbacks_are_not_reported(
+        self, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        monitor = EventLoopMonitor(interval_ms=10, blocking_threshold_ms=200)
+        monitor.start()
+
+        with caplog.at_level(logging.WARNING, logger="app.core.loop_monitor"):
+            block_event_loop(0.02)
+            await asyncio.sleep(0.1)
+        await monitor.stop()
+
+        assert "Event loop blocked" not in caplog.text
+
+
+class TestMetricsRoutes:
+    async def test_queries_are_counted_per_route(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        response = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_200_OK
+
+        response = await authorized_client.get(app.url_path_for("metrics:get-metrics"))
+        assert response.status_code == status.HTTP_200_OK
+        assert (
+            "phresh_db_queries_total{query="
+            '"GET_USER_BY_USERNAME_QUERY+GET_PROFILE_BY_OWNER_USERNAME_QUERY",'
+            'route="users:get-current-user"}' in response.text
+        )
+        assert (
+            "phresh_db_query_duration_seconds_count{query="
+            '"GET_USER_BY_USERNAME_QUERY+GET_PROFILE_BY_OWNER_USERNAME_QUERY",'
+            'route="users:get-current-user"}' in response.text
+        )
+
+    async def test_event_loop_lag_is_exported(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        # opt-in, the workers don't start it by default
+        assert not loop_monitor.running
+        monitor = EventLoopMonitor(interval_ms=10)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+        response = await client.get(app.url_path_for("metrics:get-metrics"))
+        assert response.status_code == status.HTTP_200_OK
+        assert "phresh_event_loop_lag_seconds_count" in response.text
+        assert "phresh_event_loop_lag_last_seconds" in response.text
+
+
+class TestServerTiming:
+    async def test_server_timing_header_reports_request_costs(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_cleaning: CleaningInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+
+        response = await authorized_client.get(
+            app.url_path_for("cleanings:get-cleaning-by-id", cleaning_id=test_cleaning.id)
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        entries = {
+            entry.split(";")[0]: entry
+            for entry in response.headers["Server-Timing"].split(", ")
+        }
+        assert set(entries) == {"app", "db", "db-acquire", "serialize"}
+        # user and profile for the token, then cleaning, its offers and the offer
+        # from the requesting user, then owner and owner profile, in three batches
+        assert 'desc="3 queries"' in entries["db"]
+        for entry in entries.values():
+            assert float(entry.split("dur=")[1].split(";")[0]) >= 0
+
+    async def test_server_timing_is_reported_for_errors(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+
+        response = await authorized_client.get(
+            app.url_path_for("cleanings:get-cleaning-by-id", cleaning_id=500)
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert "db;dur=" in response.headers["Server-Timing"]
+
+    async def test_server_timing_is_disabled_by_default(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        response = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_200_OK
+        assert "Server-Timing" not in response.headers
+
+
+class TestConnectionPinning:
+    def server_timing(self, response) -> dict[str, str]:
+        return {
+            entry.split(";")[0]: entry
+            for entry in response.headers["Server-Timing"].split(", ")
+        }
+
+    async def test_queries_acquire_connections_one_by_one_without_pinning(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_cleaning: CleaningInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+        monkeypatch.setattr(config, "DB_PIN_CONNECTIONS", False)
+
+        response = await authorized_client.get(
+            app.url_path_for("cleanings:get-cleaning-by-id", cleaning_id=test_cleaning.id)
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert 'desc="1 connections"' not in self.server_timing(response)["db-acquire"]
+
+    async def test_pinned_get_requests_run_on_one_connection(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_cleaning: CleaningInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+        monkeypatch.setattr(config, "DB_PIN_CONNECTIONS", True)
+        monkeypatch.setattr(config, "DB_READ_ONLY_GET_TRANSACTIONS", True)
+
+        response = await authorized_client.get(
+            app.url_path_for("cleanings:get-cleaning-by-id", cleaning_id=test_cleaning.id)
+        )
+        assert response.status_code == status.HTTP_200_OK
+        entries = self.server_timing(response)
+        assert 'desc="3 queries"' in entries["db"]
+        assert 'desc="1 connections"' in entries["db-acquire"]
+
+    async def test_pinned_writes_are_not_read_only(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+        monkeypatch.setattr(config, "DB_PIN_CONNECTIONS", True)
+        monkeypatch.setattr(config, "DB_READ_ONLY_GET_TRANSACTIONS", True)
+
+        response = await authorized_client.post(
+            app.url_path_for("cleanings:create-cleaning"),
+            json={
+                "new_cleaning": {
+                    "name": "pinned cleaning",
+                    "price": 9.99,
+                    "cleaning_type": "spot_clean",
+                }
+            },
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'desc="1 connections"' in self.server_timing(response)["db-acquire"]
+
+    async def test_read_only_pin_rejects_writes_and_returns_the_connection(
+        self, client: AsyncClient, db: InstrumentedDatabase
+    ) -> None:
+        in_use = db.pool_stats().in_use
+
+        with pytest.raises(asyncpg.ReadOnlySQLTransactionError):
+            async with pinned_connection(read_only=True) as pin:
+                await db.fetch_val("SELECT 1")
+                assert pin.connection is db.connection()
+                await db.execute("CREATE TEMPORARY TABLE pinned (id int)")
+
+        assert pin.connection is None
+        assert db.pool_stats().in_use == in_use
+
+
+class TestLatencyBudgets:
+    async def test_queries_are_not_run_past_the_deadline(
+        self, client: AsyncClient, db: InstrumentedDatabase
+    ) -> None:
+        token = request_deadline.set(time.perf_counter() - 1)
+        try:
+            with pytest.raises(HTTPException) as exc_info:
+                await db.fetch_val("SELECT 1")
+        finally:
+            request_deadline.reset(token)
+
+        assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    async def test_statements_are_cancelled_when_the_budget_runs_out(
+        self, client: AsyncClient, db: InstrumentedDatabase
+    ) -> None:
+        started_at = time.perf_counter()
+        token = request_deadline.set(started_at + 0.2)
+        try:
+            with pytest.raises(HTTPException) as exc_info:
+                await db.fetch_val("SELECT pg_sleep(5) AS budgeted_sleep")
+        finally:
+            request_deadline.reset(token)
+
+        assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert time.perf_counter() - started_at < 2
+        # cancelled on the server as well, not just abandoned
+        assert not await db.fetch_val(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE state = 'active' AND query LIKE '%AS budgeted_sleep'"
+        )
+        assert await db.fetch_val("SHOW statement_timeout") == "0"
+
+    async def test_budgeted_requests_send_no_statements_of_their_own(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        statements = []
+        do_execute, execute = asyncpg.Connection._do_execute, asyncpg.Connection.execute
+
+        async def count_do_execute(self, query, *args, **kwargs):
+            statements.append(query)
+            return await do_execute(self, query, *args, **kwargs)
+
+        async def count_execute(self, query, *args, **kwargs):
+            # with arguments it runs through `_do_execute`, the pool resets the
+            # connections it gets back with `RESET ALL` and co.
+            if not args and "RESET ALL" not in query:
+                statements.append(query)
+            return await execute(self, query, *args, **kwargs)
+
+        monkeypatch.setattr(asyncpg.Connection, "_do_execute", count_do_execute)
+        monkeypatch.setattr(asyncpg.Connection, "execute", count_execute)
+        # a read-only transaction around the request would add statements of its own
+        monkeypatch.setattr(config, "DB_PIN_CONNECTIONS", False)
+        route = "feed:get-cleaning-feed-for-user"
+
+        def count_queries() -> float:
+            return sum(
+                value
+                for _, labels, value in QUERY_COUNT.samples()
+                if labels["route"] == route
+            )
+
+        queries_before = count_queries()
+        response = await authorized_client.get(app.url_path_for(route))
+        assert response.status_code == status.HTTP_200_OK
+
+        assert len(statements) == count_queries() - queries_before > 0
+
+    async def test_routes_out_of_budget_answer_503(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        async def slow_feed(self, **kwargs) -> list:
+            await self.db.fetch_val("SELECT pg_sleep(5)")
+            return []
+
+        monkeypatch.setattr(FeedRepository, "fetch_cleaning_jobs_feed", slow_feed)
+
+        started_at = time.perf_counter()
+        response = await authorized_client.get(
+            app.url_path_for("feed:get-cleaning-feed-for-user")
+        )
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert time.perf_counter() - started_at < 3
+
+    async def test_queries_are_cancelled_when_the_client_disconnects(
+        self, client: AsyncClient, db: InstrumentedDatabase
+    ) -> None:
+        router = APIRouter(route_class=InstrumentedRoute)
+
+        @router.get("/slow/", name="test:slow")
+        @latency_budget(ms=10_000)
+        async def slow() -> None:
+            await db.fetch_val("SELECT pg_sleep(5)")
+
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive() -> dict:
+            if messages:
+                return messages.pop()
+            await asyncio.sleep(0.2)
+            return {"type": "http.disconnect"}
+
+        sent = []
+
+        async def send(message: dict) -> None:
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/slow/",
+            "query_string": b"",
+            "headers": [],
+        }
+        started_at = time.perf_counter()
+        await router.routes[0].handle(scope, receive, send)
+
+        assert time.perf_counter() - started_at < 2
+        assert sent[0]["status"] == 499
+        # postgres was told to stop the statement, not just the request
+        running = await db.fetch_val(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE state = 'active' AND query LIKE '%pg_sleep(5)'"
+        )
+        assert running == 0
+
+
+class TestLoadShedding:
+    async def test_lower_priorities_get_a_share_of_the_limit(self) -> None:
+        limiter = GradientLimiter(initial_limit=10, min_limit=1, max_limit=100)
+        shed = LOAD_SHED.get(PRIORITY_FEED)
+
+        admitted = {
+            priority: sum(limiter.try_acquire(priority=priority) for _ in range(10))
+            for priority in (PRIORITY_FEED, PRIORITY_READ, PRIORITY_WRITE)
+        }
+
+        assert admitted == {PRIORITY_FEED: 6, PRIORITY_READ: 3, PRIORITY_WRITE: 1}
+        assert LOAD_SHED.get(PRIORITY_FEED) == shed + 4
+
+    async def test_limit_settles_where_requests_start_queueing(self) -> None:
+        limiter = GradientLimiter(initial_limit=10, min_limit=2, max_limit=200)
+
+        def serve(*, capacity: int) -> None:
+            # requests over the capacity of the database queue up for it
+            count = int(limiter.limit)
+            for _ in range(count):
+                assert limiter.try_acquire(priority=PRIORITY_WRITE)
+            for _ in range(count):
+                limiter.release(latency=0.01 * max(1, count / capacity))
+
+        for _ in range(100):
+            serve(capacity=20)
+        assert 15 < limiter.limit < 40
+
+        for _ in range(50):
+            serve(capacity=5)
+        assert limiter.limit < 15
+
+    async def test_failures_back_off(self) -> None:
+        limiter = GradientLimiter(initial_limit=10, min_limit=2, max_limit=100)
+
+        assert limiter.try_acquire()
+        limiter.release(latency=0.01, failed=True)
+
+        assert limiter.limit == 9
+        assert limiter.in_flight == 0
+
+    async def test_requests_over_the_limit_are_rejected(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(load_shedder, "in_flight", int(load_shedder.limit))
+        # opt-in, nothing is shed by default
+        response = await client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        monkeypatch.setattr(config, "LOAD_SHEDDING_ENABLED", True)
+        response = await client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == str(
+            config.LOAD_SHEDDING_RETRY_AFTER_SECONDS
+        )
+
+        # probes and scrapes still get through
+        response = await client.get(app.url_path_for("health:live"))
+        assert response.status_code == status.HTTP_200_OK
+        response = await client.get(app.url_path_for("metrics:get-metrics"))
+        assert response.status_code == status.HTTP_200_OK
+        assert "phresh_concurrency_limit" in response.text
+
+    async def test_shed_requests_keep_their_cors_headers(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "LOAD_SHEDDING_ENABLED", True)
+        monkeypatch.setattr(load_shedder, "in_flight", int(load_shedder.limit))
+        url = app.url_path_for("users:get-current-user")
+        origin = {"Origin": "https://phresh.io"}
+
+        response = await client.get(url, headers=origin)
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert "access-control-allow-origin" in response.headers
+
+        # the preflight is answered before the request could be shed
+        response = await client.options(
+            url, headers={**origin, "Access-Control-Request-Method": "GET"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_admitted_requests_are_released(
+        self, app: FastAPI, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(config, "LOAD_SHEDDING_ENABLED", True)
+        in_flight = load_shedder.in_flight
+
+        response = await client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert load_shedder.in_flight == in_flight
+
+
+class TestAccessLog:
+    async def test_requests_are_logged_with_their_cost(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: UserInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        stream = io.StringIO()
+        monkeypatch.setattr(config, "ACCESS_LOG_ENABLED", True)
+        monkeypatch.setattr(access_log, "stream", stream)
+        access_log.start()
+
+        response = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_200_OK
+        await asyncio.to_thread(access_log.stop)
+
+        entry = json.loads(stream.getvalue().splitlines()[-1])
+        assert entry["route"] == "users:get-current-user"
+        assert entry["method"] == "GET"
+        assert entry["status"] == status.HTTP_200_OK
+        assert entry["user_id"] == test_user.id
+        assert entry["queries"] == 1
+        assert entry["rows"] == 1
+        assert entry["bytes_written"] == len(response.content)
+        assert entry["cache_hits"] == 0
+        assert entry["latency_ms"] >= entry["db_ms"] > 0
+
+    async def test_entries_are_dropped_instead_of_blocking_when_buffer_is_full(
+        self,
+    ) -> None:
+        log = AccessLog(max_buffer_size=1)
+        dropped_before = ACCESS_LOG_DROPPED.get()
+
+        log.emit({"path": "/first"})
+        log.emit({"path": "/second"})
+
+        assert ACCESS_LOG_DROPPED.get() == dropped_before + 1
@@ -0,0 +1,98 @@
+import pytest
+from app.db.index_benchmark import (
+    INDEX_REVISION,
+    format_results,
+    get_revision,
+    run_index_benchmark,
+)
+from app.db.storage_benchmark import (
+    ENUM_REVISION,
+    run_storage_benchmark,
+)
+from app.db.storage_benchmark import format_results as format_storage_results
+from databases import Database
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestIndexRevision:
+    async def test_indexes_match_the_query_patterns(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        revision = get_revision(INDEX_REVISION)
+        indexes = {
+            record["name"]: record["valid"]
+            for record in await db.fetch_all(
+                """
+                SELECT c.relname AS name, i.indisvalid AS valid
+                FROM pg_index i
+                    INNER JOIN pg_class c ON c.oid = i.indexrelid
+                    INNER JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public'
+                """
+            )
+        }
+
+        assert all(indexes.get(name) for name in revision.INDEXES)
+        assert not set(revision.REPLACED_INDEXES) & set(indexes)
+
+    async def test_benchmark_compares_queries_before_and_after(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        users = await db.fetch_val("SELECT count(*) FROM users")
+
+        results = await run_index_benchmark(url=str(db.url), users=40, repeat=1)
+
+        assert set(results) == {"before", "after"}
+        timings = results["after"]["timings"]
+        assert set(timings) == set(results["before"]["timings"])
+        assert {"LIST_ALL_USER_CLEANINGS_QUERY", "ACCEPT_OFFER_QUERY"} <= set(timings)
+        assert all(timing > 0 for timing in timings.values())
+        assert "size of all indexes" in format_results(results)
+        # seeded rows and swapped indexes are rolled back
+        assert await db.fetch_val("SELECT count(*) FROM users") == users
+        assert not set(get_revision(INDEX_REVISION).REPLACED_INDEXES) & {
+            record["indexname"]
+            for record in await db.fetch_all("SELECT indexname FROM pg_indexes")
+        }
+
+
+class TestEnumRevision:
+    async def test_columns_are_stored_as_enums(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        for (table, column), (type_, values, _) in get_revision(
+            ENUM_REVISION
+        ).ENUM_COLUMNS.items():
+            assert await db.fetch_val(
+                "SELECT udt_name FROM information_schema.columns "
+                "WHERE table_name = :table AND column_name = :column",
+                {"table": table, "column": column},
+            ) == type_
+            assert await db.fetch_val(
+                "SELECT array_agg(enumlabel::text ORDER BY enumsortorder) "
+                "FROM pg_enum WHERE enumtypid = to_regtype(:type_)",
+                {"type_": type_},
+            ) == list(values)
+
+    async def test_benchmark_compares_text_and_enum_storage(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        users = await db.fetch_val("SELECT count(*) FROM users")
+
+        results = await run_storage_benchmark(
+            url=str(db.url), users=40, repeat=1, rejected_cleanings=10
+        )
+
+        assert set(results) == {"text", "enum"}
+        for phase in ("sizes", "timings"):
+            assert set(results["text"][phase]) == set(results["enum"][phase])
+        assert "bulk reject, 10 cleanings" in results["enum"]["timings"]
+        assert "saved" in format_storage_results(results)
+        # seeded rows and column types are rolled back
+        assert await db.fetch_val("SELECT count(*) FROM users") == users
+        assert await db.fetch_val(
+            "SELECT udt_name FROM information_schema.columns "
+            "WHERE table_name = 'cleanings' AND column_name = 'cleaning_type'"
+        ) == "cleaning_type"
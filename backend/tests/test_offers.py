@@ -1,15 +1,21 @@
+import asyncio
+import contextvars
 import random
 from collections.abc import Callable
 
 import pytest
+from app.core import config
 from app.db.repositories.offers import OffersRepository
 from app.models.cleaning import CleaningInDB
 from app.models.offer import (
+    OfferInDB,
     OfferPublic,
     OfferStatus,
+    OfferUpdate,
 )
 from app.models.user import UserInDB
-from fastapi import FastAPI, status
+from databases import Database
+from fastapi import FastAPI, HTTPException, status
 from httpx import AsyncClient
 
 pytestmark = pytest.mark.asyncio
@@ -231,6 +237,29 @@ class TestGetOffers:
         for offer in response.json():
             assert any(offer["user_id"] == user.id for user in test_user_list)
 
+    async def test_listing_offers_doesnt_fetch_the_cleaning(
+        self,
+        app: FastAPI,
+        create_authorized_client: Callable,
+        test_user2: UserInDB,
+        test_cleaning_with_offers: CleaningInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+        authorized_client = create_authorized_client(user=test_user2)
+
+        response = await authorized_client.get(
+            app.url_path_for(
+                "offers:list-offers-for-cleaning",
+                cleaning_id=test_cleaning_with_offers.id,
+            )
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        # the token user, the authorization, the offers and the user of each offer
+        queries = 3 + len(response.json())
+        assert f'desc="{queries} queries"' in response.headers["Server-Timing"]
+
     async def test_non_owners_forbidden_from_fetching_all_offers_for_cleaning(
         self,
         app: FastAPI,
@@ -273,6 +302,93 @@ class TestAcceptOffers:
         assert accepted_offer.user_id == selected_user.id
         assert accepted_offer.cleaning_id == test_cleaning_with_offers.id
 
+    async def test_acceptance_checks_permissions_in_one_query(
+        self,
+        app: FastAPI,
+        create_authorized_client: Callable,
+        test_user2: UserInDB,
+        test_user_list: list[UserInDB],
+        test_cleaning_with_offers: CleaningInDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+        authorized_client = create_authorized_client(user=test_user2)
+
+        response = await authorized_client.put(
+            app.url_path_for(
+                "offers:accept-offer-from-user",
+                cleaning_id=test_cleaning_with_offers.id,
+                username=test_user_list[0].username,
+            )
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        # user and profile for the token in one batch, the authorization and the
+        # acceptance
+        assert 'desc="3 queries"' in response.headers["Server-Timing"]
+
+    async def test_accepted_offer_is_returned_with_user_and_profile(
+        self,
+        client: AsyncClient,
+        db: Database,
+        test_user_list: list[UserInDB],
+        test_cleaning_with_offers: CleaningInDB,
+    ) -> None:
+        offers_repo = OffersRepository(db)
+        selected_user = test_user_list[0]
+
+        accepted_offer = await offers_repo.accept_offer(
+            offer=OfferInDB(
+                cleaning_id=test_cleaning_with_offers.id, user_id=selected_user.id
+            ),
+            offer_update=OfferUpdate(status=OfferStatus.accepted),
+        )
+
+        assert accepted_offer.user.id == selected_user.id
+        assert accepted_offer.user.username == selected_user.username
+        assert accepted_offer.user.profile.user_id == selected_user.id
+
+    async def test_only_one_of_concurrent_acceptances_succeeds(
+        self,
+        client: AsyncClient,
+        db: Database,
+        test_user_list: list[UserInDB],
+        test_cleaning_with_offers: CleaningInDB,
+    ) -> None:
+        offers_repo = OffersRepository(db)
+
+        async def accept(user: UserInDB) -> OfferPublic:
+            return await offers_repo.accept_offer(
+                offer=OfferInDB(
+                    cleaning_id=test_cleaning_with_offers.id, user_id=user.id
+                ),
+                offer_update=OfferUpdate(status=OfferStatus.accepted),
+            )
+
+        # fresh contexts, so every acceptance runs on its own connection
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.create_task(accept(user), context=contextvars.Context())
+                for user in test_user_list
+            ),
+            return_exceptions=True,
+        )
+
+        accepted = [result for result in results if isinstance(result, OfferPublic)]
+        assert len(accepted) == 1
+        for result in results:
+            if not isinstance(result, OfferPublic):
+                assert isinstance(result, HTTPException)
+                assert result.status_code == status.HTTP_400_BAD_REQUEST
+
+        offers = await offers_repo.list_offers_for_cleaning(
+            cleaning=test_cleaning_with_offers, populate=False
+        )
+        statuses = sorted(offer.status for offer in offers)
+        assert statuses.count(OfferStatus.accepted) == 1
+        assert statuses.count(OfferStatus.rejected) == len(offers) - 1
+
     async def test_non_owner_forbidden_from_accepting_offer_for_cleaning(
         self,
         app: FastAPI,
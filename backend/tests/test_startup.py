@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+from app.db import tasks
+from app.api import openapi
+from app.api.openapi import (
+    load_openapi_schema,
+    precomputed_openapi,
+    write_openapi_schema,
+)
+from databases import Database
+from fastapi import FastAPI, status
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+# best of a few cold imports of the application in a fresh interpreter,
+# raise it deliberately when a change really needs the extra startup time
+IMPORT_TIME_BUDGET_SECONDS = float(os.environ.get("IMPORT_TIME_BUDGET_SECONDS", 2.5))
+
+# only needed by a few routes, imported on first use
+LAZY_MODULES = ("passlib", "bcrypt")
+
+MEASURE_IMPORT = """
+import json, sys, time
+started_at = time.perf_counter()
+import app.api.server
+print(json.dumps({
+    "seconds": time.perf_counter() - started_at,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def cold_import() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE_IMPORT],
+        capture_output=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+        text=True,
+    )
+    return json.loads(result.stdout)
+
+
+class TestColdStart:
+    async def test_import_time_is_within_budget(self) -> None:
+        seconds = min(cold_import()["seconds"] for _ in range(3))
+        assert seconds < IMPORT_TIME_BUDGET_SECONDS
+
+    async def test_heavy_optional_modules_are_not_imported(self) -> None:
+        modules = set(cold_import()["modules"])
+        assert not modules.intersection(LAZY_MODULES)
+
+
+class TestPrecomputedOpenAPI:
+    async def test_schema_is_served_from_file(
+        self, app: FastAPI, client: AsyncClient, tmp_path: Path
+    ) -> None:
+        schema_file = tmp_path / "openapi.json"
+        write_openapi_schema(app, path=str(schema_file))
+        written = json.loads(schema_file.read_text())
+        written["schema"]["info"]["description"] = "precomputed"
+        schema_file.write_text(json.dumps(written))
+
+        # written for this application, which hasn't generated its own schema yet
+        app.openapi_schema = None
+        app.openapi = precomputed_openapi(app, path=str(schema_file))
+
+        res = await client.get(app.openapi_url)
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json()["info"]["description"] == "precomputed"
+
+    async def test_schema_written_for_other_source_is_outdated(
+        self, app: FastAPI, tmp_path: Path, monkeypatch
+    ) -> None:
+        source_dir = tmp_path / "app"
+        shutil.copytree(
+            openapi.APP_DIR, source_dir, ignore=shutil.ignore_patterns("__pycache__")
+        )
+        monkeypatch.setattr(openapi, "APP_DIR", source_dir)
+        schema_file = tmp_path / "openapi.json"
+        write_openapi_schema(app, path=str(schema_file))
+        assert load_openapi_schema(app, path=str(schema_file)) is not None
+
+        # a model changes without the routes or the version changing
+        model = source_dir / "models" / "cleaning.py"
+        model.write_text(model.read_text() + "\n# changed\n")
+        assert load_openapi_schema(app, path=str(schema_file)) is None
+
+    async def test_outdated_schema_is_generated_again(
+        self, app: FastAPI, client: AsyncClient, tmp_path: Path
+    ) -> None:
+        schema_file = tmp_path / "openapi.json"
+        schema_file.write_text(
+            json.dumps({"fingerprint": "outdated", "schema": {"paths": {"/gone": {}}}})
+        )
+        app.openapi_schema = None
+        app.openapi = precomputed_openapi(app, path=str(schema_file))
+
+        res = await client.get(app.openapi_url)
+        assert res.status_code == status.HTTP_200_OK
+        assert "/gone" not in res.json()["paths"]
+        assert res.json()["paths"]
+
+    async def test_missing_schema_file_falls_back_to_generating(
+        self, app: FastAPI, client: AsyncClient, tmp_path: Path
+    ) -> None:
+        app.openapi = precomputed_openapi(app, path=str(tmp_path / "missing.json"))
+
+        res = await client.get(app.openapi_url)
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json()["info"]["version"] == app.version
+
+
+class TestLauncher:
+    async def test_pool_size_without_budget(self, monkeypatch) -> None:
+        monkeypatch.setattr(tasks, "DB_CONNECTION_BUDGET", 0)
+        assert tasks.get_pool_size(workers=8) == (
+            tasks.DB_POOL_MIN_SIZE,
+            tasks.DB_POOL_MAX_SIZE,
+        )
+        # bulkheads have to be configured explicitly
+        assert tasks.get_bulkhead_sizes() == {}
+
+    async def test_budget_is_split_between_workers(self, monkeypatch) -> None:
+        monkeypatch.setattr(tasks, "DB_CONNECTION_BUDGET", 40)
+        monkeypatch.setattr(tasks, "DB_POOL_MIN_SIZE", 2)
+        monkeypatch.setattr(tasks, "DB_BULKHEAD_POOLS", [])
+        assert tasks.get_pool_size(workers=4) == (2, 10)
+        assert tasks.get_pool_size(workers=16) == (2, 2)
+        assert tasks.get_pool_size(workers=40) == (1, 1)
+        with pytest.raises(ValueError):
+            tasks.get_pool_size(workers=64)
+
+    async def test_bulkheads_are_taken_off_the_budget(self, monkeypatch) -> None:
+        monkeypatch.setattr(tasks, "DB_CONNECTION_BUDGET", 40)
+        monkeypatch.setattr(tasks, "DB_POOL_MIN_SIZE", 2)
+        monkeypatch.setattr(tasks, "DB_BULKHEAD_POOLS", ["feed:3", " analytics:2"])
+        assert tasks.get_bulkhead_sizes() == {"feed": 3, "analytics": 2}
+        assert tasks.get_pool_size(workers=4) == (2, 5)
+        assert tasks.get_pool_size(workers=6) == (1, 1)
+        for workers in range(1, 7):
+            assert tasks.get_max_connections(workers=workers) <= 40
+        # a connection of its own for every worker doesn't fit anymore
+        with pytest.raises(ValueError):
+            tasks.get_pool_size(workers=8)
+
+    async def test_overcommitted_pools_are_only_reported(
+        self, client: AsyncClient, db: Database, monkeypatch, caplog
+    ) -> None:
+        server_limit = await db.fetch_val(tasks.SERVER_CONNECTION_LIMIT_QUERY)
+        monkeypatch.setattr(tasks, "DB_CONNECTION_BUDGET", 0)
+        monkeypatch.setattr(tasks, "DB_POOL_MAX_SIZE", 10)
+        monkeypatch.setattr(tasks, "WEB_CONCURRENCY", server_limit)
+        # alembic's logging setup disables the loggers that already exist
+        monkeypatch.setattr(tasks.logger, "disabled", False)
+
+        with caplog.at_level(logging.WARNING, logger=tasks.__name__):
+            await tasks.check_server_connection_limit(db)
+        assert f"only accepts {server_limit}" in caplog.text
+        # the pools keep their configured size
+        assert tasks.get_pool_size() == (tasks.DB_POOL_MIN_SIZE, 10)
+
+        caplog.clear()
+        monkeypatch.setattr(tasks, "WEB_CONCURRENCY", 1)
+        with caplog.at_level(logging.WARNING, logger=tasks.__name__):
+            await tasks.check_server_connection_limit(db)
+        assert not caplog.text
+
+    async def test_prefork_workers_serve_and_shut_down(self) -> None:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        launcher = subprocess.Popen(
+            [sys.executable, "-m", "app"],
+            cwd=Path(__file__).parent.parent,
+            env={
+                **os.environ,
+                "HOST": "127.0.0.1",
+                "PORT": str(port),
+                "WEB_CONCURRENCY": "2",
+                "WARMUP_ENABLED": "false",
+                "ACCESS_LOG_ENABLED": "false",
+            },
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    with urllib.request.urlopen(
+                        f"http://127.0.0.1:{port}/health/live", timeout=1
+                    ) as response:
+                        assert response.status == 200
+                        break
+                except OSError:
+                    assert time.monotonic() < deadline, "workers did not start"
+                    time.sleep(0.2)
+        finally:
+            launcher.send_signal(signal.SIGTERM)
+            assert launcher.wait(timeout=30) == 0
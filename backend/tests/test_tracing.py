@@ -0,0 +1,140 @@
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+import pytest
+from app.core.tracing import (
+    FileSpanExporter,
+    OTLPHttpSpanExporter,
+    parse_traceparent,
+    tracer,
+)
+from app.models.cleaning import CleaningInDB
+from fastapi import FastAPI, status
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture()
+def collector() -> Iterator[tuple[str, list[dict]]]:
+    """Local stand-in for an OTLP/HTTP collector."""
+    received = []
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append({"path": self.path, "payload": json.loads(body)})
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), CollectorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1/traces", received
+    server.shutdown()
+
+
+class TestTraceparent:
+    async def test_valid_traceparent_is_parsed(self) -> None:
+        assert parse_traceparent(
+            "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+        ) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+
+    async def test_invalid_traceparent_is_ignored(self) -> None:
+        assert parse_traceparent("not-a-traceparent") is None
+
+
+class TestRequestTracing:
+    async def test_spans_cover_dependencies_repositories_and_sql(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_cleaning: CleaningInDB,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        spans_file = tmp_path / "spans.jsonl"
+        monkeypatch.setattr(tracer, "exporter", FileSpanExporter(str(spans_file)))
+
+        response = await authorized_client.get(
+            app.url_path_for("cleanings:get-cleaning-by-id", cleaning_id=test_cleaning.id)
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert tracer.flush()
+
+        spans = [json.loads(line) for line in spans_file.read_text().splitlines()]
+        spans_by_name = {span["name"]: span for span in spans}
+        root = spans_by_name["cleanings:get-cleaning-by-id"]
+        dependency = spans_by_name["get_cleaning_by_id_from_path"]
+        repository_method = spans_by_name["CleaningsRepository.get_cleaning_by_id"]
+        statement = spans_by_name[
+            "SQL GET_CLEANING_BY_ID_QUERY+LIST_OFFERS_FOR_CLEANING_QUERY"
+            "+GET_OFFER_FOR_CLEANING_FROM_USER_QUERY"
+        ]
+
+        assert "parentSpanId" not in root
+        assert {span["traceId"] for span in spans} == {root["traceId"]}
+        assert dependency["parentSpanId"] == root["spanId"]
+        assert repository_method["parentSpanId"] == dependency["spanId"]
+        assert statement["parentSpanId"] == repository_method["spanId"]
+        assert "get_current_active_user" in spans_by_name
+        assert (
+            "SQL GET_USER_BY_USERNAME_QUERY+GET_PROFILE_BY_OWNER_USERNAME_QUERY"
+            in spans_by_name
+        )
+
+    async def test_spans_are_sent_to_otlp_collector(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        collector: tuple[str, list[dict]],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        endpoint, received = collector
+        monkeypatch.setattr(tracer, "exporter", OTLPHttpSpanExporter(endpoint))
+        trace_id, parent_span_id = "0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331"
+
+        response = await authorized_client.get(
+            app.url_path_for("users:get-current-user"),
+            headers={"traceparent": f"00-{trace_id}-{parent_span_id}-01"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert tracer.flush()
+
+        assert received and received[0]["path"] == "/v1/traces"
+        spans = [
+            span
+            for request in received
+            for resource_spans in request["payload"]["resourceSpans"]
+            for scope_spans in resource_spans["scopeSpans"]
+            for span in scope_spans["spans"]
+        ]
+        root = next(span for span in spans if span["name"] == "users:get-current-user")
+        assert root["traceId"] == trace_id
+        assert root["parentSpanId"] == parent_span_id
+        assert {"key": "http.status_code", "value": {"intValue": "200"}} in root[
+            "attributes"
+        ]
+
+    async def test_unsampled_requests_are_not_traced(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        spans_file = tmp_path / "spans.jsonl"
+        monkeypatch.setattr(tracer, "exporter", FileSpanExporter(str(spans_file)))
+        monkeypatch.setattr(tracer, "sample_rate", 0)
+
+        response = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert response.status_code == status.HTTP_200_OK
+        assert tracer.flush()
+
+        assert not spans_file.exists()
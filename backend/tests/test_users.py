@@ -1,5 +1,9 @@
+import asyncio
+import contextvars
+
 import jwt
 import pytest
+from app.core import config
 from app.core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     JWT_ALGORITHM,
@@ -7,7 +11,7 @@ from app.core.config import (
     SECRET_KEY,
 )
 from app.db.repositories.users import UsersRepository
-from app.models.user import UserInDB, UserPublic
+from app.models.user import UserCreate, UserInDB, UserPublic
 from app.services import auth_service
 from databases import Database
 from fastapi import FastAPI, HTTPException
@@ -97,6 +101,53 @@ class TestUserRegistration:
 
         assert response.status_code == status_code
 
+    async def test_registration_takes_a_single_query(
+        self, app: FastAPI, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(config, "SERVER_TIMING_ENABLED", True)
+        new_user = {
+            "email": "rihanna@fenty.io",
+            "username": "badgalriri",
+            "password": "umbrella",
+        }
+
+        response = await client.post(
+            app.url_path_for("users:register-new-user"), json={"new_user": new_user}
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'desc="1 queries"' in response.headers["Server-Timing"]
+        created_user = UserPublic(**response.json())
+        assert created_user.profile.user_id == created_user.id
+
+    async def test_concurrent_registrations_with_the_same_email(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        user_repo = UsersRepository(db)
+
+        async def register(username: str) -> UserPublic:
+            return await user_repo.register_new_user(
+                new_user=UserCreate(
+                    email="race@condition.io", username=username, password="samepassword"
+                )
+            )
+
+        # fresh contexts, so every registration runs on its own connection
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.create_task(register(f"racer{i}"), context=contextvars.Context())
+                for i in range(5)
+            ),
+            return_exceptions=True,
+        )
+
+        registered = [result for result in results if isinstance(result, UserPublic)]
+        assert len(registered) == 1
+        for result in results:
+            if not isinstance(result, UserPublic):
+                assert isinstance(result, HTTPException)
+                assert result.status_code == status.HTTP_400_BAD_REQUEST
+
     async def test_users_saved_password_is_hashed_and_has_salt(
         self, app: FastAPI, client: AsyncClient, db: Database
     ) -> None: